@@ -1,40 +1,91 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, stream_with_context
 from flask_socketio import SocketIO, emit, join_room
 from flask_cors import CORS
-import subprocess
+import cluster
+import log_config
+import logging
+import metrics
 import json
 import os
-import sys
-import threading
 import queue
-import base64
+import re
+import secrets
 import tempfile
 import shutil
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from projects import ProjectManager
+import codecs
+from projects import get_project_manager
+from job_scheduler import JobScheduler
+from process_supervisor import get_supervisor
+from output_buffer import OutputAccumulator
+from history_store import HistoryStore
+from upload_store import UploadStore, UploadError
+from context_packer import ContextPacker
+from project_watcher import ProjectWatcher
+from response_cache import ResponseCache, RESPONSE_CACHE_DEFAULT
+from stream_codec import OutputEncoder, new_wire_stats, wire_summary
 
 load_dotenv()
+log_config.setup()
+log = logging.getLogger(__name__)
+stream_log = log_config.stream_logger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 CORS(app, origins="*")
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', ping_timeout=300, ping_interval=60)
+socketio = SocketIO(app, cors_allowed_origins="*", ping_timeout=300, ping_interval=60, **cluster.socketio_options())
+cluster.init_app(app)
+metrics.init_app(app)
 
 # Global storage
-command_history = []
+history = HistoryStore()
+# sid -> durable client key that history is filed under, so it survives reconnects
+history_keys = {}
+CLIENT_ID_RE = re.compile(r'[A-Za-z0-9_-]{16,64}')
 active_processes = {}
 command_queues = {}
-executor = ThreadPoolExecutor(max_workers=5)
-project_manager = ProjectManager()
+# Per-connection encoders for clients that negotiated compressed stream_output
+stream_encoders = {}
+stream_wire = new_wire_stats()  # totals over every connection, compressed or not
+project_manager = get_project_manager()
+
+def notify_queued(job, position):
+    """Tell a client its command is waiting and where it is in line"""
+    socketio.emit('queued', {
+        'job_id': job.job_id,
+        'position': position
+    }, room=job.session_id)
+
+scheduler = JobScheduler(on_queued=notify_queued)
+metrics.track_scheduler('command', scheduler)
+metrics.track_children('prompt', lambda: len(active_processes))
+
+def notify_projects(event, payload):
+    """Broadcast project_updated / project_discovered to every client"""
+    socketio.emit(event, payload)
+
+# With a shared message queue every broadcast reaches every worker's clients,
+# so only one worker per host watches projects
+project_watcher = ProjectWatcher(project_manager, notify_projects)
+if not cluster.SOCKETIO_MESSAGE_QUEUE or cluster.is_leader('project-watcher'):
+    project_watcher.start()
+for root in filter(None, os.environ.get('PROJECT_SCAN_ROOTS', '').split(os.pathsep)):
+    project_watcher.watch_root(root)
+
+# Read size for streamed command output
+STREAM_CHUNK_BYTES = 64 * 1024
 
 # File upload directory
 UPLOAD_FOLDER = tempfile.mkdtemp(prefix='claude_mobile_')
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+uploads = UploadStore(os.path.join(UPLOAD_FOLDER, 'uploads'))
+context_packer = ContextPacker()
+response_cache = ResponseCache()
 
 @app.route('/')
 def index():
@@ -50,13 +101,30 @@ def health():
         'status': 'healthy', 
         'timestamp': datetime.now().isoformat(),
         'active_sessions': len(active_processes),
-        'upload_dir': UPLOAD_FOLDER
+        'upload_dir': UPLOAD_FOLDER,
+        'scheduler': scheduler.stats(),
+        'context_cache': context_packer.stats(),
+        'response_cache': response_cache.stats(),
+        'project_watcher': project_watcher.stats(),
+        'processes': get_supervisor().stats(),
+        'logging': log_config.stats(),
+        'stream_wire': {
+            **wire_summary(stream_wire),
+            'sessions': [{'session': sid[:8], **wire_summary(encoder.stats)}
+                         for sid, encoder in list(stream_encoders.items())],
+        }
     })
 
 @socketio.on('connect')
-def handle_connect():
-    print(f"Client connected: {request.sid}")
-    emit('connected', {'message': 'Connected to Claude Mobile Interface', 'session_id': request.sid})
+def handle_connect(auth=None):
+    log.info("Client connected", extra={'session': request.sid})
+    # Reuse the key the client kept from an earlier connection, or issue one
+    client_id = auth.get('client_id') if isinstance(auth, dict) else None
+    if not isinstance(client_id, str) or not CLIENT_ID_RE.fullmatch(client_id):
+        client_id = secrets.token_urlsafe(16)
+    history_keys[request.sid] = client_id
+    emit('connected', {'message': 'Connected to Claude Mobile Interface', 'session_id': request.sid,
+                       'client_id': client_id})
     # Initialize queue for this session
     command_queues[request.sid] = queue.Queue()
     # Join the session to its own room for targeted messaging
@@ -64,155 +132,223 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print(f"Client disconnected: {request.sid}")
-    # Clean up session resources
-    if request.sid in active_processes:
-        try:
-            active_processes[request.sid].terminate()
-        except:
-            pass
-        del active_processes[request.sid]
+    log.info("Client disconnected", extra={'session': request.sid})
+    # Clean up session resources; cancelling the run also kills its process
+    scheduler.cancel(request.sid)
+    scheduler.cancel_running(request.sid)
     if request.sid in command_queues:
         del command_queues[request.sid]
+    stream_encoders.pop(request.sid, None)
+    history_keys.pop(request.sid, None)
 
 @socketio.on('command')
 def handle_command(data):
     session_id = request.sid
+    metrics.BYTES_IN.labels('/', 'command').inc(metrics.payload_bytes(data))
     command = data.get('message', '')
-    files = data.get('files', [])
+    file_ids = data.get('file_ids', [])
     project_path = data.get('project_path', None)
+    # 'summary' skips resending the already-streamed output in the final response
+    response_mode = data.get('response_mode', 'full')
+    # Opt-in replay of an earlier identical run against the same project state
+    use_cache = bool(data.get('use_cache', RESPONSE_CACHE_DEFAULT))
+    # Compressed frames share a dictionary for the rest of the connection
+    if data.get('compress') and session_id not in stream_encoders:
+        stream_encoders[session_id] = OutputEncoder(compress=True)
     
-    print(f"Session {session_id}: Executing command: {command}")
+    log.info("Executing command: %.200s", command, extra={'session': session_id})
     
-    # Handle file uploads if present
+    # Attachments were uploaded beforehand over /api/uploads; resolve their IDs
     uploaded_files = []
-    if files:
-        for file_data in files:
-            try:
-                file_content = base64.b64decode(file_data['content'].split(',')[1])
-                filename = secure_filename(file_data['name'])
-                filepath = os.path.join(UPLOAD_FOLDER, f"{session_id}_{filename}")
-                with open(filepath, 'wb') as f:
-                    f.write(file_content)
-                uploaded_files.append(filepath)
-                emit('system_message', {
-                    'message': f"File uploaded: {filename}",
-                    'type': 'info'
-                })
-            except Exception as e:
-                emit('system_message', {
-                    'message': f"Failed to upload file: {str(e)}",
-                    'type': 'error'
-                })
+    for file_id in file_ids:
+        resolved = uploads.resolve(file_id)
+        if resolved:
+            # Blobs are named by content hash, so the ID doubles as the cache key
+            uploaded_files.append((*resolved, file_id))
+        else:
+            emit('system_message', {
+                'message': f"Attachment not found or expired: {file_id}",
+                'type': 'error'
+            })
     
-    # Add to history
-    command_entry = {
-        'command': command,
-        'timestamp': datetime.now().isoformat(),
-        'session_id': session_id,
-        'files': [os.path.basename(f) for f in uploaded_files]
-    }
-    command_history.append(command_entry)
+    # Add to history (written in the background)
+    history.add(command, history_keys.get(session_id, session_id), project_path,
+                files=[name for _, name, _ in uploaded_files])
     
-    # Execute command in background
-    executor.submit(execute_command_stream, session_id, command, uploaded_files, project_path)
+    # Queue for execution; the scheduler keeps sessions and projects fair
+    scheduler.submit(session_id, project_path, execute_command_stream,
+                     session_id, command, uploaded_files, project_path, response_mode, use_cache)
 
-def execute_command_stream(session_id, command, uploaded_files=[], project_path=None):
-    """Execute command with real-time output streaming in a specific project directory"""
+def final_response(output, return_code, response_mode):
+    """Build the closing 'response' payload for a streamed command"""
+    payload = {
+        'success': return_code == 0,
+        'timestamp': datetime.now().isoformat()
+    }
+    if response_mode == 'summary' and len(output):
+        payload['summary'] = {'exit_code': return_code, **output.summary()}
+    elif len(output):
+        payload['output'] = output.getvalue()
+    elif return_code is None:
+        payload['output'] = 'Command cancelled'
+    else:
+        payload['output'] = "No response received from Claude CLI. Please check if Claude is properly installed and configured."
+    return payload
+
+async def feed_stdin(process, text):
+    """Write text to a subprocess's stdin and close it"""
     try:
-        print(f"[DEBUG] Starting command execution for session {session_id}")
-        print(f"[DEBUG] Command: {command}")
-        print(f"[DEBUG] Project path: {project_path}")
+        process.stdin.write(text.encode('utf-8'))
+        await process.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # Claude exited before reading all of it; its output says why
+    finally:
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+def emit_stream(session_id, chunk, text, **extra):
+    """Send one stream_output frame: compressed bytes if negotiated, else text"""
+    encoder = stream_encoders.get(session_id)
+    if encoder:
+        fields = encoder.fields(chunk)
+        stream_wire['frames'] += 1
+        stream_wire['compressed_frames'] += bool(fields.get('z'))
+        stream_wire['raw_bytes'] += len(chunk)
+        stream_wire['wire_bytes'] += len(fields['data'])
+    elif text:
+        fields = {'data': text}
+        size = len(text.encode('utf-8'))
+        stream_wire['frames'] += 1
+        stream_wire['raw_bytes'] += size
+        stream_wire['wire_bytes'] += size
+    else:
+        return
+    metrics.FRAME_BYTES.labels('stream_output').observe(len(chunk))
+    started = time.perf_counter()
+    socketio.emit('stream_output', {**fields, 'session_id': session_id, **extra}, room=session_id)
+    metrics.record_emit('/', 'stream_output', fields, time.perf_counter() - started)
+
+def replay_cached(session_id, output, response_mode):
+    """Send a cached response through the same events as a live run"""
+    for start in range(0, len(output), STREAM_CHUNK_BYTES):
+        text = output[start:start + STREAM_CHUNK_BYTES]
+        emit_stream(session_id, text.encode('utf-8'), text, cached=True)
+    buffer = OutputAccumulator(spill_dir=UPLOAD_FOLDER)
+    buffer.append(output)
+    payload = final_response(buffer, 0, response_mode)
+    buffer.close()
+    payload['cache'] = 'hit'
+    socketio.emit('response', payload, room=session_id)
+
+def store_cached(cache_key, command, file_hashes, project_path, output):
+    """Cache output unless the run changed the project (then it had side effects)"""
+    if response_cache.key(command, file_hashes, project_path) == cache_key:
+        response_cache.put(cache_key, output)
+
+async def execute_command_stream(session_id, command, uploaded_files=[], project_path=None, response_mode='full', use_cache=False):
+    """Execute command with real-time output streaming in a specific project directory
+
+    Runs on the shared asyncio loop: output is read in chunks as it arrives
+    and the run is cancelled immediately on disconnect or cancel_command.
+    """
+    process = None
+    stdin_task = None
+    output_buffer = OutputAccumulator(spill_dir=UPLOAD_FOLDER)
+    loop = asyncio.get_running_loop()
+    try:
+        log.debug("Starting command in %s: %s", project_path, command, extra={'session': session_id})
+        
+        cache_key = None
+        file_hashes = [file_hash for _, _, file_hash in uploaded_files]
+        if use_cache:
+            # The git fingerprint, cache file read and replay all touch disk; keep them off the loop
+            cache_key = await loop.run_in_executor(
+                None, response_cache.key, command, file_hashes, project_path)
+            cached = await loop.run_in_executor(None, response_cache.get, cache_key) if cache_key else None
+            if cached is not None:
+                log.debug("Response cache hit", extra={'session': session_id})
+                await loop.run_in_executor(None, replay_cached, session_id, cached, response_mode)
+                return
         
         # Use claude with -p flag for prompt mode
         full_command = ['claude', '-p', command]
         
-        # If files were uploaded, add them to context
+        # Attachments are packed off the loop and piped over stdin, which keeps
+        # argv small no matter how much context there is
+        file_context = ''
         if uploaded_files:
-            file_context = "Context files:\n"
-            for filepath in uploaded_files:
-                try:
-                    with open(filepath, 'r') as f:
-                        content = f.read(1000)  # First 1000 chars
-                        file_context += f"\n{os.path.basename(filepath)}:\n{content}...\n"
-                except:
-                    pass
-            full_command = ['claude', '-p', f"{file_context}\n\n{command}"]
-        
-        print(f"[DEBUG] Full command: {full_command}")
+            file_context = await loop.run_in_executor(None, context_packer.pack, uploaded_files)
+            log.debug("Packed context from %d file(s)", len(uploaded_files),
+                      extra={'session': session_id, 'bytes': len(file_context)})
         
         # Don't send initial messages - just show responding indicator on client side
         
-        # Start process in the specified directory
-        process = subprocess.Popen(
-            full_command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,  # Combine stderr with stdout
-            text=True,
-            bufsize=1,
-            universal_newlines=True,
+        # Start process in the specified directory. The stream limit bounds how
+        # much unread output is buffered; past it the pipe fills and Claude waits.
+        spawn_started = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *full_command,
+            stdin=asyncio.subprocess.PIPE if file_context else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,  # Combine stderr with stdout
             cwd=project_path,  # Set working directory
-            env={**os.environ}  # Ensure environment variables are passed
+            env={**os.environ},  # Ensure environment variables are passed
+            limit=STREAM_CHUNK_BYTES,
+            start_new_session=True  # Own process group, so cancel reaches Claude's tools too
         )
         
-        print(f"[DEBUG] Process started with PID: {process.pid}")
+        spawned_at = time.monotonic()
+        metrics.SPAWN_SECONDS.labels('prompt').observe(spawned_at - spawn_started)
+        log.debug("Process started", extra={'session': session_id, 'pid': process.pid})
         active_processes[session_id] = process
         
-        # Stream output without timeout - runs until process completes or socket disconnects
-        output_buffer = ""
-        line_count = 0
+        if file_context:
+            # Fed from a task so a large context never stalls reading the output;
+            # awaited below so its errors are seen and it is not collected mid-write
+            stdin_task = asyncio.ensure_future(feed_stdin(process, file_context))
+        
+        # Stream output without timeout - runs until process completes or the run is cancelled
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        chunk_count = 0
         
         while True:
-            # Check if client is still connected
-            if session_id not in active_processes:
-                print(f"[DEBUG] Client disconnected, terminating process")
-                process.terminate()
-                break
-                
-            output = process.stdout.readline()
-            if output == '' and process.poll() is not None:
+            chunk = await process.stdout.read(STREAM_CHUNK_BYTES)
+            if not chunk:
                 break
+            if chunk_count == 0:
+                metrics.FIRST_BYTE_SECONDS.labels('prompt').observe(time.monotonic() - spawned_at)
+            output = decoder.decode(chunk)
+            chunk_count += 1
+            if stream_log.isEnabledFor(logging.DEBUG):
+                stream_log.debug("Chunk %d", chunk_count,
+                                 extra={'session': session_id, 'pid': process.pid, 'bytes': len(chunk)})
             if output:
-                line_count += 1
-                print(f"[DEBUG] Line {line_count}: {output.strip()}")
-                output_buffer += output
-                socketio.emit('stream_output', {
-                    'data': output,
-                    'session_id': session_id
-                }, room=session_id)
+                output_buffer.append(output)
+            # Compressed clients get the raw bytes, split characters and all
+            emit_stream(session_id, chunk, output)
         
+        if stdin_task:
+            await stdin_task
         # Get exit code
-        return_code = process.poll()
-        print(f"[DEBUG] Process exited with code: {return_code}")
-        print(f"[DEBUG] Total output: {len(output_buffer)} characters")
+        return_code = await process.wait()
+        log.debug("Process exited with code %s", return_code,
+                  extra={'session': session_id, 'pid': process.pid, 'bytes': len(output_buffer)})
         
         # Send final response
-        if not output_buffer:
-            output_buffer = "No response received from Claude CLI. Please check if Claude is properly installed and configured."
-        
-        socketio.emit('response', {
-            'output': output_buffer,
-            'success': return_code == 0,
-            'timestamp': datetime.now().isoformat()
-        }, room=session_id)
+        payload = final_response(output_buffer, return_code, response_mode)
+        if cache_key:
+            payload['cache'] = 'miss'
+        socketio.emit('response', payload, room=session_id)
         
-        # Clean up
-        if session_id in active_processes:
-            del active_processes[session_id]
+        if cache_key and return_code == 0 and len(output_buffer) and not output_buffer.truncated:
+            await loop.run_in_executor(None, store_cached, cache_key, command, file_hashes,
+                                       project_path, output_buffer.getvalue())
         
-        # Clean up uploaded files
-        for filepath in uploaded_files:
-            try:
-                os.remove(filepath)
-            except:
-                pass
-                
-    except subprocess.TimeoutExpired:
-        socketio.emit('response', {
-            'output': 'Command timed out after 60 seconds',
-            'success': False,
-            'timestamp': datetime.now().isoformat()
-        }, room=session_id)
+    except asyncio.CancelledError:
+        log.debug("Command cancelled", extra={'session': session_id})
+        socketio.emit('response', final_response(output_buffer, None, response_mode), room=session_id)
     except FileNotFoundError:
         socketio.emit('response', {
             'output': 'Claude CLI not found. Please ensure Claude is installed and in PATH.',
@@ -225,38 +361,61 @@ def execute_command_stream(session_id, command, uploaded_files=[], project_path=
             'success': False,
             'timestamp': datetime.now().isoformat()
         }, room=session_id)
+    finally:
+        if stdin_task and not stdin_task.done():
+            stdin_task.cancel()
+            await asyncio.gather(stdin_task, return_exceptions=True)
+        if process and process.returncode is None:
+            # SIGTERM to the group now, SIGKILL after the grace period
+            get_supervisor().terminate(process.pid)
+            await process.wait()
+        output_buffer.close()
+        
+        # Clean up
+        if process and active_processes.get(session_id) is process:
+            del active_processes[session_id]
+        # Uploaded files are content-addressed blobs; the upload store expires them
 
 @socketio.on('cancel_command')
 def handle_cancel_command():
-    """Cancel running command for this session"""
+    """Cancel queued and running commands for this session"""
     session_id = request.sid
-    if session_id in active_processes:
-        try:
-            active_processes[session_id].terminate()
-            del active_processes[session_id]
-            emit('system_message', {
-                'message': 'Command cancelled',
-                'type': 'warning'
-            })
-        except Exception as e:
-            emit('system_message', {
-                'message': f'Failed to cancel: {str(e)}',
-                'type': 'error'
-            })
+    dropped = scheduler.cancel(session_id)
+    if dropped:
+        emit('system_message', {
+            'message': f'Cancelled {dropped} queued command(s)',
+            'type': 'warning'
+        })
+    if scheduler.cancel_running(session_id):
+        emit('system_message', {
+            'message': 'Command cancelled',
+            'type': 'warning'
+        })
 
 @socketio.on('get_history')
-def handle_get_history():
-    """Get command history for this session"""
-    session_id = request.sid
-    session_history = [h for h in command_history if h['session_id'] == session_id]
-    emit('history', {'commands': session_history[-50:]})  # Last 50 commands
+def handle_get_history(data=None):
+    """Get command history for this client (or a project), one page at a time"""
+    data = data or {}
+    try:
+        limit = int(data.get('limit', 50))
+    except (TypeError, ValueError):
+        limit = 50
+    limit = max(1, min(limit, 500))
+    if data.get('project_path'):
+        commands = history.recent(project_path=data['project_path'], limit=limit,
+                                  before_id=data.get('before_id'))
+    else:
+        commands = history.recent(session_id=history_keys.get(request.sid, request.sid), limit=limit,
+                                  before_id=data.get('before_id'))
+    emit('history', {
+        'commands': commands,
+        'has_more': len(commands) == limit
+    })
 
 @socketio.on('clear_history')
 def handle_clear_history():
-    """Clear command history for this session"""
-    global command_history
-    session_id = request.sid
-    command_history = [h for h in command_history if h['session_id'] != session_id]
+    """Clear command history for this client"""
+    history.clear(history_keys.get(request.sid, request.sid))
     emit('system_message', {
         'message': 'History cleared',
         'type': 'info'
@@ -274,6 +433,51 @@ def download_file(filename):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Chunked uploads: POST to register, PUT byte ranges, GET to resume
+def upload_error(e):
+    body = {'error': str(e)}
+    if e.received is not None:
+        body['received'] = e.received
+    return jsonify(body), e.status
+
+@app.route('/api/uploads', methods=['POST'])
+def create_upload():
+    """Register an upload and return its ID and chunk size"""
+    data = request.json or {}
+    try:
+        upload = uploads.create(secure_filename(data.get('name', '')) or 'upload', data.get('size', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid size'}), 400
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify(upload.status()), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    """Append one chunk; Content-Range says where it goes"""
+    try:
+        unit, _, span = request.headers.get('Content-Range', '').partition(' ')
+        start, end = span.split('/')[0].split('-')
+        start, end = int(start), int(end)
+        if unit != 'bytes' or end < start:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'Missing or invalid Content-Range'}), 400
+
+    try:
+        upload = uploads.write(upload_id, start, end - start + 1, request.stream)
+    except UploadError as e:
+        return upload_error(e)
+    return jsonify(upload.status())
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """How much of an upload has arrived, for resuming"""
+    try:
+        return jsonify(uploads.get(upload_id).status())
+    except UploadError as e:
+        return upload_error(e)
+
 # Project management endpoints
 @app.route('/api/projects', methods=['GET'])
 def get_projects():
@@ -305,11 +509,27 @@ def delete_project(project_id):
 
 @app.route('/api/projects/scan', methods=['POST'])
 def scan_projects():
-    """Scan directory for projects"""
+    """Scan directory for projects
+
+    With stream: true the response is NDJSON, one project per line as it is
+    found; otherwise a single JSON array.
+    """
     data = request.json
     path = data.get('path', os.path.expanduser('~'))
     max_depth = data.get('max_depth', 2)
     
+    if not os.path.isdir(os.path.expanduser(path)):
+        return jsonify({'error': f'Not a directory: {path}'}), 400
+    # Keep watching this root so later projects show up without a rescan
+    # (if this worker runs the watcher and has room for another root)
+    project_watcher.watch_root(path)
+    
+    if data.get('stream'):
+        def generate():
+            for project in project_manager.iter_scan(path, max_depth):
+                yield json.dumps(project) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
     try:
         projects = project_manager.scan_directory(path, max_depth)
         return jsonify(projects)
@@ -338,6 +558,7 @@ def handle_select_project(data):
 import atexit
 def cleanup():
     """Clean up temporary files on shutdown"""
+    history.flush()
     try:
         shutil.rmtree(UPLOAD_FOLDER)
     except:
@@ -347,6 +568,5 @@ atexit.register(cleanup)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
-    print(f"Starting Claude Mobile Interface on port {port}")
-    print(f"Upload folder: {UPLOAD_FOLDER}")
-    socketio.run(app, host='0.0.0.0', port=port, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    log.info("Starting Claude Mobile Interface on port %d (uploads in %s)", port, UPLOAD_FOLDER)
+    socketio.run(app, host='0.0.0.0', port=port, debug=cluster.DEBUG, allow_unsafe_werkzeug=True)
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Background asyncio loop for subprocess streaming
+
+Flask-SocketIO handlers are synchronous; AsyncRunner owns one event loop on
+a daemon thread so coroutines (e.g. claude -p runs) can be started from any
+handler and many of them can run concurrently without a thread each.
+"""
+import asyncio
+import threading
+
+
+class AsyncRunner:
+    """An asyncio event loop running forever on its own thread"""
+
+    def __init__(self, name='async-runner'):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule coro on the loop; returns a concurrent.futures.Future
+
+        Cancelling the returned future cancels the underlying task.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def task_count(self):
+        """Number of tasks currently alive on the loop"""
+        return len(asyncio.all_tasks(self.loop))
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    """Return the process-wide AsyncRunner, starting it on first use"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = AsyncRunner()
+        return _runner
@@ -1,119 +1,198 @@
-from flask import Flask, render_template, jsonify, request
-from flask_socketio import SocketIO, emit, join_room
-from flask_cors import CORS
-import subprocess
+from flask import Blueprint, render_template, jsonify, request
+from flask_socketio import emit, join_room
+import cluster
+import logging
+import metrics
+import asyncio
+import codecs
 import os
-import threading
-import queue
+import time
+from job_scheduler import JobScheduler
+from process_supervisor import get_supervisor
+from output_buffer import OutputAccumulator
+from conversation_store import ConversationStore
+from session_runtime import create_app
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-chat')
-CORS(app, origins="*")
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+log = logging.getLogger(__name__)
+
+bp = Blueprint('chat', __name__)
 
 # Store active sessions
 sessions = {}
 
+# Seconds between progress events while Claude is working
+CHAT_PROGRESS_SECONDS = float(os.environ.get('CHAT_PROGRESS_SECONDS', 5))
+CHAT_READ_BYTES = 16 * 1024
+# Earlier conversation passed (over stdin) with each message; 0 disables
+CHAT_CONTEXT_CHARS = int(os.environ.get('CHAT_CONTEXT_CHARS', 8000))
+
+def notify_queued(job, position):
+    session = sessions.get(job.session_id)
+    if session:
+        session.emit('queued', {'position': position})
+
+# One message at a time per session; sessions run in parallel up to the global cap
+scheduler = JobScheduler(per_session=1, on_queued=notify_queued)
+metrics.track_scheduler('chat', scheduler)
+
 class ClaudeChatSession:
-    def __init__(self, session_id, project_path=None):
+    def __init__(self, session_id, emit, project_path=None):
         self.session_id = session_id
+        self.emitter = emit
         self.project_path = project_path or os.path.expanduser("~/projects")
-        self.conversation_history = []
+        self.conversation_history = ConversationStore(session_id)
         
         # Ensure project directory exists
         if not os.path.exists(self.project_path):
             os.makedirs(self.project_path, exist_ok=True)
     
-    def send_message(self, message):
-        """Send a message to Claude using -m flag"""
-        self.conversation_history.append({'role': 'user', 'content': message})
+    def emit(self, event, data):
+        self.emitter(event, data, room=self.session_id)
+    
+    async def send_message(self, message):
+        """Send a message to Claude using -m flag, streaming the reply
+
+        Output is forwarded as response_chunk events as it arrives and a
+        progress event is sent every CHAT_PROGRESS_SECONDS. There is no time
+        limit; cancelling the job kills Claude and keeps the partial reply.
+        """
+        context = self.conversation_history.context(CHAT_CONTEXT_CHARS)
+        self.conversation_history.append('user', message)
         
-        # Execute Claude with message
+        process = None
+        response = OutputAccumulator()
+        started = time.monotonic()
         try:
-            print(f"Sending to Claude: {message}")
+            log.info("Sending to Claude: %.200s", message, extra={'session': self.session_id})
+            self.emit('status', {'message': 'Processing...'})
             
-            result = subprocess.run(
-                ['claude', '-m', message],
-                capture_output=True,
-                text=True,
+            spawn_started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                'claude', '-m', message,
+                stdin=asyncio.subprocess.PIPE if context else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
                 cwd=self.project_path,
-                timeout=60
+                start_new_session=True  # own process group, so cancel reaches its children
             )
+            spawned_at = time.monotonic()
+            metrics.SPAWN_SECONDS.labels('chat').observe(spawned_at - spawn_started)
             
-            response = result.stdout
-            if not response and result.stderr:
-                response = f"Error: {result.stderr}"
+            if context:
+                process.stdin.write(context.encode('utf-8'))
+                await process.stdin.drain()
+                process.stdin.close()
             
-            print(f"Claude response: {response[:200]}...")  # Log first 200 chars
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(process.stdout.read(CHAT_READ_BYTES),
+                                                   CHAT_PROGRESS_SECONDS)
+                except asyncio.TimeoutError:
+                    self.emit('progress', {
+                        'elapsed': round(time.monotonic() - started),
+                        'bytes': len(response)
+                    })
+                    continue
+                if not chunk:
+                    break
+                if spawned_at is not None:
+                    metrics.FIRST_BYTE_SECONDS.labels('chat').observe(time.monotonic() - spawned_at)
+                    spawned_at = None
+                text = decoder.decode(chunk)
+                if text:
+                    response.append(text)
+                    self.emit('response_chunk', {'data': text})
             
-            self.conversation_history.append({'role': 'assistant', 'content': response})
-            return response
+            await process.wait()
+            reply = response.getvalue()
+            log.debug("Claude response: %.200s", reply,
+                      extra={'session': self.session_id, 'pid': process.pid, 'bytes': len(reply)})
             
-        except subprocess.TimeoutExpired:
-            return "Request timed out after 60 seconds."
+            self.conversation_history.append('assistant', reply)
+            self.emit('response', {'message': reply})
+            
+        except asyncio.CancelledError:
+            if len(response):
+                self.conversation_history.append('assistant', response.getvalue())
+            self.emit('response', {'message': response.getvalue(), 'cancelled': True})
         except Exception as e:
-            print(f"Error executing Claude: {e}")
-            return f"Error: {str(e)}"
+            log.exception("Error executing Claude", extra={'session': self.session_id})
+            self.emit('response', {'message': f"Error: {str(e)}"})
+        finally:
+            if process and process.returncode is None:
+                # SIGTERM to the group now, SIGKILL after the grace period
+                get_supervisor().terminate(process.pid)
+                await process.wait()
+            response.close()
 
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('claude_chat.html')
 
-@app.route('/health')
+@bp.route('/health')
 def health():
     return jsonify({
         'status': 'healthy',
-        'active_sessions': len(sessions)
+        'active_sessions': len(sessions),
+        'scheduler': scheduler.stats(),
+        'processes': get_supervisor().stats(),
+        'conversation_bytes': {
+            sid: session.conversation_history.memory_bytes() for sid, session in list(sessions.items())
+        }
     })
 
-@socketio.on('connect')
-def handle_connect():
-    print(f"Client connected: {request.sid}")
-    join_room(request.sid)
-    emit('connected', {'session_id': request.sid})
-    
-    # Create session
-    sessions[request.sid] = ClaudeChatSession(request.sid)
-    emit('ready', {'message': 'Claude chat session ready'})
-
-@socketio.on('disconnect')
-def handle_disconnect():
-    print(f"Client disconnected: {request.sid}")
-    if request.sid in sessions:
-        del sessions[request.sid]
-
-@socketio.on('send_message')
-def handle_message(data):
-    """Handle message from client"""
-    session_id = request.sid
-    message = data.get('message', '')
-    
-    if session_id not in sessions:
-        sessions[session_id] = ClaudeChatSession(session_id)
-    
-    print(f"Processing message from {session_id}: {message}")
-    
-    # Send message to Claude in a thread to avoid blocking
-    def process_message():
-        emit('status', {'message': 'Processing...'}, room=session_id)
-        response = sessions[session_id].send_message(message)
-        emit('response', {'message': response}, room=session_id)
-    
-    threading.Thread(target=process_message).start()
+class ChatNamespace(metrics.MeteredNamespace):
+    def on_connect(self):
+        log.info("Client connected", extra={'session': request.sid})
+        join_room(request.sid)
+        emit('connected', {'session_id': request.sid})
+        
+        # Create session
+        sessions[request.sid] = ClaudeChatSession(request.sid, self.emit)
+        emit('ready', {'message': 'Claude chat session ready'})
 
-@socketio.on('set_project')
-def handle_set_project(data):
-    """Set project path for the session"""
-    session_id = request.sid
-    project_path = os.path.expanduser(data.get('path', '~/projects'))
-    
-    if session_id in sessions:
-        sessions[session_id].project_path = project_path
-        if not os.path.exists(project_path):
-            os.makedirs(project_path, exist_ok=True)
-        emit('project_set', {'path': project_path})
+    def on_disconnect(self, reason=None):
+        log.info("Client disconnected", extra={'session': request.sid})
+        scheduler.cancel(request.sid)
+        scheduler.cancel_running(request.sid)
+        sessions.pop(request.sid, None)
+
+    def on_send_message(self, data):
+        """Handle message from client"""
+        session_id = request.sid
+        message = data.get('message', '')
+        
+        if session_id not in sessions:
+            sessions[session_id] = ClaudeChatSession(session_id, self.emit)
+        
+        log.debug("Queueing message: %.200s", message, extra={'session': session_id})
+        
+        # Queued behind any earlier message from this session
+        session = sessions[session_id]
+        scheduler.submit(session_id, None, session.send_message, message)
+
+    def on_cancel(self):
+        """Stop the running reply and drop queued messages"""
+        dropped = scheduler.cancel(request.sid)
+        scheduler.cancel_running(request.sid)
+        if dropped:
+            emit('status', {'message': f'Dropped {dropped} queued message(s)'})
+
+    def on_set_project(self, data):
+        """Set project path for the session"""
+        session_id = request.sid
+        project_path = os.path.expanduser(data.get('path', '~/projects'))
+        
+        if session_id in sessions:
+            sessions[session_id].project_path = project_path
+            if not os.path.exists(project_path):
+                os.makedirs(project_path, exist_ok=True)
+            emit('project_set', {'path': project_path})
 
 if __name__ == '__main__':
+    # Standalone at /; server.py mounts the namespace into its own app instead
+    app, socketio = create_app('dev-secret-key-chat', bp, ChatNamespace('/'))
     port = int(os.environ.get('PORT', 8080))
-    print(f"Starting Claude Chat Interface on port {port}")
-    socketio.run(app, host='0.0.0.0', port=port, debug=True, allow_unsafe_werkzeug=True)
\ No newline at end of file
+    log.info("Starting Claude Chat Interface on port %d", port)
+    socketio.run(app, host='0.0.0.0', port=port, debug=cluster.DEBUG, allow_unsafe_werkzeug=True)
\ No newline at end of file
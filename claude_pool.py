@@ -0,0 +1,207 @@
+"""
+Warm pool of pre-spawned Claude PTY sessions
+
+Starting the Claude CLI takes a few seconds. The pool keeps a few idle,
+already-initialized sessions for the projects people are most likely to
+open next, so start_session can hand one over instantly and refill in the
+background. A project stays warm while it was used within the idle TTL
+(or, per ProjectManager, within CLAUDE_POOL_RECENT_HOURS); idle sessions
+are also evicted by LRU and a memory budget.
+
+The pool is off by default (CLAUDE_POOL_SIZE=0) and its thread only starts
+on the first acquire, so importing a server never spawns Claude.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+log = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.environ.get('CLAUDE_POOL_SIZE', 0))
+POOL_PROJECTS = int(os.environ.get('CLAUDE_POOL_PROJECTS', 3))
+POOL_IDLE_TTL = float(os.environ.get('CLAUDE_POOL_IDLE_TTL', 900))
+POOL_MEMORY_MB = float(os.environ.get('CLAUDE_POOL_MEMORY_MB', 1024))
+POOL_RECENT_HOURS = float(os.environ.get('CLAUDE_POOL_RECENT_HOURS', 24))
+
+
+def process_rss(pid):
+    """Resident set size of pid in bytes (0 if unknown)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+class ClaudePool:
+    """Per-project pool of idle sessions created by `factory(project_path)`
+
+    factory must return a started session exposing `running`, `pid` and
+    `stop()`; it is only ever called from the pool's maintenance thread.
+    """
+
+    def __init__(self, factory, project_manager=None, size=None, max_projects=None,
+                 idle_ttl=None, memory_budget_mb=None, interval=30):
+        self.factory = factory
+        self.project_manager = project_manager
+        self.size = POOL_SIZE if size is None else size
+        self.max_projects = max_projects or POOL_PROJECTS
+        self.idle_ttl = idle_ttl or POOL_IDLE_TTL
+        self.memory_budget = (memory_budget_mb or POOL_MEMORY_MB) * 1024 * 1024
+        self.interval = interval
+
+        self.idle = {}                 # project path -> [(spawned_at, session)]
+        self.recent = OrderedDict()    # project path -> last use, most recent last
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(project_path):
+        return os.path.realpath(os.path.expanduser(project_path))
+
+    def start(self):
+        """Start the background maintenance thread (once; no-op when size is 0)"""
+        with self.lock:
+            if self.size <= 0 or self.thread:
+                return
+            self.thread = threading.Thread(target=self._run, name='claude-pool', daemon=True)
+            self.thread.start()
+
+    def acquire(self, project_path):
+        """Hand over an idle session for project_path, or None if none is warm"""
+        path = self.key(project_path)
+        session = None
+        with self.lock:
+            self.recent[path] = time.monotonic()
+            self.recent.move_to_end(path)
+            while len(self.recent) > 64:
+                self.recent.popitem(last=False)
+            entries = self.idle.get(path, [])
+            while entries:
+                _, candidate = entries.pop(0)
+                if candidate.running:
+                    session = candidate
+                    break
+            if session:
+                self.hits += 1
+            else:
+                self.misses += 1
+        # Refill (or start warming this project) in the background
+        self.start()
+        self.wakeup.set()
+        return session
+
+    def stats(self):
+        with self.lock:
+            idle = sum(len(entries) for entries in self.idle.values())
+            projects = [path for path, entries in self.idle.items() if entries]
+        return {
+            'idle_sessions': idle,
+            'warm_projects': projects,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def _wanted_projects(self):
+        """Most recently used project paths, from our own use and ProjectManager"""
+        now = time.monotonic()
+        ranked = {}
+        with self.lock:
+            for path, used in self.recent.items():
+                if now - used <= self.idle_ttl:
+                    ranked[path] = time.time() - (now - used)
+
+        if self.project_manager:
+            cutoff = datetime.now() - timedelta(hours=POOL_RECENT_HOURS)
+            for project in self.project_manager.get_projects():
+                accessed = project.get('last_accessed')
+                if not accessed or not project.get('exists'):
+                    continue
+                try:
+                    accessed = datetime.fromisoformat(accessed)
+                except ValueError:
+                    continue
+                if accessed >= cutoff:
+                    path = self.key(project['path'])
+                    ranked[path] = max(ranked.get(path, 0), accessed.timestamp())
+
+        ordered = sorted(ranked, key=ranked.get, reverse=True)
+        return ordered[:self.max_projects]
+
+    def _evict(self, wanted):
+        """Drop dead, unwanted and over-budget idle sessions
+
+        wanted only holds projects used recently, so the idle TTL runs from
+        the project's last use rather than from when its session was spawned.
+        """
+        victims = []
+        with self.lock:
+            for path in list(self.idle):
+                keep = []
+                for spawned_at, session in self.idle[path]:
+                    if not session.running:
+                        continue
+                    if path not in wanted:
+                        victims.append(session)
+                    else:
+                        keep.append((spawned_at, session))
+                self.idle[path] = keep
+
+            # Memory budget: drop the least recently used projects first
+            pooled = [(path, entry) for path in reversed(wanted) for entry in self.idle.get(path, [])]
+        total = self._pooled_rss()
+        for path, entry in pooled:
+            if total <= self.memory_budget:
+                break
+            with self.lock:
+                if entry in self.idle.get(path, []):
+                    self.idle[path].remove(entry)
+                    victims.append(entry[1])
+            total -= process_rss(entry[1].pid)
+
+        for session in victims:
+            session.stop()
+
+    def _pooled_rss(self):
+        with self.lock:
+            pids = [session.pid for entries in self.idle.values() for _, session in entries]
+        return sum(process_rss(pid) for pid in pids)
+
+    def _refill(self, wanted):
+        for path in wanted:
+            while True:
+                with self.lock:
+                    if len(self.idle.get(path, [])) >= self.size:
+                        break
+                if self._pooled_rss() >= self.memory_budget:
+                    return
+                if not os.path.isdir(path):
+                    break
+                try:
+                    session = self.factory(path)
+                except Exception as e:
+                    log.warning("Claude pool failed to pre-spawn for %s: %s", path, e)
+                    break
+                with self.lock:
+                    self.idle.setdefault(path, []).append((time.monotonic(), session))
+                log.info("Claude pool warmed %s", path, extra={'pid': session.pid})
+
+    def _run(self):
+        while True:
+            try:
+                wanted = self._wanted_projects()
+                self._evict(wanted)
+                self._refill(wanted)
+            except Exception:
+                log.exception("Claude pool maintenance failed")
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
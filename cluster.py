@@ -0,0 +1,66 @@
+"""
+Settings shared by every server entry point for multi-worker deployments
+
+Run several single-worker instances (see gunicorn.conf.py and
+start_cluster.sh) behind nginx. Nginx hashes the STICKY_COOKIE set here so a
+browser always reaches the worker that owns its PTYs and jobs, and
+SOCKETIO_MESSAGE_QUEUE lets the workers' Socket.IO servers share events:
+
+    SOCKETIO_MESSAGE_QUEUE=unix:///run/claude/socketio.sock  (message_broker.py)
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0          (needs redis)
+    SOCKETIO_MESSAGE_QUEUE=amqp://guest@localhost//          (needs kombu)
+"""
+import fcntl
+import os
+import secrets
+
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+STICKY_COOKIE = os.environ.get('STICKY_COOKIE', 'claude_client')
+DEBUG = os.environ.get('FLASK_DEBUG', 'true').lower() in ('1', 'true', 'yes')
+LOCK_DIR = os.environ.get('CLUSTER_LOCK_DIR', '/tmp')
+
+_leader_locks = {}
+
+
+def socketio_options():
+    """Keyword arguments for SocketIO(...) matching the deployment mode"""
+    options = {'async_mode': SOCKETIO_ASYNC_MODE}
+    if not SOCKETIO_MESSAGE_QUEUE:
+        return options
+    if SOCKETIO_MESSAGE_QUEUE.startswith('unix://'):
+        from message_broker import UnixSocketManager
+        options['client_manager'] = UnixSocketManager(SOCKETIO_MESSAGE_QUEUE)
+    else:
+        options['message_queue'] = SOCKETIO_MESSAGE_QUEUE
+    return options
+
+
+def init_app(app):
+    """Give each browser a stable cookie for nginx to route on"""
+
+    @app.after_request
+    def set_sticky_cookie(response):
+        from flask import request
+        if STICKY_COOKIE not in request.cookies:
+            response.set_cookie(STICKY_COOKIE, secrets.token_urlsafe(16),
+                                max_age=365 * 24 * 3600, httponly=True, samesite='Lax')
+        return response
+
+
+def is_leader(name):
+    """True in exactly one process on this host per name (held until exit)
+
+    Used for work that must not be duplicated across workers, such as
+    broadcasting filesystem events once a message queue fans them out.
+    """
+    if name in _leader_locks:
+        return True
+    lock_file = open(os.path.join(LOCK_DIR, f"claude-{name}.lock"), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _leader_locks[name] = lock_file
+    return True
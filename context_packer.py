@@ -0,0 +1,283 @@
+"""
+Context packing for files attached to claude -p commands
+
+Each attachment is classified (binary, code, CSV/TSV, log, plain text) and
+reduced to the parts most useful to Claude within a shared token budget:
+symbol outlines for code, header plus evenly sampled rows for tables,
+head/errors/tail for logs and head/tail for everything else. Each file is
+extracted once per content hash at the full budget, as parts that are cut
+to the file's share of the budget at pack time, so re-attaching a file
+costs nothing whatever it is attached with. The packed context is meant to
+be fed over stdin rather than argv.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 8000))
+CONTEXT_CACHE_ENTRIES = int(os.environ.get('CONTEXT_CACHE_ENTRIES', 256))
+CHARS_PER_TOKEN = 4
+SNIFF_BYTES = 8192
+
+CODE_EXTENSIONS = {
+    '.py', '.js', '.jsx', '.ts', '.tsx', '.go', '.rs', '.java', '.kt', '.c', '.h',
+    '.cc', '.cpp', '.hpp', '.cs', '.rb', '.php', '.swift', '.scala', '.sh', '.lua',
+}
+TABLE_EXTENSIONS = {'.csv', '.tsv'}
+LOG_EXTENSIONS = {'.log', '.out', '.err'}
+
+SYMBOL_RE = re.compile(
+    r'^\s*(?:export\s+|public\s+|private\s+|protected\s+|static\s+|async\s+|pub\s+)*'
+    r'(?:def|class|function|func|fn|struct|interface|enum|trait|impl|module|type|const\s+\w+\s*=\s*(?:async\s*)?\()\b'
+)
+PROBLEM_RE = re.compile(r'\b(?:error|exception|traceback|fatal|panic|fail(?:ed|ure)?|warn(?:ing)?)\b', re.I)
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def classify(name, sample):
+    """Kind of file from its name and first bytes"""
+    if b'\0' in sample[:SNIFF_BYTES]:
+        return 'binary'
+    try:
+        sample[:SNIFF_BYTES].decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut at the sniff boundary is still text
+        if e.start < len(sample[:SNIFF_BYTES]) - 4:
+            return 'binary'
+    ext = os.path.splitext(name)[1].lower()
+    if ext in CODE_EXTENSIONS:
+        return 'code'
+    if ext in TABLE_EXTENSIONS:
+        return 'table'
+    if ext in LOG_EXTENSIONS:
+        return 'log'
+    return 'text'
+
+
+def _read_head(path, limit):
+    with open(path, 'rb') as f:
+        data = f.read(limit)
+    return data.decode('utf-8', errors='replace')
+
+
+def _read_tail(path, size, limit):
+    with open(path, 'rb') as f:
+        f.seek(max(size - limit, 0))
+        data = f.read()
+    text = data.decode('utf-8', errors='replace')
+    if size > limit and '\n' in text:
+        text = text.split('\n', 1)[1]  # drop the partial first line
+    return text
+
+
+def _lines(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for number, line in enumerate(f, 1):
+            yield number, line.rstrip('\n')
+
+
+def _take(lines, limit):
+    """Join lines until limit characters are used"""
+    out = []
+    used = 0
+    for line in lines:
+        if used + len(line) + 1 > limit:
+            break
+        out.append(line)
+        used += len(line) + 1
+    return '\n'.join(out)
+
+
+# Extractors return parts: (text, weight, keep). Weight-0 parts are labels kept
+# as they are; the rest share what is left of the limit by weight, keeping
+# their first lines ('head'), last lines ('tail') or evenly spaced ones ('spread').
+
+def _head_tail(path, size, limit):
+    head = _read_head(path, limit * 2 // 3)
+    tail = _read_tail(path, size, limit // 3)
+    return [(head, 2, 'head'), (f"\n... [middle of {size} bytes omitted] ...\n", 0, None),
+            (tail, 1, 'tail')]
+
+
+def _extract_code(path, size, limit):
+    outline = _take((f"{n}: {line.strip()}" for n, line in _lines(path) if SYMBOL_RE.match(line)),
+                    limit // 2)
+    head = _read_head(path, limit - len(outline))
+    return [("Outline (line: symbol):\n", 0, None), (outline, 1, 'head'),
+            ("\n\nBeginning of file:\n", 0, None), (head, 1, 'head'), ("\n...", 0, None)]
+
+
+def _extract_table(path, size, limit):
+    count = 0
+    header = None
+    total_chars = 0
+    for _, line in _lines(path):
+        if header is None:
+            header = line
+        count += 1
+        total_chars += len(line) + 1
+    rows = max(count - 1, 1)
+    average = max(total_chars // max(count, 1), 1)
+    wanted = max((limit - len(header or '')) // average, 1)
+    step = max(-(-rows // wanted), 1)
+    sampled = (line for n, line in _lines(path) if n > 1 and (n - 2) % step == 0)
+    body = _take(sampled, limit - len(header or '') - 64)  # leave room for the footer
+    return [(f"{header}\n", 0, None), (body, 1, 'spread'),
+            (f"\n... [{rows} data rows, evenly sampled]", 0, None)]
+
+
+def _extract_log(path, size, limit):
+    head = _read_head(path, limit // 4)
+    problems = _take((f"{n}: {line}" for n, line in _lines(path) if PROBLEM_RE.search(line)),
+                     limit // 4)
+    tail = _read_tail(path, size, limit // 2)
+    return [(head, 1, 'head'), ("\n...\nError/warning lines:\n", 0, None), (problems, 1, 'spread'),
+            ("\n...\nEnd of log:\n", 0, None), (tail, 2, 'tail')]
+
+
+def _trim(text, limit, keep):
+    """Cut text to at most limit characters on line boundaries"""
+    if len(text) <= limit:
+        return text
+    if keep == 'tail':
+        text = text[len(text) - limit:]
+        return text.split('\n', 1)[1] if '\n' in text else text
+    if keep == 'spread':
+        lines = text.split('\n')
+        average = max(len(text) // len(lines), 1)
+        step = -(-len(lines) // max(limit // average, 1))
+        while step < len(lines) and len('\n'.join(lines[::step])) > limit:
+            step += 1
+        return _take(lines[::step], limit)
+    cut = text.rfind('\n', 0, limit + 1)
+    return text[:cut if cut > 0 else limit]
+
+
+def render(parts, limit):
+    """Join parts within limit characters, sharing the room left by labels by weight"""
+    room = max(limit - sum(len(text) for text, weight, _ in parts if not weight), 0)
+    shares = {}
+    flexible = [i for i, (_, weight, _) in enumerate(parts) if weight]
+    # Parts shorter than their share give the rest to the others
+    while flexible:
+        total = sum(parts[i][1] for i in flexible)
+        small = [i for i in flexible if len(parts[i][0]) <= room * parts[i][1] // total]
+        if not small:
+            for i in flexible:
+                shares[i] = room * parts[i][1] // total
+            break
+        for i in small:
+            shares[i] = len(parts[i][0])
+            room -= shares[i]
+            flexible.remove(i)
+    text = ''.join(_trim(text, shares[i], keep) if weight else text
+                   for i, (text, weight, keep) in enumerate(parts))
+    return text[:limit]
+
+
+def _fit(extract, limit):
+    """(kind, text) for a cached extract, at most limit characters"""
+    kind, whole, parts = extract
+    return kind, whole if whole is not None and len(whole) <= limit else render(parts, limit)
+
+
+EXTRACTORS = {
+    'code': _extract_code,
+    'table': _extract_table,
+    'log': _extract_log,
+    'text': _head_tail,
+}
+
+
+class ContextPacker:
+    """Budgeted, cached extraction of attachment context"""
+
+    def __init__(self, budget_tokens=None, cache_entries=None):
+        self.budget_tokens = budget_tokens or CONTEXT_TOKEN_BUDGET
+        self.cache_entries = CONTEXT_CACHE_ENTRIES if cache_entries is None else cache_entries
+        self.cache = OrderedDict()  # digest -> (kind, whole text or None, parts at the full budget)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def pack(self, files):
+        """Build one context block for [(path, name, digest or None), ...]
+
+        Smaller files are packed first and any budget they leave unused is
+        shared among the larger ones.
+        """
+        entries = []
+        for path, name, digest in files:
+            try:
+                entries.append((os.path.getsize(path), path, name, digest))
+            except OSError as e:
+                log.warning("Skipping attachment %s: %s", name, e)
+        entries.sort(key=lambda entry: entry[0])
+
+        remaining = self.budget_tokens * CHARS_PER_TOKEN
+        sections = []
+        for index, (size, path, name, digest) in enumerate(entries):
+            limit = remaining // (len(entries) - index)
+            try:
+                kind, extract = self.extract(path, name, size, limit, digest)
+            except OSError as e:
+                log.warning("Skipping attachment %s: %s", name, e)
+                continue
+            remaining -= len(extract)
+            sections.append(f"### {name} ({kind}, {size} bytes)\n{extract}")
+
+        if not sections:
+            return ''
+        return 'Context files:\n\n' + '\n\n'.join(sections) + '\n'
+
+    def extract(self, path, name, size, limit, digest=None):
+        """(kind, text) for one file, at most limit characters"""
+        key = digest or file_digest(path)
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return _fit(cached, limit)
+            self.misses += 1
+        full = self.budget_tokens * CHARS_PER_TOKEN
+
+        with open(path, 'rb') as f:
+            sample = f.read(SNIFF_BYTES)
+        kind = classify(name, sample)
+        if kind == 'binary':
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            parts = [(f"[binary file, {mimetype}; contents not included]", 0, None)]
+        else:
+            parts = EXTRACTORS[kind](path, size, full)
+        # Files that fit the full budget are kept whole for the packs with room for them
+        whole = _read_head(path, size) if kind != 'binary' and size <= full else None
+
+        with self.lock:
+            self.cache[key] = (kind, whole, parts)
+            while len(self.cache) > self.cache_entries:
+                self.cache.popitem(last=False)
+        return _fit((kind, whole, parts), limit)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.cache),
+                'hits': self.hits,
+                'misses': self.misses,
+                'budget_tokens': self.budget_tokens,
+            }
@@ -0,0 +1,151 @@
+"""
+Bounded conversation memory for chat sessions
+
+Keeps the most recent turns of a conversation within a byte and turn
+budget. Roles are interned, turns older than the newest few are stored
+zlib-compressed, and turns that fall out of the budget are optionally
+appended to a spill file and folded into a short running summary. The
+store can render a windowed history to prepend to the next Claude call.
+"""
+import json
+import logging
+import os
+import sys
+import zlib
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+CHAT_HISTORY_BYTES = int(os.environ.get('CHAT_HISTORY_BYTES', 64 * 1024))
+CHAT_HISTORY_TURNS = int(os.environ.get('CHAT_HISTORY_TURNS', 50))
+CHAT_RAW_TURNS = int(os.environ.get('CHAT_RAW_TURNS', 4))
+CHAT_SUMMARY_BYTES = int(os.environ.get('CHAT_SUMMARY_BYTES', 2048))
+CHAT_HISTORY_SPILL_DIR = os.environ.get('CHAT_HISTORY_SPILL_DIR')
+SUMMARY_LINE_CHARS = 160
+
+ROLE_LABELS = {'user': 'User', 'assistant': 'Assistant'}
+
+
+class Turn:
+    __slots__ = ('role', 'data', 'compressed')
+
+    def __init__(self, role, content):
+        self.role = sys.intern(role)
+        self.data = content.encode('utf-8')
+        self.compressed = False
+
+    def compress(self):
+        if not self.compressed:
+            packed = zlib.compress(self.data, 6)
+            if len(packed) < len(self.data):
+                self.data = packed
+                self.compressed = True
+
+    @property
+    def content(self):
+        data = zlib.decompress(self.data) if self.compressed else self.data
+        return data.decode('utf-8')
+
+    def stored_bytes(self):
+        return len(self.data)
+
+
+class ConversationStore:
+    """Per-session turn buffer with a byte/turn budget"""
+
+    def __init__(self, session_id, max_bytes=None, max_turns=None, spill_dir=None):
+        self.session_id = session_id
+        self.max_bytes = max_bytes or CHAT_HISTORY_BYTES
+        self.max_turns = max_turns or CHAT_HISTORY_TURNS
+        self.spill_dir = spill_dir or CHAT_HISTORY_SPILL_DIR
+        self.turns = deque()
+        self.stored = 0  # bytes held by turns (after compression)
+        self.summary = deque()  # one short line per evicted turn
+        self.summary_bytes = 0
+        self.evicted = 0
+
+    def append(self, role, content):
+        """Record a turn, compressing and evicting older turns as needed"""
+        turn = Turn(role, content)
+        self.turns.append(turn)
+        self.stored += turn.stored_bytes()
+
+        if len(self.turns) > CHAT_RAW_TURNS:
+            old = self.turns[-CHAT_RAW_TURNS - 1]
+            before = old.stored_bytes()
+            old.compress()
+            self.stored += old.stored_bytes() - before
+
+        while len(self.turns) > 1 and (self.memory_bytes() > self.max_bytes or len(self.turns) > self.max_turns):
+            self._evict(self.turns.popleft())
+
+    def _evict(self, turn):
+        self.stored -= turn.stored_bytes()
+        self.evicted += 1
+        content = turn.content
+        if self.spill_dir:
+            self._spill(turn.role, content)
+
+        # Summary keeps the gist of each dropped turn: its first line, shortened
+        first_line = content.strip().split('\n', 1)[0][:SUMMARY_LINE_CHARS]
+        line = f"{ROLE_LABELS.get(turn.role, turn.role)}: {first_line}"
+        self.summary.append(line)
+        self.summary_bytes += len(line)
+        while self.summary_bytes > CHAT_SUMMARY_BYTES and self.summary:
+            self.summary_bytes -= len(self.summary.popleft())
+
+    def _spill(self, role, content):
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{self.session_id}.jsonl")
+            with open(path, 'a') as f:
+                f.write(json.dumps({'role': role, 'content': content}) + '\n')
+        except OSError as e:
+            log.warning("Failed to spill conversation: %s", e, extra={'session': self.session_id})
+
+    def context(self, max_chars):
+        """Summary of dropped turns plus the newest turns, within max_chars"""
+        if max_chars <= 0 or not self.turns:
+            return ''
+        recent = []
+        used = 0
+        for turn in reversed(self.turns):
+            text = f"{ROLE_LABELS.get(turn.role, turn.role)}: {turn.content}"
+            if used + len(text) > max_chars:
+                break
+            recent.append(text)
+            used += len(text) + 2
+
+        summary = []
+        for line in reversed(self.summary):
+            if used + len(line) > max_chars:
+                break
+            summary.append(line)
+            used += len(line) + 1
+
+        parts = []
+        if summary:
+            parts.append("Summary of earlier conversation:\n" + '\n'.join(reversed(summary)))
+        if recent:
+            parts.append("Recent conversation:\n" + '\n\n'.join(reversed(recent)))
+        return '\n\n'.join(parts)
+
+    def memory_bytes(self):
+        """Approximate payload memory held for this session"""
+        return self.stored + self.summary_bytes
+
+    def __len__(self):
+        return len(self.turns)
+
+    def stats(self):
+        return {
+            'turns': len(self.turns),
+            'bytes': self.memory_bytes(),
+            'evicted': self.evicted,
+        }
+
+    def clear(self):
+        self.turns.clear()
+        self.summary.clear()
+        self.stored = 0
+        self.summary_bytes = 0
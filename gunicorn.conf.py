@@ -0,0 +1,29 @@
+"""
+Gunicorn settings for one server instance
+
+Each instance runs a single worker: PTYs, the warm Claude pool and running
+jobs live inside the worker process, and Socket.IO long-polling needs every
+request of a client to reach the same process. Scale out by starting more
+instances on consecutive ports (start_cluster.sh) behind nginx, which keeps
+each browser on one instance via the sticky cookie (see cluster.py).
+
+The worker must be gthread: the PTY reactor, process supervisor and job
+runner use real OS threads and selectors, which eventlet/gevent monkey
+patching would turn into green ones that never wake.
+
+    PORT=8081 gunicorn -c gunicorn.conf.py server:app
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class != 'gthread':
+    raise SystemExit(f"GUNICORN_WORKER_CLASS={worker_class} is not supported; use gthread")
+workers = 1
+threads = int(os.environ.get('GUNICORN_THREADS', 100))
+timeout = 120
+graceful_timeout = 30
+
+# Flask-SocketIO has to use the same concurrency model as the worker
+os.environ['SOCKETIO_ASYNC_MODE'] = 'threading'
+os.environ.setdefault('FLASK_DEBUG', 'false')
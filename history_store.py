@@ -0,0 +1,168 @@
+"""
+Persistent command history backed by SQLite
+
+Entries are queued by request handlers and written in batches by a single
+writer thread, so the request path never waits on disk. The table is
+indexed by (session_id, id), (project_path, id) and timestamp, which keeps
+"last N for this session" an index range scan at any table size. Old rows
+are pruned according to HISTORY_RETENTION_DAYS.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+log = logging.getLogger(__name__)
+
+HISTORY_DB = os.environ.get('HISTORY_DB', 'history.db')
+HISTORY_RETENTION_DAYS = float(os.environ.get('HISTORY_RETENTION_DAYS', 30))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS command_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    project_path TEXT,
+    command TEXT NOT NULL,
+    files TEXT NOT NULL DEFAULT '[]',
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_session ON command_history (session_id, id);
+CREATE INDEX IF NOT EXISTS idx_history_project ON command_history (project_path, id);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON command_history (timestamp);
+"""
+
+INSERT_SQL = (
+    'INSERT INTO command_history (session_id, project_path, command, files, timestamp) '
+    'VALUES (?, ?, ?, ?, ?)'
+)
+
+
+class HistoryStore:
+    """SQLite (WAL) command history with a batching writer thread"""
+
+    def __init__(self, path=None, retention_days=None, flush_interval=0.2, batch_size=500):
+        self.path = path or HISTORY_DB
+        self.retention_days = HISTORY_RETENTION_DAYS if retention_days is None else retention_days
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.pending = queue.Queue()
+        self.local = threading.local()
+        self.last_prune = 0
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self.thread = threading.Thread(target=self._writer, name='history-writer', daemon=True)
+        self.thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reader(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self._connect()
+        return conn
+
+    def add(self, command, session_id, project_path=None, files=None, timestamp=None):
+        """Queue a history entry; it is written by the background thread"""
+        self.pending.put(('add', (
+            session_id,
+            project_path,
+            command,
+            json.dumps(files or []),
+            timestamp or datetime.now().isoformat(),
+        )))
+
+    def clear(self, session_id):
+        """Queue removal of every entry for session_id (ordered after earlier adds)"""
+        self.pending.put(('clear', session_id))
+
+    def recent(self, session_id=None, project_path=None, limit=50, before_id=None):
+        """Newest `limit` entries (returned oldest first), optionally before an id
+
+        Pass the smallest id of a page as before_id to fetch the previous page.
+        """
+        if session_id is not None:
+            where, args = 'session_id = ?', [session_id]
+        elif project_path is not None:
+            where, args = 'project_path = ?', [project_path]
+        else:
+            where, args = '1 = 1', []
+        if before_id is not None:
+            where += ' AND id < ?'
+            args.append(before_id)
+        args.append(limit)
+
+        rows = self._reader().execute(
+            f'SELECT id, session_id, project_path, command, files, timestamp '
+            f'FROM command_history WHERE {where} ORDER BY id DESC LIMIT ?', args
+        ).fetchall()
+        return [self._entry(row) for row in reversed(rows)]
+
+    @staticmethod
+    def _entry(row):
+        return {
+            'id': row['id'],
+            'command': row['command'],
+            'timestamp': row['timestamp'],
+            'session_id': row['session_id'],
+            'project_path': row['project_path'],
+            'files': json.loads(row['files']),
+        }
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far has been written"""
+        done = threading.Event()
+        self.pending.put(('sync', done))
+        done.wait(timeout)
+
+    def _writer(self):
+        conn = self._connect()
+        while True:
+            ops = [self.pending.get()]
+            # Give bursts a moment to accumulate, then take them all at once
+            time.sleep(self.flush_interval)
+            while len(ops) < self.batch_size:
+                try:
+                    ops.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._apply(conn, ops)
+            except sqlite3.Error as e:
+                log.warning("History write failed: %s", e)
+            for action, arg in ops:
+                if action == 'sync':
+                    arg.set()
+
+    def _apply(self, conn, ops):
+        with conn:
+            rows = []
+            for action, arg in ops:
+                if action == 'add':
+                    rows.append(arg)
+                    continue
+                # Keep ordering: write queued adds before a clear
+                if rows:
+                    conn.executemany(INSERT_SQL, rows)
+                    rows = []
+                if action == 'clear':
+                    conn.execute('DELETE FROM command_history WHERE session_id = ?', (arg,))
+            if rows:
+                conn.executemany(INSERT_SQL, rows)
+
+        if self.retention_days and time.monotonic() - self.last_prune > 3600:
+            self.last_prune = time.monotonic()
+            cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+            with conn:
+                conn.execute('DELETE FROM command_history WHERE timestamp < ?', (cutoff,))
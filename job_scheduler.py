@@ -0,0 +1,267 @@
+"""
+Bounded, fair scheduler for Claude command jobs
+
+Replaces a plain ThreadPoolExecutor: jobs wait in per-session queues and
+are dispatched round-robin across sessions, subject to per-session,
+per-project and global concurrency limits. Waiting jobs can be cancelled
+and their queue position is reported back to the client.
+
+Coroutine functions run on the shared asyncio loop instead of a worker
+thread, so long claude runs do not each hold an OS thread.
+
+A job's slot is released by the job itself when it returns (or, for a
+cancelled coroutine, once its teardown has finished), and a job cancelled
+before it got going never calls fn at all.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from async_runner import get_runner
+
+log = logging.getLogger(__name__)
+
+JOB_MEMORY_MB = float(os.environ.get('CLAUDE_JOB_MEMORY_MB', 300))
+
+
+def default_max_workers():
+    """Global job cap derived from CPU count and available memory"""
+    if os.environ.get('MAX_CONCURRENT_JOBS'):
+        return max(int(os.environ['MAX_CONCURRENT_JOBS']), 1)
+
+    cap = (os.cpu_count() or 1) * 4
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    available_mb = int(line.split()[1]) / 1024
+                    cap = min(cap, int(available_mb // JOB_MEMORY_MB))
+                    break
+    except (OSError, ValueError, IndexError):
+        pass
+    return max(cap, 1)
+
+
+class Job:
+    """A queued or running unit of work for one session"""
+
+    def __init__(self, job_id, session_id, project, fn, args):
+        self.job_id = job_id
+        self.session_id = session_id
+        self.project = project
+        self.fn = fn
+        self.args = args
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.cancelled = False
+        self.started = False  # fn has been called
+        self.position = None
+        self.future = None
+        self.task = None  # asyncio task of a running coroutine job
+
+
+class JobScheduler:
+    """Round-robin job queues with per-session, per-project and global limits"""
+
+    def __init__(self, max_workers=None, per_session=None, per_project=None, on_queued=None):
+        self.max_workers = max_workers or default_max_workers()
+        self.per_session = per_session or int(os.environ.get('JOBS_PER_SESSION', 1))
+        self.per_project = per_project or int(os.environ.get('JOBS_PER_PROJECT', 2))
+        self.on_queued = on_queued
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        self.queues = OrderedDict()  # session_id -> deque of waiting jobs, in rotation order
+        self.running_by_session = {}
+        self.running_by_project = {}
+        self.active = {}  # job_id -> running job
+        self.running = 0
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+        # Metrics
+        self.submitted = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def submit(self, session_id, project, fn, *args):
+        """Queue fn(*args) for session_id and dispatch whatever can run now"""
+        with self.lock:
+            job = Job(next(self.ids), session_id, project, fn, args)
+            self.queues.setdefault(session_id, deque()).append(job)
+            self.submitted += 1
+        self._dispatch()
+        return job
+
+    def cancel(self, session_id):
+        """Drop every job session_id still has waiting; returns how many"""
+        with self.lock:
+            jobs = self.queues.pop(session_id, deque())
+            for job in jobs:
+                job.cancelled = True
+            self.cancelled += len(jobs)
+        if jobs:
+            self._notify_positions()
+        return len(jobs)
+
+    def cancel_running(self, session_id):
+        """Cancel the running jobs of session_id; returns how many were signalled
+
+        Jobs that have not called fn yet never will; coroutine jobs are
+        cancelled on the loop. A thread job already inside fn runs to the end.
+        """
+        count = 0
+        with self.lock:
+            for job in self.active.values():
+                if job.session_id != session_id or job.cancelled:
+                    continue
+                job.cancelled = True
+                if job.task is not None:
+                    job.task.get_loop().call_soon_threadsafe(job.task.cancel)
+                    count += 1
+                elif not job.started:
+                    count += 1
+        return count
+
+    def stats(self):
+        with self.lock:
+            started = self.completed + self.running
+            return {
+                'running': self.running,
+                'queued': sum(len(q) for q in self.queues.values()),
+                'max_workers': self.max_workers,
+                'per_session': self.per_session,
+                'per_project': self.per_project,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'avg_wait_seconds': round(self.wait_total / started, 3) if started else 0,
+                'max_wait_seconds': round(self.wait_max, 3),
+            }
+
+    def _can_run(self, job):
+        return (self.running < self.max_workers
+                and self.running_by_session.get(job.session_id, 0) < self.per_session
+                and (job.project is None
+                     or self.running_by_project.get(job.project, 0) < self.per_project))
+
+    def _dispatch(self):
+        started = []
+        with self.lock:
+            progress = True
+            while progress and self.running < self.max_workers:
+                progress = False
+                for session_id in list(self.queues):
+                    queue = self.queues[session_id]
+                    if not self._can_run(queue[0]):
+                        continue
+                    job = queue.popleft()
+                    if queue:
+                        # Rotate so the next pick goes to another session
+                        self.queues.move_to_end(session_id)
+                    else:
+                        del self.queues[session_id]
+                    self._mark_running(job)
+                    started.append(job)
+                    progress = True
+                    break
+
+            # Under the lock, so cancel_running always sees the job's future
+            for job in started:
+                if asyncio.iscoroutinefunction(job.fn):
+                    job.future = get_runner().submit(self._run_async(job))
+                else:
+                    job.future = self.executor.submit(self._run_sync, job)
+        self._notify_positions()
+
+    def _begin(self, job):
+        """Mark job as started unless it was cancelled first"""
+        with self.lock:
+            if job.cancelled:
+                return False
+            job.started = True
+            if asyncio.iscoroutinefunction(job.fn):
+                job.task = asyncio.current_task()
+            return True
+
+    def _run_sync(self, job):
+        try:
+            if self._begin(job):
+                return job.fn(*job.args)
+        except Exception:
+            log.exception("Job %s failed", job.job_id, extra={'session': job.session_id})
+        finally:
+            self._finish(job)
+
+    async def _run_async(self, job):
+        try:
+            if self._begin(job):
+                return await job.fn(*job.args)
+        except Exception:
+            log.exception("Job %s failed", job.job_id, extra={'session': job.session_id})
+        finally:
+            self._finish(job)
+
+    def _mark_running(self, job):
+        job.started_at = time.monotonic()
+        wait = job.started_at - job.submitted_at
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.running += 1
+        self.active[job.job_id] = job
+        self.running_by_session[job.session_id] = self.running_by_session.get(job.session_id, 0) + 1
+        if job.project is not None:
+            self.running_by_project[job.project] = self.running_by_project.get(job.project, 0) + 1
+
+    def _finish(self, job):
+        with self.lock:
+            self.running -= 1
+            self.completed += 1
+            self.active.pop(job.job_id, None)
+            self._decrement(self.running_by_session, job.session_id)
+            if job.project is not None:
+                self._decrement(self.running_by_project, job.project)
+        self._dispatch()
+
+    @staticmethod
+    def _decrement(counts, key):
+        counts[key] -= 1
+        if not counts[key]:
+            del counts[key]
+
+    def _positions(self):
+        """1-based position of every waiting job in round-robin dispatch order"""
+        positions = []
+        rotation = list(self.queues.items())
+        depth = 0
+        position = 0
+        while True:
+            any_left = False
+            for _, queue in rotation:
+                if depth < len(queue):
+                    any_left = True
+                    position += 1
+                    positions.append((queue[depth], position))
+            if not any_left:
+                return positions
+            depth += 1
+
+    def _notify_positions(self):
+        if not self.on_queued:
+            return
+        with self.lock:
+            positions = [(job, position) for job, position in self._positions()
+                         if job.position != position]
+            for job, position in positions:
+                job.position = position
+        for job, position in positions:
+            try:
+                self.on_queued(job, position)
+            except Exception as e:
+                log.warning("Failed to report queue position for job %s: %s", job.job_id, e)
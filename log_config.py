@@ -0,0 +1,111 @@
+"""
+Logging for every server
+
+Log calls only put records on a bounded queue. A QueueListener thread does
+the formatting and the writes to stdout, so a slow stdout pipe never stalls
+a Socket.IO handler or the reactor. If the queue fills, records are dropped
+and counted; callers never block.
+
+Levels are set per logger from the environment:
+
+    LOG_LEVEL=INFO                                   root level
+    LOG_LEVELS=session_runtime.stream=DEBUG,app=WARNING
+
+High-volume stream logs (every output chunk or line) go to '<module>.stream'
+loggers. Those are DEBUG-only and sampled, so even when enabled only one
+record in LOG_SAMPLE_EVERY is kept. Structured fields passed as
+extra={'session': ..., 'pid': ..., 'bytes': ...} are appended as key=value.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_SAMPLE_EVERY = max(1, int(os.environ.get('LOG_SAMPLE_EVERY', 100)))
+
+FIELDS = ('session', 'pid', 'bytes')
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class FieldFormatter(logging.Formatter):
+    """Standard line plus the structured fields a record carries"""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = [f'{name}={getattr(record, name)}' for name in FIELDS
+                  if getattr(record, name, None) is not None]
+        return f"{line} {' '.join(fields)}" if fields else line
+
+
+class SampleFilter(logging.Filter):
+    """Pass one record in every n"""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self.seen = 0
+
+    def filter(self, record):
+        self.seen += 1
+        return (self.seen - 1) % self.every == 0
+
+
+def stream_logger(name):
+    """Sampled DEBUG logger for per-chunk/per-line logs of module name"""
+    log = logging.getLogger(f'{name}.stream')
+    if not log.filters:
+        log.addFilter(SampleFilter(LOG_SAMPLE_EVERY))
+    return log
+
+
+def setup():
+    """Install the queue handler and per-module levels (once per process)"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(FieldFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        _listener = logging.handlers.QueueListener(log_queue, output)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        root = logging.getLogger()
+        root.handlers[:] = [DroppingQueueHandler(log_queue)]
+        root.setLevel(LOG_LEVEL)
+        for entry in LOG_LEVELS.split(','):
+            name, _, level = entry.partition('=')
+            if name.strip() and level.strip():
+                logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def stats():
+    handlers = [h for h in logging.getLogger().handlers if isinstance(h, DroppingQueueHandler)]
+    return {'dropped': sum(h.dropped for h in handlers)}
@@ -0,0 +1,188 @@
+"""
+Unix-socket message queue for running several server processes
+
+A tiny fan-out broker plus a python-socketio client manager that talks to
+it, so emits from one worker reach clients connected to another. It is the
+local stand-in for Redis/Kombu: set SOCKETIO_MESSAGE_QUEUE=unix:///path.sock
+and start the broker once per host with
+
+    python message_broker.py /path.sock
+
+A connection starts with one byte, P (publish only) or S (also receive),
+then carries frames: a 4-byte big-endian length followed by a pickled
+message. Pickle rather than JSON because python-socketio puts binary
+attachments in messages as raw bytes; only processes that can open the
+socket (mode 0660) can publish.
+"""
+import logging
+import os
+import pickle
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+
+from socketio import PubSubManager
+
+log = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct('>I')
+MAX_PENDING_BYTES = 16 * 1024 * 1024  # per subscriber; slower ones are dropped
+
+
+def run_broker(path):
+    """Relay every frame received from one client to all the others"""
+    if os.path.exists(path):
+        os.remove(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    os.chmod(path, 0o660)
+    server.listen(64)
+    server.setblocking(False)
+
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    inbound = {}  # client -> bytearray of partial frames
+    outbound = {}  # subscriber -> bytearray waiting to be written
+    roles = {}  # client -> b'P' or b'S'
+    log.info("Message broker listening on %s", path)
+
+    def drop(client):
+        selector.unregister(client)
+        client.close()
+        inbound.pop(client, None)
+        outbound.pop(client, None)
+        roles.pop(client, None)
+
+    def want_write(client):
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if outbound[client] else 0)
+        selector.modify(client, events)
+
+    while True:
+        for key, events in selector.select():
+            sock = key.fileobj
+            if sock is server:
+                client, _ = server.accept()
+                client.setblocking(False)
+                inbound[client] = bytearray()
+                selector.register(client, selectors.EVENT_READ)
+                continue
+            if sock not in inbound:
+                continue  # dropped earlier in this batch
+
+            if events & selectors.EVENT_WRITE and sock in outbound:
+                try:
+                    sent = sock.send(outbound[sock])
+                    del outbound[sock][:sent]
+                    want_write(sock)
+                except OSError:
+                    drop(sock)
+                    continue
+
+            if events & selectors.EVENT_READ:
+                try:
+                    data = sock.recv(256 * 1024)
+                except OSError:
+                    data = b''
+                if not data:
+                    drop(sock)
+                    continue
+                if sock not in roles:
+                    roles[sock] = data[:1]
+                    data = data[1:]
+                    if roles[sock] == b'S':
+                        outbound[sock] = bytearray()
+                buffer = inbound[sock]
+                buffer += data
+                # Forward whole frames only; the tail waits for more data
+                end = 0
+                while len(buffer) - end >= FRAME_HEADER.size:
+                    length, = FRAME_HEADER.unpack_from(buffer, end)
+                    if len(buffer) - end - FRAME_HEADER.size < length:
+                        break
+                    end += FRAME_HEADER.size + length
+                if not end:
+                    continue
+                frames = bytes(buffer[:end])
+                del buffer[:end]
+                for other in list(outbound):
+                    if other is sock:
+                        continue
+                    outbound[other] += frames
+                    if len(outbound[other]) > MAX_PENDING_BYTES:
+                        log.warning("Dropping a subscriber that stopped reading")
+                        drop(other)
+                    else:
+                        want_write(other)
+
+
+class UnixSocketManager(PubSubManager):
+    """Socket.IO client manager using the Unix-socket broker"""
+
+    name = 'unix'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = url[len('unix://'):] if url.startswith('unix://') else url
+        self.publish_lock = threading.Lock()
+        self.publisher = None
+
+    def _connect(self, role):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        sock.sendall(role)
+        return sock
+
+    def _publish(self, data):
+        frame = pickle.dumps({'channel': self.channel, 'data': data}, pickle.HIGHEST_PROTOCOL)
+        with self.publish_lock:
+            for attempt in range(2):
+                try:
+                    if self.publisher is None:
+                        self.publisher = self._connect(b'P')
+                    self.publisher.sendall(FRAME_HEADER.pack(len(frame)) + frame)
+                    return
+                except OSError as e:
+                    if self.publisher is not None:
+                        self.publisher.close()
+                        self.publisher = None
+                    if attempt:
+                        self._get_logger().error(f'Message broker publish failed: {e}')
+
+    def _listen(self):
+        # PubSubManager stops listening for good if this returns, so reconnect forever
+        while True:
+            try:
+                sock = self._connect(b'S')
+            except OSError as e:
+                self._get_logger().error(f'Message broker unavailable ({e}); retrying')
+                time.sleep(1)
+                continue
+            buffer = bytearray()
+            try:
+                while True:
+                    data = sock.recv(256 * 1024)
+                    if not data:
+                        break
+                    buffer += data
+                    while len(buffer) >= FRAME_HEADER.size:
+                        length, = FRAME_HEADER.unpack_from(buffer)
+                        if len(buffer) < FRAME_HEADER.size + length:
+                            break
+                        message = pickle.loads(buffer[FRAME_HEADER.size:FRAME_HEADER.size + length])
+                        del buffer[:FRAME_HEADER.size + length]
+                        if message.get('channel') == self.channel:
+                            yield message['data']
+            except OSError as e:
+                self._get_logger().error(f'Message broker connection lost: {e}')
+            finally:
+                sock.close()
+            time.sleep(1)
+
+
+if __name__ == '__main__':
+    import log_config
+    log_config.setup()
+    run_broker(sys.argv[1] if len(sys.argv) > 1 else os.environ.get('MESSAGE_BROKER_SOCKET', '/tmp/claude-socketio.sock'))
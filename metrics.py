@@ -0,0 +1,282 @@
+"""
+Prometheus metrics shared by every server
+
+Each process keeps one set of metrics, whichever servers it runs, and
+serves them as Prometheus text at /metrics (init_app). The metrics that
+matter for streaming are defined here, so every server reports the same
+names:
+
+- spawn latency and time to first output byte of Claude processes
+- emit latency, output frame sizes and bytes in/out per Socket.IO event
+- queue depth, running children, open fds, threads and RSS, read when
+  /metrics is scraped
+
+Recording is cheap enough for the read loop. A labelled child is looked up
+once and cached, and a histogram observation is one bisect plus two
+increments. Updates take no lock. Under the GIL a concurrent increment can
+very rarely be lost, which is acceptable for monitoring.
+"""
+import bisect
+import os
+import threading
+import time
+
+from flask import Response
+from flask_socketio import Namespace
+
+import log_config
+from process_supervisor import get_supervisor
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144)
+
+_metrics = []
+_create_lock = threading.Lock()
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        _metrics.append(self)
+
+    def labels(self, *values):
+        """Child for these label values (created once, then a dict lookup)"""
+        child = self.children.get(values)
+        if child is None:
+            with _create_lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=''):
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for values, child in list(self.children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f'{self.name}{self._label_text(values)} {_number(child.value)}']
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), list(child.counts)):
+            total += count
+            le = '+Inf' if bound == float('inf') else _number(bound)
+            le_label = f'le="{le}"'
+            lines.append(f'{self.name}_bucket{self._label_text(values, le_label)} {total}')
+        lines.append(f'{self.name}_sum{self._label_text(values)} {_number(child.sum)}')
+        lines.append(f'{self.name}_count{self._label_text(values)} {total}')
+        return lines
+
+
+class Gauge(_Metric):
+    """Read when scraped: fn() returns a number, or (label values, number) pairs"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, fn, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            value = None
+        if value is None:
+            return []
+        samples = [((), value)] if isinstance(value, (int, float)) else value
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge']
+        lines.extend(f'{self.name}{self._label_text(values)} {_number(number)}'
+                     for values, number in samples)
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def payload_bytes(data):
+    """Approximate size of an event payload (str/bytes values, one level deep)"""
+    if isinstance(data, (str, bytes, bytearray)):
+        return len(data)
+    if isinstance(data, dict):
+        return sum(len(value) for value in data.values() if isinstance(value, (str, bytes, bytearray)))
+    return 0
+
+
+def render():
+    lines = []
+    for metric in list(_metrics):
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Serve /metrics from app (once, however many servers it mounts)"""
+    if 'metrics' in app.view_functions:
+        return
+    app.add_url_rule('/metrics', 'metrics',
+                     lambda: Response(render(), mimetype='text/plain; version=0.0.4'))
+
+
+# Process gauges, read from /proc where available
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes(pid='self'):
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _open_fds():
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def _child_rss():
+    samples = []
+    for pid in get_supervisor().pids():
+        rss = rss_bytes(pid)
+        if rss is not None:
+            samples.append(((pid,), rss))
+    return samples
+
+
+Gauge('process_open_fds', 'Open file descriptors', _open_fds)
+Gauge('process_threads', 'Live Python threads', threading.active_count)
+Gauge('process_resident_memory_bytes', 'Resident memory of this process', rss_bytes)
+Gauge('log_records_dropped', 'Log records dropped because the log queue was full',
+      lambda: log_config.stats()['dropped'])
+Gauge('child_resident_memory_bytes', 'Resident memory of each supervised child', _child_rss, ('pid',))
+
+
+# Streaming metrics
+
+SPAWN_SECONDS = Histogram('claude_spawn_seconds', 'Time to start a Claude process', ('kind',))
+FIRST_BYTE_SECONDS = Histogram('claude_first_byte_seconds',
+                               'Time from starting Claude to its first output byte', ('kind',))
+EMIT_SECONDS = Histogram('socketio_emit_seconds', 'Time spent in a Socket.IO emit',
+                         ('namespace', 'event'))
+FRAME_BYTES = Histogram('output_frame_bytes', 'Size of output frames before encoding',
+                        ('event',), SIZE_BUCKETS)
+BYTES_IN = Counter('socketio_received_bytes_total', 'Payload bytes received per event',
+                   ('namespace', 'event'))
+BYTES_OUT = Counter('socketio_sent_bytes_total', 'Payload bytes sent per event',
+                    ('namespace', 'event'))
+
+_schedulers = {}
+_children = {}
+
+
+def track_scheduler(name, scheduler):
+    """Report scheduler's queued and running jobs as executor gauges"""
+    _schedulers[name] = scheduler
+
+
+def track_children(kind, count):
+    """Report count() as the number of running children of this kind"""
+    _children[kind] = count
+
+
+Gauge('executor_queue_depth', 'Jobs waiting for an executor slot',
+      lambda: [((name,), s.stats()['queued']) for name, s in list(_schedulers.items())], ('scheduler',))
+Gauge('executor_running_jobs', 'Jobs currently running',
+      lambda: [((name,), s.stats()['running']) for name, s in list(_schedulers.items())], ('scheduler',))
+Gauge('active_children', 'Running Claude processes by kind (pty, pipe, prompt)',
+      lambda: [((kind,), count()) for kind, count in list(_children.items())], ('kind',))
+
+
+def record_emit(namespace, event, data, seconds):
+    EMIT_SECONDS.labels(namespace, event).observe(seconds)
+    BYTES_OUT.labels(namespace, event).inc(payload_bytes(data))
+
+
+class MeteredNamespace(Namespace):
+    """Namespace that counts bytes in and out and times its emits"""
+
+    def trigger_event(self, event, *args):
+        # args are (sid, data, ...); only handled events get a label
+        if len(args) > 1 and event not in ('connect', 'disconnect') and hasattr(self, 'on_' + event):
+            BYTES_IN.labels(self.namespace, event).inc(payload_bytes(args[1]))
+        return super().trigger_event(event, *args)
+
+    def emit(self, event, data=None, room=None, include_self=True, namespace=None,
+             callback=None, ignore_queue=False):
+        """Namespace.emit, plus ignore_queue for events only this worker's client needs"""
+        started = time.perf_counter()
+        result = self.socketio.emit(event, data, room=room, include_self=include_self,
+                                    namespace=namespace or self.namespace, callback=callback,
+                                    ignore_queue=ignore_queue)
+        record_emit(self.namespace, event, data, time.perf_counter() - started)
+        return result
@@ -0,0 +1,82 @@
+"""
+Chunked accumulator for streamed command output
+
+Collects output as a list of chunks instead of repeated string
+concatenation, keeps a running byte count and SHA-256, spills to a temp
+file once the in-memory part grows past a threshold, and stops keeping
+data (while still counting it) past an optional hard cap.
+"""
+import hashlib
+import os
+import tempfile
+
+OUTPUT_MEMORY_BYTES = int(os.environ.get('OUTPUT_MEMORY_BYTES', 1024 * 1024))
+OUTPUT_MAX_BYTES = int(os.environ.get('OUTPUT_MAX_BYTES', 64 * 1024 * 1024))
+
+
+class OutputAccumulator:
+    """Append-only text buffer with spill-to-disk and a size cap"""
+
+    def __init__(self, memory_limit=None, max_bytes=None, spill_dir=None):
+        self.memory_limit = OUTPUT_MEMORY_BYTES if memory_limit is None else memory_limit
+        self.max_bytes = OUTPUT_MAX_BYTES if max_bytes is None else max_bytes
+        self.spill_dir = spill_dir
+        self.chunks = []
+        self.memory_bytes = 0
+        self.kept_bytes = 0
+        self.total_bytes = 0
+        self.hash = hashlib.sha256()
+        self.spill = None
+        self.truncated = False
+
+    def append(self, text):
+        """Add a chunk of output"""
+        if not text:
+            return
+        data = text.encode('utf-8')
+        self.total_bytes += len(data)
+        self.hash.update(data)
+
+        if self.max_bytes and self.kept_bytes + len(data) > self.max_bytes:
+            self.truncated = True
+            return
+        self.kept_bytes += len(data)
+        self.chunks.append(data)
+        self.memory_bytes += len(data)
+        if self.memory_bytes > self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        if self.spill is None:
+            self.spill = tempfile.TemporaryFile(dir=self.spill_dir, prefix='claude_output_')
+        self.spill.write(b''.join(self.chunks))
+        self.chunks = []
+        self.memory_bytes = 0
+
+    def __len__(self):
+        return self.total_bytes
+
+    def getvalue(self):
+        """Return everything kept so far as one string"""
+        parts = []
+        if self.spill is not None:
+            self.spill.seek(0)
+            parts.append(self.spill.read())
+            self.spill.seek(0, os.SEEK_END)
+        parts.extend(self.chunks)
+        return b''.join(parts).decode('utf-8', errors='replace')
+
+    def summary(self):
+        """Byte count and hash of the full output, for clients that already streamed it"""
+        return {
+            'bytes': self.total_bytes,
+            'sha256': self.hash.hexdigest(),
+            'truncated': self.truncated,
+        }
+
+    def close(self):
+        """Release the spill file, if any"""
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+        self.chunks = []
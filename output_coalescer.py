@@ -0,0 +1,123 @@
+"""
+Output coalescing for terminal streams
+
+PTY reads arrive in small, bursty chunks. OutputCoalescer gathers them into
+a buffer and hands one frame to the emitter when either the size limit or the
+time limit is reached, so nothing is dropped and the number of Socket.IO
+frames stays bounded under load.
+"""
+import logging
+import os
+import threading
+import time
+
+from pty_reactor import get_reactor
+
+log = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_BYTES = int(os.environ.get('OUTPUT_FLUSH_BYTES', 32 * 1024))
+DEFAULT_FLUSH_MS = float(os.environ.get('OUTPUT_FLUSH_MS', 16))
+
+
+class OutputCoalescer:
+    """Buffer PTY bytes and flush them as frames on a size or time limit"""
+
+    def __init__(self, emit, max_bytes=None, max_delay_ms=None, reactor=None):
+        self.emit = emit
+        self.max_bytes = max_bytes or DEFAULT_FLUSH_BYTES
+        self.max_delay = (max_delay_ms if max_delay_ms is not None else DEFAULT_FLUSH_MS) / 1000.0
+        self.reactor = reactor or get_reactor()
+        self.buffer = bytearray()
+        self.timer = None
+        self.lock = threading.Lock()
+        self.closed = False
+
+        # Tuning counters
+        self.frames = 0
+        self.bytes = 0
+        self.window_start = time.monotonic()
+        self.window_frames = 0
+        self.fps = 0.0
+
+    def feed(self, data):
+        """Add bytes to the buffer, flushing right away if the size limit is hit"""
+        if not data:
+            return
+        with self.lock:
+            if self.closed:
+                return
+            self.buffer += data
+            if len(self.buffer) >= self.max_bytes:
+                self._flush_locked()
+            elif self.timer is None:
+                self.timer = self.reactor.call_later(self.max_delay, self.flush)
+
+    def flush(self):
+        """Emit whatever is buffered as a single frame"""
+        with self.lock:
+            self._flush_locked()
+
+    def close(self):
+        """Flush the remaining bytes and stop accepting new ones"""
+        with self.lock:
+            self._flush_locked()
+            self.closed = True
+
+    def _flush_locked(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.buffer:
+            return
+        frame = bytes(self.buffer)
+        self.buffer.clear()
+
+        self.frames += 1
+        self.bytes += len(frame)
+        self.window_frames += 1
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        if elapsed >= 1.0:
+            self.fps = self.window_frames / elapsed
+            self.window_start = now
+            self.window_frames = 0
+
+        try:
+            self.emit(frame)
+        except Exception:
+            log.exception("Error emitting output frame")
+
+    def frames_per_second(self):
+        """Frames per second over the last completed (or current) one-second window"""
+        elapsed = time.monotonic() - self.window_start
+        if elapsed >= 1.0:
+            return self.window_frames / elapsed
+        return self.fps
+
+    def stats(self):
+        """Frame counters for tuning the flush limits"""
+        return {
+            'frames': self.frames,
+            'bytes': self.bytes,
+            'bytes_per_frame': round(self.bytes / self.frames, 1) if self.frames else 0,
+            'frames_per_second': round(self.frames_per_second(), 2),
+            'flush_bytes': self.max_bytes,
+            'flush_ms': self.max_delay * 1000.0,
+        }
+
+
+def combined_stats(coalescers):
+    """Aggregate stats over several coalescers (e.g. all sessions of a server)"""
+    frames = 0
+    total_bytes = 0
+    fps = 0.0
+    for coalescer in coalescers:
+        frames += coalescer.frames
+        total_bytes += coalescer.bytes
+        fps += coalescer.frames_per_second()
+    return {
+        'frames': frames,
+        'bytes': total_bytes,
+        'bytes_per_frame': round(total_bytes / frames, 1) if frames else 0,
+        'frames_per_second': round(fps, 2),
+    }
@@ -0,0 +1,183 @@
+"""
+Process supervisor for session children
+
+Stopping a session used to sleep between SIGTERM and SIGKILL in the caller,
+often a Socket.IO handler, and PTY children were never waited for, so
+zombies piled up. The supervisor does both from the shared reactor:
+
+- terminate(pid) sends SIGTERM to the child's whole process group (so
+  Claude's tool subprocesses go too) and schedules SIGKILL for whatever is
+  left after a grace period.
+- watch(pid) reaps the child as soon as it exits, via a pidfd on the
+  reactor, or a SIGCHLD handler plus a periodic sweep where pidfds are not
+  available.
+
+All waiting is waitpid(WNOHANG) from reactor callbacks, so nothing blocks.
+"""
+import atexit
+import logging
+import os
+import signal
+import threading
+
+from pty_reactor import get_reactor
+
+log = logging.getLogger(__name__)
+
+STOP_GRACE_SECONDS = float(os.environ.get('STOP_GRACE_SECONDS', 0.5))
+REAP_SWEEP_SECONDS = 5
+
+
+class ProcessSupervisor:
+    """Reaps watched children and escalates terminations on reactor timers"""
+
+    def __init__(self, grace_seconds=None):
+        self.grace = STOP_GRACE_SECONDS if grace_seconds is None else grace_seconds
+        self.reactor = get_reactor()
+        self.children = {}  # pid -> (pidfd or None, on_exit)
+        self.lock = threading.Lock()
+        self.sweeping = False
+        self.sigchld = False
+        self.counters = {'watched': 0, 'reaped': 0, 'terminated': 0, 'killed': 0}
+
+    def watch(self, pid, on_exit=None):
+        """Reap pid when it exits and call on_exit(returncode) on the reactor thread"""
+        try:
+            pidfd = os.pidfd_open(pid)
+        except (AttributeError, OSError):
+            pidfd = None
+        with self.lock:
+            self.children[pid] = (pidfd, on_exit)
+            self.counters['watched'] += 1
+        if pidfd is not None:
+            get_reactor(pidfd).register(pidfd, lambda fd: self._reap(pid))
+        else:
+            self._start_fallback()
+
+    def terminate(self, pid, grace=None):
+        """SIGTERM pid's process group now and SIGKILL what is left after grace seconds
+
+        pid must lead its own process group (forkpty, start_new_session);
+        otherwise only pid itself is signalled.
+        """
+        group = self._leads_group(pid)
+        if not self._send(pid, group, signal.SIGTERM):
+            return
+        self.counters['terminated'] += 1
+        self.reactor.call_later(self.grace if grace is None else grace,
+                                lambda: self._escalate(pid, group))
+
+    def shutdown(self):
+        """SIGTERM every watched child's group (at interpreter exit)"""
+        with self.lock:
+            pids = list(self.children)
+        for pid in pids:
+            self._send(pid, self._leads_group(pid), signal.SIGTERM)
+
+    def pids(self):
+        with self.lock:
+            return list(self.children)
+
+    def stats(self):
+        with self.lock:
+            children = len(self.children)
+        return {'children': children, **self.counters}
+
+    # Signals
+
+    @staticmethod
+    def _leads_group(pid):
+        try:
+            return os.getpgid(pid) == pid
+        except ProcessLookupError:
+            # Leader already reaped; its group may still have members
+            return True
+
+    @staticmethod
+    def _send(pid, group, signum):
+        """Deliver signum; False if nothing was there to receive it"""
+        try:
+            if group:
+                os.killpg(pid, signum)
+            else:
+                os.kill(pid, signum)
+        except ProcessLookupError:
+            return False
+        except OSError as e:
+            log.warning("Error signalling process: %s", e, extra={'pid': pid})
+            return False
+        return True
+
+    def _escalate(self, pid, group):
+        if pid in self.children:
+            self._reap(pid)
+        if self._send(pid, group, signal.SIGKILL):
+            self.counters['killed'] += 1
+
+    # Reaping
+
+    def _reap(self, pid):
+        try:
+            done, status = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            done, status = pid, 0  # already waited for elsewhere
+        if done == 0:
+            return
+        with self.lock:
+            entry = self.children.pop(pid, None)
+        if entry is None:
+            return
+        pidfd, on_exit = entry
+        if pidfd is not None:
+            get_reactor(pidfd).unregister(pidfd)
+            os.close(pidfd)
+        self.counters['reaped'] += 1
+        if on_exit:
+            try:
+                on_exit(os.waitstatus_to_exitcode(status))
+            except Exception:
+                log.exception("Process exit callback failed", extra={'pid': pid})
+
+    def _reap_all(self):
+        with self.lock:
+            pids = [pid for pid, (pidfd, _) in self.children.items() if pidfd is None]
+        for pid in pids:
+            self._reap(pid)
+
+    def _start_fallback(self):
+        """SIGCHLD (main thread only) plus a slow sweep for children without a pidfd"""
+        if not self.sigchld and threading.current_thread() is threading.main_thread():
+            previous = signal.getsignal(signal.SIGCHLD)
+
+            def on_sigchld(signum, frame):
+                self.reactor.call_later(0, self._reap_all)
+                if callable(previous):
+                    previous(signum, frame)
+
+            signal.signal(signal.SIGCHLD, on_sigchld)
+            self.sigchld = True
+        if not self.sweeping:
+            self.sweeping = True
+            self.reactor.call_later(REAP_SWEEP_SECONDS, self._sweep)
+
+    def _sweep(self):
+        self._reap_all()
+        with self.lock:
+            pending = any(pidfd is None for pidfd, _ in self.children.values())
+        self.sweeping = pending
+        if pending:
+            self.reactor.call_later(REAP_SWEEP_SECONDS, self._sweep)
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor():
+    """Return the process-wide supervisor"""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = ProcessSupervisor()
+            atexit.register(_supervisor.shutdown)
+        return _supervisor
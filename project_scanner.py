@@ -0,0 +1,118 @@
+"""
+Parallel filesystem scanner for project discovery
+
+Each directory is read once with os.scandir and project markers are
+matched against that listing, so there are no per-marker stat calls.
+Directories are listed concurrently on a thread pool, heavy trees such as
+node_modules are never entered, and listings are cached against the
+directory's mtime (which changes whenever an entry is added or removed).
+Projects are yielded as soon as they are found.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+PROJECT_MARKERS = frozenset([
+    '.git', 'package.json', 'requirements.txt', 'Cargo.toml',
+    'go.mod', 'pom.xml', 'build.gradle', 'CLAUDE.md',
+])
+IGNORED_DIRS = frozenset([
+    'node_modules', '.venv', 'venv', 'env', 'target', 'dist', 'build',
+    '__pycache__', '.cache', 'vendor', '.tox', 'site-packages',
+]) | frozenset(filter(None, os.environ.get('SCAN_IGNORE', '').split(',')))
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', 8))
+SCAN_CACHE_ENTRIES = int(os.environ.get('SCAN_CACHE_ENTRIES', 20000))
+
+
+class Listing:
+    """What the scanner needs to know about one directory"""
+
+    __slots__ = ('mtime_ns', 'is_project', 'has_claude_md', 'subdirs')
+
+    def __init__(self, mtime_ns, is_project, has_claude_md, subdirs):
+        self.mtime_ns = mtime_ns
+        self.is_project = is_project
+        self.has_claude_md = has_claude_md
+        self.subdirs = subdirs
+
+
+class ProjectScanner:
+    """Thread-pooled, mtime-cached directory scanner"""
+
+    def __init__(self, workers=None, ignored=None, cache_entries=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers or SCAN_WORKERS,
+                                           thread_name_prefix='scan')
+        self.ignored = IGNORED_DIRS if ignored is None else frozenset(ignored)
+        self.cache_entries = SCAN_CACHE_ENTRIES if cache_entries is None else cache_entries
+        self.cache = OrderedDict()  # path -> Listing
+        self.lock = threading.Lock()
+
+    def list_dir(self, path):
+        """Listing for path, from cache when its mtime is unchanged"""
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self.lock:
+            cached = self.cache.get(path)
+            if cached is not None and cached.mtime_ns == mtime_ns:
+                self.cache.move_to_end(path)
+                return cached
+
+        names = set()
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    names.add(entry.name)
+                    if entry.name.startswith('.') or entry.name in self.ignored:
+                        continue
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            # Unreadable (permissions, vanished): nothing to report below it
+            return None
+
+        listing = Listing(mtime_ns, not names.isdisjoint(PROJECT_MARKERS),
+                          'CLAUDE.md' in names, subdirs)
+        with self.lock:
+            self.cache[path] = listing
+            while len(self.cache) > self.cache_entries:
+                self.cache.popitem(last=False)
+        return listing
+
+    def scan(self, base_path, max_depth=2):
+        """Yield {name, path, has_claude_md} for each project under base_path
+
+        Like the old recursive walk, a project directory is reported and not
+        descended into, and directories are read down to max_depth levels.
+        """
+        base_path = os.path.abspath(os.path.expanduser(base_path))
+        if max_depth <= 0:
+            return
+        pending = {self.executor.submit(self.list_dir, base_path): (base_path, 0)}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, depth = pending.pop(future)
+                    listing = future.result()
+                    if listing is None:
+                        continue
+                    if depth and listing.is_project:
+                        yield {
+                            'name': os.path.basename(path),
+                            'path': path,
+                            'has_claude_md': listing.has_claude_md
+                        }
+                    elif depth < max_depth:
+                        for subdir in listing.subdirs:
+                            pending[self.executor.submit(self.list_dir, subdir)] = (subdir, depth + 1)
+        finally:
+            # The consumer stopped early (e.g. the client went away)
+            for future in pending:
+                future.cancel()
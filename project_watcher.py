@@ -0,0 +1,313 @@
+"""
+Live project watcher
+
+Watches registered project directories (and their parents, so deletion and
+re-creation are seen) plus scan roots with Linux inotify. Status changes
+refresh the ProjectManager cache and are reported as project_updated; new
+project directories appearing under a scan root are reported as
+project_discovered. Where inotify is not available the same checks run on
+a polling thread.
+
+The watcher runs on a reactor of its own, so the stats, listings and git
+checks behind each event never hold up terminal output on the PTY reactor;
+only the resulting events are handed to on_event.
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import threading
+import time
+
+from pty_reactor import PtyReactor
+from project_scanner import PROJECT_MARKERS
+
+log = logging.getLogger(__name__)
+
+PROJECT_POLL_SECONDS = float(os.environ.get('PROJECT_POLL_SECONDS', 10))
+PROJECT_WATCH_LIMIT = int(os.environ.get('PROJECT_WATCH_LIMIT', 4096))
+PROJECT_WATCH_ROOTS = int(os.environ.get('PROJECT_WATCH_ROOTS', 16))
+RESYNC_SECONDS = 60
+
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+DIR_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+            | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+APPEARED = IN_CREATE | IN_MOVED_TO
+VANISHED = IN_DELETE | IN_MOVED_FROM
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """Minimal ctypes binding for inotify"""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    def add_watch(self, path, mask):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Yield (wd, mask, name) for everything queued right now"""
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                yield wd, mask, name
+
+
+class ProjectWatcher:
+    """Keeps project status current and announces new projects"""
+
+    def __init__(self, project_manager, on_event, poll_interval=None):
+        self.project_manager = project_manager
+        self.scanner = project_manager.scanner
+        self.on_event = on_event  # fn(event_name, payload)
+        self.poll_interval = poll_interval or PROJECT_POLL_SECONDS
+        self.roots = set()
+        self.pending_roots = []  # accepted by watch_root, listed on the watcher thread
+        self.candidates = set()  # non-project dirs under a root, watched for markers
+        self.announced = set()
+        self.inotify = None
+        self.reactor = None
+        self.wds = {}  # wd -> path
+        self.watches = {}  # path -> wd
+        self.started = False
+        self.lock = threading.RLock()
+
+    def start(self):
+        self.started = True
+        try:
+            self.inotify = Inotify()
+        except OSError as e:
+            log.info("inotify unavailable (%s); polling projects every %ss", e, self.poll_interval)
+            threading.Thread(target=self._poll, name='project-poll', daemon=True).start()
+        else:
+            self.reactor = PtyReactor(name='project-watcher')
+            self.reactor.start()
+            self.reactor.register(self.inotify.fd, self._on_readable)
+            self._sync()
+            self.reactor.call_later(RESYNC_SECONDS, self._resync)
+
+        # Status is now pushed to the manager, so its cache no longer expires
+        self.project_manager.status_ttl = float('inf')
+        self.project_manager.add_listener(lambda event, project: self._sync())
+
+    def mode(self):
+        if not self.started:
+            return 'off'
+        return 'inotify' if self.inotify else 'polling'
+
+    def watch_root(self, path):
+        """Report projects that appear directly under path from now on
+
+        Only while the watcher runs in this process, and for at most
+        PROJECT_WATCH_ROOTS roots; returns False if path was not accepted.
+        The directory is listed later on the watcher's thread, not the caller's.
+        """
+        path = os.path.abspath(os.path.expanduser(path))
+        with self.lock:
+            if not self.started:
+                return False
+            if path in self.roots or path in self.pending_roots:
+                return True
+            if len(self.roots) + len(self.pending_roots) >= PROJECT_WATCH_ROOTS:
+                log.warning("Not watching %s: already watching %d roots", path, PROJECT_WATCH_ROOTS)
+                return False
+            self.pending_roots.append(path)
+        if self.reactor is not None:
+            self.reactor.call_later(0, self._add_pending_roots)
+        return True  # the polling thread picks it up on its next pass
+
+    def _add_pending_roots(self):
+        with self.lock:
+            pending, self.pending_roots = self.pending_roots, []
+        for path in pending:
+            listing = self.scanner.list_dir(path)
+            if listing is None:
+                continue
+            found = []
+            for subdir in listing.subdirs:
+                child = self.scanner.list_dir(subdir)
+                if child is not None:
+                    found.append((subdir, child.is_project))
+            with self.lock:
+                self.roots.add(path)
+                for subdir, is_project in found:
+                    if is_project:
+                        self.announced.add(subdir)  # already there; not a discovery
+                    else:
+                        self.candidates.add(subdir)
+        if pending:
+            self._sync()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'mode': self.mode(),
+                'watches': len(self.watches),
+                'roots': len(self.roots),
+                'pending_roots': len(self.pending_roots),
+                'candidates': len(self.candidates),
+            }
+
+    # Shared checks
+
+    def _refresh(self, path):
+        project = self.project_manager.refresh_status(path)
+        if project is not None:
+            self.on_event('project_updated', project)
+
+    def _consider(self, path):
+        """Announce path if it has become a project, otherwise keep watching it"""
+        listing = self.scanner.list_dir(path)
+        with self.lock:
+            if listing is None:
+                self.candidates.discard(path)
+                return
+            if not listing.is_project:
+                self.candidates.add(path)
+                return
+            self.candidates.discard(path)
+            if path in self.announced or path in self.project_manager.by_path:
+                return
+            self.announced.add(path)
+        self.on_event('project_discovered', {
+            'name': os.path.basename(path),
+            'path': path,
+            'has_claude_md': listing.has_claude_md
+        })
+
+    # inotify mode
+
+    def _wanted(self):
+        paths = self.project_manager.project_paths()
+        wanted = list(dict.fromkeys(
+            paths + [os.path.dirname(p) for p in paths] + sorted(self.roots) + sorted(self.candidates)))
+        return set(wanted[:PROJECT_WATCH_LIMIT])
+
+    def _sync(self):
+        """Add and remove watches to match projects, roots and candidates"""
+        if self.inotify is None:
+            return
+        with self.lock:
+            wanted = self._wanted()
+            for path in list(self.watches):
+                if path not in wanted:
+                    self.inotify.rm_watch(self.watches.pop(path))
+            for path in wanted - set(self.watches):
+                try:
+                    wd = self.inotify.add_watch(path, DIR_MASK)
+                except OSError:
+                    continue  # missing for now; the parent watch or resync picks it up
+                self.watches[path] = wd
+                self.wds[wd] = path
+
+    def _resync(self):
+        self._sync()
+        for path in self.project_manager.project_paths():
+            self._refresh(path)
+        self.reactor.call_later(RESYNC_SECONDS, self._resync)
+
+    def _on_readable(self, fd):
+        changed = False
+        for wd, mask, name in self.inotify.read_events():
+            try:
+                changed |= self._handle(wd, mask, name)
+            except Exception:
+                log.exception("Project watcher error")
+        if changed:
+            self._sync()
+
+    def _handle(self, wd, mask, name):
+        """Process one event; returns True if the watch set may need updating"""
+        if mask & IN_Q_OVERFLOW:
+            for path in self.project_manager.project_paths():
+                self._refresh(path)
+            return True
+        with self.lock:
+            path = self.wds.get(wd)
+            if mask & IN_IGNORED:
+                self.wds.pop(wd, None)
+                if path is not None and self.watches.get(path) == wd:
+                    del self.watches[path]
+        if path is None:
+            return False
+        if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+            self._refresh(path)
+            return bool(mask & IN_IGNORED)
+
+        projects = self.project_manager.by_path
+        child = os.path.join(path, name)
+        if path in projects and name == 'CLAUDE.md':
+            self._refresh(path)
+        if child in projects:
+            self._refresh(child)
+            return bool(mask & APPEARED)
+        if mask & IN_ISDIR and mask & APPEARED and path in self.roots:
+            self._consider(child)
+            return True
+        if mask & APPEARED and path in self.candidates and name in PROJECT_MARKERS:
+            self._consider(path)
+            return True
+        if mask & IN_ISDIR and mask & VANISHED and child in self.candidates:
+            with self.lock:
+                self.candidates.discard(child)
+            return True
+        return False
+
+    # Polling fallback
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self._add_pending_roots()
+                for path in self.project_manager.project_paths():
+                    self._refresh(path)
+                with self.lock:
+                    roots = list(self.roots)
+                    known = self.announced | self.candidates
+                for root in roots:
+                    listing = self.scanner.list_dir(root)
+                    for subdir in listing.subdirs if listing else []:
+                        if subdir not in known:
+                            self._consider(subdir)
+                with self.lock:
+                    candidates = list(self.candidates)
+                for path in candidates:
+                    self._consider(path)
+            except Exception:
+                log.exception("Project poll error")
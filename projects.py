@@ -1,26 +1,185 @@
 """
 Project management utilities for Claude Mobile Interface
 """
+import atexit
+import fcntl
+import logging
 import os
 import json
-from pathlib import Path
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from project_scanner import ProjectScanner
+
+log = logging.getLogger(__name__)
+
+PROJECTS_SAVE_DELAY = float(os.environ.get('PROJECTS_SAVE_DELAY', 1.0))
+PROJECT_STATUS_TTL = float(os.environ.get('PROJECT_STATUS_TTL', 10))
+# How often to check whether another worker process rewrote projects.json
+PROJECTS_RELOAD_SECONDS = 1.0
 
 class ProjectManager:
-    def __init__(self, config_file='projects.json'):
+    """Projects indexed by ID and path, persisted write-behind
+
+    Access-time updates mark the store dirty and are written (atomically, in
+    one batch) PROJECTS_SAVE_DELAY seconds later. Directory/CLAUDE.md status is cached
+    for PROJECT_STATUS_TTL seconds, so listing does no syscalls per request.
+
+    Several worker processes may share projects.json: writes happen under
+    a file lock after merging whatever another process saved, structural
+    changes (add/remove) are written immediately, and the file is re-read
+    when its mtime changes.
+    """
+
+    def __init__(self, config_file='projects.json', save_delay=None, status_ttl=None):
         self.config_file = config_file
-        self.projects = self.load_projects()
+        self.save_delay = PROJECTS_SAVE_DELAY if save_delay is None else save_delay
+        self.status_ttl = PROJECT_STATUS_TTL if status_ttl is None else status_ttl
+        self.lock = threading.RLock()
+        self.save_timer = None
+        self.dirty = False
+        self.listing = None  # (built_at, [project, ...]) served by get_projects
+        self.status = {}  # path -> (checked_at, exists, has_claude_md)
+        self.listeners = []  # fn(event, project) for 'added' / 'removed'
+        self.touched = {}  # id -> last_accessed not yet written
+        self.loaded_mtime = None
+        self.reload_checked = time.monotonic()
+
+        self.projects = {}  # id -> project, in insertion order
+        self.by_path = {}  # path -> id
+        self.next_id = 1
+        self.scanner = ProjectScanner()
+        for project in self.load_projects():
+            self._index(project)
+        atexit.register(self.flush)
     
     def load_projects(self):
         """Load projects from config file"""
-        if os.path.exists(self.config_file):
-            with open(self.config_file, 'r') as f:
-                return json.load(f)
-        return []
+        self.loaded_mtime = self._file_mtime()
+        if self.loaded_mtime is None:
+            return []
+        with open(self.config_file, 'r') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            # Older files are a bare list; IDs continue after the highest one
+            return data
+        self.next_id = data.get('next_id', 1)
+        return data.get('projects', [])
+    
+    def _file_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+    
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared with other processes using the same file"""
+        with open(f"{self.config_file}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+    
+    def _reload_if_changed(self):
+        """Re-read the file if another process wrote it; keeps unsaved access times"""
+        if self._file_mtime() == self.loaded_mtime:
+            return
+        self.projects = {}
+        self.by_path = {}
+        for project in self.load_projects():
+            self._index(project)
+        for project_id, accessed in self.touched.items():
+            if project_id in self.projects:
+                self.projects[project_id]['last_accessed'] = accessed
+        self.listing = None
+    
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self.reload_checked >= PROJECTS_RELOAD_SECONDS:
+            self.reload_checked = now
+            self._reload_if_changed()
+    
+    def _index(self, project):
+        self.projects[project['id']] = project
+        self.by_path[project['path']] = project['id']
+        self.next_id = max(self.next_id, project['id'] + 1)
+    
+    def _changed(self):
+        """Drop the cached listing and schedule a write"""
+        self.listing = None
+        self.dirty = True
+        if self.save_timer is None:
+            self.save_timer = threading.Timer(self.save_delay, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
     
     def save_projects(self):
-        """Save projects to config file"""
-        with open(self.config_file, 'w') as f:
-            json.dump(self.projects, f, indent=2)
+        """Save projects to config file (atomically, via a temp file)"""
+        with self.lock:
+            data = {'next_id': self.next_id, 'projects': list(self.projects.values())}
+            tmp_file = f"{self.config_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.config_file)
+            self.loaded_mtime = self._file_mtime()
+            self.touched.clear()
+            self.dirty = False
+    
+    def flush(self):
+        """Write pending changes now"""
+        with self.lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+                self.save_timer = None
+            if self.dirty:
+                try:
+                    with self._file_lock():
+                        self._reload_if_changed()
+                        self.save_projects()
+                except OSError as e:
+                    log.warning("Failed to save projects: %s", e)
+    
+    def _check_status(self, path, now):
+        exists = os.path.isdir(path)
+        has_claude_md = exists and os.path.exists(os.path.join(path, 'CLAUDE.md'))
+        self.status[path] = (now, exists, has_claude_md)
+        return self.status[path]
+    
+    def _with_status(self, project, now):
+        cached = self.status.get(project['path'])
+        if cached is None or now - cached[0] > self.status_ttl:
+            cached = self._check_status(project['path'], now)
+        return {**project, 'exists': cached[1], 'has_claude_md': cached[2]}
+    
+    def refresh_status(self, path):
+        """Re-check one project's status; returns the project if it changed"""
+        with self.lock:
+            project_id = self.by_path.get(path)
+            if project_id is None:
+                return None
+            old = self.status.get(path)
+            now = time.monotonic()
+            new = self._check_status(path, now)
+            if old is not None and old[1:] == new[1:]:
+                return None
+            self.listing = None
+            return self._with_status(self.projects[project_id], now)
+    
+    def project_paths(self):
+        with self.lock:
+            return list(self.by_path)
+    
+    def add_listener(self, listener):
+        """Call listener(event, project) when a project is added or removed"""
+        self.listeners.append(listener)
+    
+    def _notify(self, event, project):
+        for listener in self.listeners:
+            try:
+                listener(event, project)
+            except Exception:
+                log.exception("Project listener failed")
     
     def add_project(self, name, path, description=""):
         """Add a new project"""
@@ -31,87 +190,93 @@ class ProjectManager:
         if not os.path.exists(expanded_path):
             try:
                 os.makedirs(expanded_path, exist_ok=True)
-                print(f"Created project directory: {expanded_path}")
+                log.info("Created project directory: %s", expanded_path)
             except Exception as e:
                 raise ValueError(f"Failed to create directory: {e}")
         
-        # Check if project already exists
-        for p in self.projects:
-            if p['path'] == expanded_path or p['path'] == path:
+        with self.lock, self._file_lock():
+            self._reload_if_changed()
+            # Check if project already exists
+            if expanded_path in self.by_path or path in self.by_path:
                 return False
-        
-        project = {
-            'id': len(self.projects) + 1,
-            'name': name,
-            'path': expanded_path,  # Store expanded path
-            'description': description,
-            'last_accessed': None,
-            'has_claude_md': os.path.exists(os.path.join(expanded_path, 'CLAUDE.md'))
-        }
-        
-        self.projects.append(project)
-        self.save_projects()
+            
+            project = {
+                'id': self.next_id,
+                'name': name,
+                'path': expanded_path,  # Store expanded path
+                'description': description,
+                'last_accessed': None,
+                'has_claude_md': os.path.exists(os.path.join(expanded_path, 'CLAUDE.md'))
+            }
+            self._index(project)
+            self.status.pop(expanded_path, None)
+            self.listing = None
+            self.save_projects()
+        self._notify('added', project)
         return True
     
     def remove_project(self, project_id):
         """Remove a project by ID"""
-        self.projects = [p for p in self.projects if p['id'] != project_id]
-        self.save_projects()
+        with self.lock, self._file_lock():
+            self._reload_if_changed()
+            project = self.projects.pop(project_id, None)
+            if project is None:
+                return
+            self.by_path.pop(project['path'], None)
+            self.status.pop(project['path'], None)
+            self.listing = None
+            self.save_projects()
+        self._notify('removed', project)
     
     def get_projects(self):
-        """Get all projects"""
-        # Update project info
-        for project in self.projects:
-            project['exists'] = os.path.exists(project['path'])
-            project['has_claude_md'] = os.path.exists(os.path.join(project['path'], 'CLAUDE.md'))
-        return self.projects
+        """Get all projects, with cached existence/CLAUDE.md status"""
+        with self.lock:
+            self._maybe_reload()
+            now = time.monotonic()
+            if self.listing is None or now - self.listing[0] > self.status_ttl:
+                self.listing = (now, [self._with_status(p, now) for p in self.projects.values()])
+            return self.listing[1]
     
     def get_project(self, project_id):
         """Get a specific project by ID"""
-        for project in self.projects:
-            if project['id'] == project_id:
-                project['exists'] = os.path.exists(project['path'])
-                project['has_claude_md'] = os.path.exists(os.path.join(project['path'], 'CLAUDE.md'))
-                return project
-        return None
+        with self.lock:
+            self._maybe_reload()
+            project = self.projects.get(project_id)
+            if project is None:
+                return None
+            return self._with_status(project, time.monotonic())
+    
+    def get_project_by_path(self, path):
+        """Get a project by its (expanded) path"""
+        with self.lock:
+            project_id = self.by_path.get(os.path.expanduser(path))
+            return self.get_project(project_id) if project_id is not None else None
     
     def update_last_accessed(self, project_id):
         """Update last accessed time for a project"""
-        from datetime import datetime
-        for project in self.projects:
-            if project['id'] == project_id:
-                project['last_accessed'] = datetime.now().isoformat()
-                self.save_projects()
-                break
+        with self.lock:
+            project = self.projects.get(project_id)
+            if project is not None:
+                project['last_accessed'] = self.touched[project_id] = datetime.now().isoformat()
+                self._changed()
     
     def scan_directory(self, base_path, max_depth=2):
         """Scan directory for potential projects (containing .git, package.json, etc.)"""
-        potential_projects = []
-        base_path = Path(base_path)
-        
-        def is_project_dir(path):
-            """Check if directory is likely a project"""
-            indicators = ['.git', 'package.json', 'requirements.txt', 'Cargo.toml', 
-                         'go.mod', 'pom.xml', 'build.gradle', 'CLAUDE.md']
-            return any((path / indicator).exists() for indicator in indicators)
-        
-        def scan_recursive(path, current_depth=0):
-            if current_depth >= max_depth:
-                return
-            
-            try:
-                for item in path.iterdir():
-                    if item.is_dir() and not item.name.startswith('.'):
-                        if is_project_dir(item):
-                            potential_projects.append({
-                                'name': item.name,
-                                'path': str(item.absolute()),
-                                'has_claude_md': (item / 'CLAUDE.md').exists()
-                            })
-                        else:
-                            scan_recursive(item, current_depth + 1)
-            except PermissionError:
-                pass
-        
-        scan_recursive(base_path)
-        return potential_projects
\ No newline at end of file
+        return list(self.iter_scan(base_path, max_depth))
+    
+    def iter_scan(self, base_path, max_depth=2):
+        """Yield potential projects as the scanner finds them"""
+        return self.scanner.scan(base_path, max_depth)
+
+
+_project_manager = None
+_project_manager_lock = threading.Lock()
+
+
+def get_project_manager():
+    """Return the process-wide ProjectManager for projects.json"""
+    global _project_manager
+    with _project_manager_lock:
+        if _project_manager is None:
+            _project_manager = ProjectManager()
+        return _project_manager
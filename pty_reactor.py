@@ -0,0 +1,181 @@
+"""
+Shared I/O reactor for PTY and pipe sessions
+
+One selector loop (epoll on Linux) owns the master fds of every terminal
+session, so the servers no longer need a polling reader thread per client.
+
+It also runs lightweight timers (call_later) so per-session work such as
+output flushing can happen on the same thread without extra wakeups.
+"""
+import heapq
+import itertools
+import logging
+import os
+import selectors
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """Handle returned by PtyReactor.call_later"""
+
+    def __init__(self, when, callback):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class PtyReactor:
+    """Single-threaded selector loop dispatching readable fds to callbacks"""
+
+    def __init__(self, name='pty-reactor'):
+        self.name = name
+        self.selector = selectors.DefaultSelector()
+        self.pending = deque()
+        self.timers = []
+        self.timer_seq = itertools.count()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.running = False
+
+        # Self-pipe used to wake the loop when registrations change
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        os.set_blocking(self.wakeup_r, False)
+        os.set_blocking(self.wakeup_w, False)
+        self.selector.register(self.wakeup_r, selectors.EVENT_READ, None)
+
+    def start(self):
+        """Start the reactor thread if it is not already running"""
+        with self.lock:
+            if self.running:
+                return
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+
+    def register(self, fd, on_readable):
+        """Watch fd and call on_readable(fd) from the reactor thread when it has data"""
+        self.start()
+        self._submit(('register', fd, on_readable))
+
+    def unregister(self, fd):
+        """Stop watching fd; safe to call from any thread, including callbacks"""
+        if threading.current_thread() is self.thread:
+            self._unregister_now(fd)
+        else:
+            self._submit(('unregister', fd, None))
+
+    def call_later(self, delay, callback):
+        """Run callback() on the reactor thread after delay seconds"""
+        self.start()
+        handle = TimerHandle(time.monotonic() + delay, callback)
+        self._submit(('timer', handle, None))
+        return handle
+
+    def fd_count(self):
+        """Number of session fds currently watched"""
+        return max(len(self.selector.get_map()) - 1, 0)
+
+    def _submit(self, op):
+        self.pending.append(op)
+        try:
+            os.write(self.wakeup_w, b'\0')
+        except BlockingIOError:
+            # Pipe already full, the loop is going to wake up anyway
+            pass
+
+    def _apply_pending(self):
+        while self.pending:
+            action, target, callback = self.pending.popleft()
+            if action == 'timer':
+                heapq.heappush(self.timers, (target.when, next(self.timer_seq), target))
+            elif action == 'register':
+                try:
+                    self.selector.register(target, selectors.EVENT_READ, callback)
+                except (KeyError, ValueError, OSError) as e:
+                    log.warning("Reactor failed to register fd %s: %s", target, e)
+            else:
+                self._unregister_now(target)
+
+    def _unregister_now(self, fd):
+        try:
+            self.selector.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+
+    def _drain_wakeup(self):
+        try:
+            while os.read(self.wakeup_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _next_timeout(self):
+        while self.timers and self.timers[0][2].cancelled:
+            heapq.heappop(self.timers)
+        if not self.timers:
+            return None
+        return max(self.timers[0][0] - time.monotonic(), 0)
+
+    def _run_due_timers(self):
+        now = time.monotonic()
+        while self.timers and self.timers[0][0] <= now:
+            _, _, handle = heapq.heappop(self.timers)
+            if handle.cancelled:
+                continue
+            try:
+                handle.callback()
+            except Exception:
+                log.exception("Reactor timer callback failed")
+
+    def _run(self):
+        while self.running:
+            self._apply_pending()
+            try:
+                events = self.selector.select(self._next_timeout())
+            except OSError as e:
+                log.warning("Reactor select failed: %s", e)
+                continue
+
+            for key, _ in events:
+                if key.fd == self.wakeup_r:
+                    self._drain_wakeup()
+                    continue
+                try:
+                    key.data(key.fd)
+                except Exception:
+                    log.exception("Reactor callback for fd %s failed", key.fd)
+                    self._unregister_now(key.fd)
+
+            self._run_due_timers()
+
+
+_reactors = []
+_reactors_lock = threading.Lock()
+
+
+def get_reactor(fd=None):
+    """Return the shared reactor responsible for fd
+
+    PTY_REACTOR_THREADS (default 1) sets how many reactor threads share the
+    load; fds are spread across them by number.
+    """
+    with _reactors_lock:
+        if not _reactors:
+            count = max(int(os.environ.get('PTY_REACTOR_THREADS', 1)), 1)
+            for i in range(count):
+                _reactors.append(PtyReactor(name=f'pty-reactor-{i}'))
+    if fd is None:
+        return _reactors[0]
+    return _reactors[fd % len(_reactors)]
+
+
+def watched_fd_count():
+    """Total fds watched across all reactors"""
+    return sum(reactor.fd_count() for reactor in _reactors)
@@ -0,0 +1,151 @@
+"""
+On-disk cache of claude -p responses
+
+A response is keyed by the prompt, the content hashes of its attachments
+and a fingerprint of the project tree (git HEAD plus a hash of uncommitted
+changes). Entries live as JSON files, are evicted least-recently-used past
+RESPONSE_CACHE_MAX_BYTES and expire after RESPONSE_CACHE_TTL seconds.
+
+Only runs that leave the project fingerprint unchanged are stored, so a
+prompt that edits files is never replayed in place of actually running.
+
+Every call blocks on disk or git; async callers run them in an executor.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+
+RESPONSE_CACHE_DIR = os.environ.get('RESPONSE_CACHE_DIR', 'response_cache')
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+RESPONSE_CACHE_MAX_ENTRY = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRY', 4 * 1024 * 1024))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 24 * 3600))
+RESPONSE_CACHE_DEFAULT = os.environ.get('RESPONSE_CACHE_DEFAULT', '0') == '1'
+
+
+def _git(path, *args):
+    result = subprocess.run(['git', '-C', path, *args], capture_output=True, timeout=30)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors='replace').strip())
+    return result.stdout
+
+
+def project_fingerprint(path):
+    """Hash of git HEAD plus uncommitted changes, or None outside a git repo"""
+    if not path:
+        return None
+    try:
+        digest = hashlib.sha256(_git(path, 'rev-parse', 'HEAD'))
+        digest.update(_git(path, 'diff', 'HEAD', '--binary'))
+        # Untracked files are not in the diff; their names, sizes and mtimes stand in
+        untracked = _git(path, 'ls-files', '--others', '--exclude-standard', '-z')
+        for name in filter(None, untracked.split(b'\0')):
+            try:
+                st = os.stat(os.path.join(path, os.fsdecode(name)))
+            except OSError:
+                continue
+            digest.update(b'%s\0%d\0%d\0' % (name, st.st_size, st.st_mtime_ns))
+        return digest.hexdigest()
+    except (OSError, RuntimeError, subprocess.TimeoutExpired):
+        return None
+
+
+class ResponseCache:
+    """Size-bounded LRU of responses on disk"""
+
+    def __init__(self, directory=None, max_bytes=None, ttl=None):
+        self.directory = directory or RESPONSE_CACHE_DIR
+        self.max_bytes = RESPONSE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = RESPONSE_CACHE_TTL if ttl is None else ttl
+        self.entries = OrderedDict()  # key -> size, least recently used first
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    st = entry.stat()
+                    found.append((st.st_mtime, entry.name[:-5], st.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def key(self, prompt, file_hashes, project_path):
+        """Cache key for a run, or None when the project state can't be fingerprinted"""
+        fingerprint = project_fingerprint(project_path)
+        if fingerprint is None:
+            return None
+        material = json.dumps([prompt, sorted(file_hashes), os.path.realpath(project_path), fingerprint])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Cached output for key, or None (counted as a miss)"""
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'r') as f:
+                    entry = json.load(f)
+                # TTL runs from creation; mtime only records use, for LRU order on restart
+                if time.time() - entry['created'] > self.ttl:
+                    raise FileNotFoundError(path)
+                output = entry['output']
+                os.utime(path)
+            except (OSError, ValueError, KeyError):
+                self._drop(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return output
+
+    def put(self, key, output):
+        """Store output under key, evicting least-recently-used entries past the budget"""
+        data = json.dumps({'output': output, 'created': time.time()})
+        if len(data) > RESPONSE_CACHE_MAX_ENTRY:
+            return
+        with self.lock:
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)
+            self.entries[key] = len(data)
+            self.total_bytes += len(data)
+            self.stores += 1
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                self._drop(next(iter(self.entries)))
+
+    def _drop(self, key):
+        self.total_bytes -= self.entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+            }
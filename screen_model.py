@@ -0,0 +1,149 @@
+"""
+Server-side terminal screen model
+
+In screen mode a session feeds PTY output into a pyte screen instead of
+forwarding every byte. Each frame is rendered from the rows that changed
+since the previous one, as ANSI row repaints (move to the row, rewrite it,
+erase the rest), so spinner redraws and full repaints collapse into the
+final state of each frame and any xterm-compatible client renders them with
+a plain term.write. Attaching gets one full-screen snapshot instead of a
+scrollback replay.
+
+FramePacer stretches the frame interval with the client's measured round
+trip time, so phones on slow links get fewer, larger frames.
+
+Needs the optional pyte package (the 'screen' extra); without it sessions
+stay in raw mode.
+"""
+import os
+
+try:
+    import pyte
+    from pyte import graphics
+except ImportError:
+    pyte = None
+
+SCREEN_MIN_FRAME_MS = float(os.environ.get('SCREEN_MIN_FRAME_MS', 33))
+SCREEN_MAX_FRAME_MS = float(os.environ.get('SCREEN_MAX_FRAME_MS', 500))
+SCREEN_RTT_FACTOR = float(os.environ.get('SCREEN_RTT_FACTOR', 0.5))
+SCREEN_PING_SECONDS = float(os.environ.get('SCREEN_PING_SECONDS', 5))
+SCREEN_SEED_BYTES = int(os.environ.get('SCREEN_SEED_BYTES', 32 * 1024))
+
+if pyte:
+    FG_CODES = {name: code for code, name in {**graphics.FG_ANSI, **graphics.FG_AIXTERM}.items()}
+    BG_CODES = {name: code for code, name in {**graphics.BG_ANSI, **graphics.BG_AIXTERM}.items()}
+
+RESET = '\x1b[0m'
+FLAG_CODES = (('bold', '1'), ('italics', '3'), ('underscore', '4'), ('blink', '5'),
+              ('reverse', '7'), ('strikethrough', '9'))
+
+
+def available():
+    return pyte is not None
+
+
+def _color(value, codes, extended):
+    if value in codes:
+        return str(codes[value])
+    if len(value) == 6:
+        try:
+            return f"{extended};2;{int(value[0:2], 16)};{int(value[2:4], 16)};{int(value[4:6], 16)}"
+        except ValueError:
+            pass
+    return str(codes['default'])
+
+
+def _sgr(char):
+    """SGR sequence selecting char's attributes from a reset state"""
+    params = ['0']
+    params.extend(code for flag, code in FLAG_CODES if getattr(char, flag))
+    if char.fg != 'default':
+        params.append(_color(char.fg, FG_CODES, 38))
+    if char.bg != 'default':
+        params.append(_color(char.bg, BG_CODES, 48))
+    return '\x1b[' + ';'.join(params) + 'm'
+
+
+class ScreenModel:
+    """pyte screen plus row-diff and snapshot rendering"""
+
+    def __init__(self, rows, cols):
+        self.screen = pyte.Screen(cols, rows)
+        self.stream = pyte.ByteStream(self.screen)
+        self.fed_bytes = 0
+        self.frames = 0
+        self.frame_bytes = 0
+
+    def feed(self, data):
+        self.fed_bytes += len(data)
+        self.stream.feed(data)
+
+    def resize(self, rows, cols):
+        self.screen.resize(rows, cols)
+        self.screen.dirty.update(range(rows))
+
+    def render_dirty(self):
+        """ANSI repaint of the rows changed since the last frame (b'' if none)"""
+        rows = sorted(y for y in self.screen.dirty if y < self.screen.lines)
+        self.screen.dirty.clear()
+        if not rows:
+            return b''
+        return self._render(rows, '')
+
+    def snapshot(self):
+        """ANSI repaint of the whole screen, starting from a cleared terminal"""
+        self.screen.dirty.clear()
+        return self._render(range(self.screen.lines), '\x1b[0m\x1b[H\x1b[2J')
+
+    def _render(self, rows, prefix):
+        parts = [prefix, '\x1b[0m\x1b[?25l']
+        for y in rows:
+            parts.append(f'\x1b[{y + 1};1H')
+            parts.append(self._render_row(y))
+        cursor = self.screen.cursor
+        parts.append(f'\x1b[{cursor.y + 1};{cursor.x + 1}H')
+        if not cursor.hidden:
+            parts.append('\x1b[?25h')
+        frame = ''.join(parts).encode('utf-8')
+        self.frames += 1
+        self.frame_bytes += len(frame)
+        return frame
+
+    def _render_row(self, y):
+        line = self.screen.buffer[y]
+        default = self.screen.default_char
+        # Trailing default blanks are covered by the erase at the end
+        last = -1
+        for x in range(self.screen.columns):
+            if line[x] != default:
+                last = x
+        parts = []
+        style = RESET  # every row starts and ends with default attributes
+        for x in range(last + 1):
+            char = line[x]
+            if not char.data:
+                continue  # second half of a wide character
+            sgr = _sgr(char)
+            if sgr != style:
+                parts.append(sgr)
+                style = sgr
+            parts.append(char.data)
+        if style != RESET:
+            parts.append(RESET)
+        parts.append('\x1b[K')
+        return ''.join(parts)
+
+
+class FramePacer:
+    """Frame interval derived from an EWMA of the client's round-trip time"""
+
+    def __init__(self):
+        self.rtt = None
+
+    def observe(self, seconds):
+        self.rtt = seconds if self.rtt is None else 0.8 * self.rtt + 0.2 * seconds
+
+    @property
+    def interval(self):
+        ms = (self.rtt or 0) * 1000.0 * SCREEN_RTT_FACTOR
+        return min(max(ms, SCREEN_MIN_FRAME_MS), SCREEN_MAX_FRAME_MS) / 1000.0
@@ -0,0 +1,59 @@
+"""
+Fixed-size scrollback ring for terminal output
+
+Every byte a session produces gets an absolute offset. Clients remember the
+offset of the last frame they rendered, and on reconnect they get exactly
+the bytes after it (or everything still held if they fell too far behind).
+"""
+import os
+
+DEFAULT_SCROLLBACK_BYTES = int(os.environ.get('SCROLLBACK_BYTES', 256 * 1024))
+
+
+class ScrollbackRing:
+    """Circular bytearray holding the most recent `capacity` bytes of output"""
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity or DEFAULT_SCROLLBACK_BYTES
+        self.buffer = bytearray(self.capacity)
+        self.end = 0  # absolute offset just past the newest byte
+
+    @property
+    def start(self):
+        """Absolute offset of the oldest byte still held"""
+        return max(0, self.end - self.capacity)
+
+    def append(self, data):
+        """Write data to the ring and return the new end offset"""
+        size = len(data)
+        if size >= self.capacity:
+            # Only the tail can survive anyway
+            data = data[-self.capacity:]
+            self.end += size - self.capacity
+            size = self.capacity
+
+        pos = self.end % self.capacity
+        first = min(size, self.capacity - pos)
+        self.buffer[pos:pos + first] = data[:first]
+        if first < size:
+            self.buffer[0:size - first] = data[first:]
+        self.end += size
+        return self.end
+
+    def read_from(self, offset):
+        """Return (start_offset, bytes) for everything after offset
+
+        start_offset is larger than offset when the requested bytes have
+        already been overwritten; the caller should then reset the client.
+        """
+        offset = min(max(offset, self.start), self.end)
+        size = self.end - offset
+        if size == 0:
+            return offset, b''
+
+        pos = offset % self.capacity
+        first = min(size, self.capacity - pos)
+        data = bytes(self.buffer[pos:pos + first])
+        if first < size:
+            data += bytes(self.buffer[0:size - first])
+        return offset, data
@@ -0,0 +1,42 @@
+"""
+Every interface served from one process
+
+app.py (project manager and command API) is served at / and the session
+servers are mounted next to it. Each gets its own Socket.IO namespace and
+serves its page and /health under the same prefix, sharing one reactor, one
+job runner and one message-queue connection:
+
+    /terminal          terminal_app.py        Claude on a PTY, resumable
+    /interactive       interactive_claude.py  PTY with the warm Claude pool
+    /simple-terminal   simple_terminal.py     Claude over pipes
+    /chat              claude_chat.py         one reply per message
+
+    gunicorn -c gunicorn.conf.py server:app
+"""
+import logging
+import os
+
+import cluster
+import app as main
+from claude_chat import bp as chat_bp, ChatNamespace
+from interactive_claude import bp as interactive_bp, sessions as interactive_sessions, InteractiveNamespace
+from simple_terminal import bp as simple_bp, sessions as simple_sessions, SimpleTerminalNamespace
+from terminal_app import bp as terminal_bp, sessions as terminal_sessions, TerminalNamespace
+from session_runtime import mount
+
+log = logging.getLogger(__name__)
+
+app = main.app
+socketio = main.socketio
+
+mount(app, socketio, terminal_bp, TerminalNamespace(terminal_sessions, '/terminal'), '/terminal')
+mount(app, socketio, interactive_bp,
+      InteractiveNamespace(interactive_sessions, '/interactive'), '/interactive')
+mount(app, socketio, simple_bp,
+      SimpleTerminalNamespace(simple_sessions, '/simple-terminal'), '/simple-terminal')
+mount(app, socketio, chat_bp, ChatNamespace('/chat'), '/chat')
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 8080))
+    log.info("Starting all Claude interfaces on port %d", port)
+    socketio.run(app, host='0.0.0.0', port=port, debug=cluster.DEBUG, allow_unsafe_werkzeug=True)
@@ -0,0 +1,109 @@
+"""
+Shared registry of which worker owns which live session
+
+PTYs and Claude processes belong to the worker process that spawned them,
+so a reconnecting client must land on that worker. Nginx keeps clients
+sticky; this registry records ownership in a SQLite file shared by all
+workers on the host, so a worker can tell "expired" apart from "owned by
+another worker" and /health can report where sessions live.
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+SESSION_REGISTRY_DB = os.environ.get('SESSION_REGISTRY_DB', 'sessions.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_owner (
+    token TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    worker_id TEXT NOT NULL,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    claimed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_owner_worker ON session_owner (worker_id);
+"""
+
+
+def default_worker_id():
+    """WORKER_ID if set, otherwise host:port:pid"""
+    return os.environ.get('WORKER_ID') or \
+        f"{socket.gethostname()}:{os.environ.get('PORT', 8080)}:{os.getpid()}"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SessionRegistry:
+    """token -> owning worker, in SQLite (WAL) shared between processes"""
+
+    def __init__(self, path=None, worker_id=None):
+        self.path = path or SESSION_REGISTRY_DB
+        self.worker_id = worker_id or default_worker_id()
+        self.host = socket.gethostname()
+        self.local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        self.purge_dead()
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def claim(self, token, kind):
+        """Record that this worker owns token"""
+        self._conn().execute(
+            'INSERT OR REPLACE INTO session_owner (token, kind, worker_id, host, pid, claimed_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (token, kind, self.worker_id, self.host, os.getpid(), time.time()))
+
+    def release(self, token):
+        self._conn().execute(
+            'DELETE FROM session_owner WHERE token = ? AND worker_id = ?', (token, self.worker_id))
+
+    def owner(self, token):
+        """Worker ID owning token, or None if no live worker has it"""
+        row = self._conn().execute(
+            'SELECT worker_id, host, pid FROM session_owner WHERE token = ?', (token,)).fetchone()
+        if row is None:
+            return None
+        worker_id, host, pid = row
+        if host == self.host and not _pid_alive(pid):
+            self._conn().execute('DELETE FROM session_owner WHERE token = ?', (token,))
+            return None
+        return worker_id
+
+    def purge_dead(self):
+        """Drop rows left behind by workers on this host that have exited"""
+        conn = self._conn()
+        rows = conn.execute(
+            'SELECT DISTINCT pid FROM session_owner WHERE host = ?', (self.host,)).fetchall()
+        for (pid,) in rows:
+            if not _pid_alive(pid) or pid == os.getpid():
+                conn.execute('DELETE FROM session_owner WHERE host = ? AND pid = ?', (self.host, pid))
+
+    def stats(self):
+        rows = self._conn().execute(
+            'SELECT worker_id, COUNT(*) FROM session_owner GROUP BY worker_id').fetchall()
+        counts = dict(rows)
+        return {
+            'worker_id': self.worker_id,
+            'owned': counts.get(self.worker_id, 0),
+            'total': sum(counts.values()),
+            'workers': len(counts),
+        }
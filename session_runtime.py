@@ -0,0 +1,609 @@
+"""
+Shared session runtime for the terminal servers
+
+terminal_app.py, interactive_claude.py and simple_terminal.py used to carry
+their own session class, spawn code, input writer and output pump. They now
+share RuntimeSession: a process backend (PtyBackend or PipeBackend) whose
+fds are driven by the shared reactor, feeding coalesced output, scrollback
+and resumable attach. Input is written straight to the non-blocking fd, and
+children are reaped and stopped by the process supervisor, so stopping a
+session never sleeps in the caller.
+
+Every server is a Blueprint plus a Socket.IO Namespace, so it runs on its
+own (python terminal_app.py) or mounted with the others in one process
+(server.py).
+"""
+import os
+import subprocess
+import fcntl
+import logging
+import struct
+import termios
+import threading
+import time
+import weakref
+
+from flask import Flask, request
+from flask_cors import CORS
+from flask_socketio import SocketIO, emit, join_room
+
+import cluster
+import log_config
+import metrics
+from output_coalescer import OutputCoalescer, combined_stats
+from process_supervisor import get_supervisor
+from pty_reactor import get_reactor, watched_fd_count
+import screen_model
+from screen_model import ScreenModel, FramePacer, SCREEN_PING_SECONDS, SCREEN_SEED_BYTES
+from scrollback import ScrollbackRing
+from stream_codec import OutputEncoder, new_wire_stats, wire_summary
+
+log = logging.getLogger(__name__)
+stream_log = log_config.stream_logger(__name__)
+input_log = logging.getLogger(__name__ + '.input')
+
+READ_BYTES = 64 * 1024
+# Input waiting for a full PTY/pipe buffer; anything beyond this is dropped
+INPUT_PENDING_BYTES = int(os.environ.get('INPUT_PENDING_BYTES', 1024 * 1024))
+INPUT_RETRY_SECONDS = 0.01
+# Output a flow-controlled client may have outstanding before reads pause
+FLOW_WINDOW_BYTES = int(os.environ.get('FLOW_WINDOW_BYTES', 256 * 1024))
+
+
+class ProcessBackend:
+    """Child process with one readable output fd and one writable input fd
+
+    Subclasses implement _spawn(), which sets pid, read_fd and write_fd; the
+    child must lead its own process group. on_output(bytes) and on_exit()
+    are called from the reactor thread once the output fd reaches EOF.
+    """
+    kind = 'process'  # metrics label
+
+    def __init__(self, argv, cwd, env=None):
+        self.argv = argv
+        self.cwd = cwd
+        self.env = {**os.environ, **(env or {})}
+        self.pid = None
+        self.returncode = None
+        self.read_fd = None
+        self.write_fd = None
+        self.running = False
+        self.reading = False
+        self.pending = bytearray()
+        self.retry = None
+        self.lock = threading.Lock()
+        self.on_output = None
+        self.on_exit = None
+        self.spawned_at = None  # cleared by the first output byte
+
+    def start(self, on_output, on_exit):
+        self.on_output = on_output
+        self.on_exit = on_exit
+        started = time.monotonic()
+        self._spawn()
+        self.spawned_at = time.monotonic()
+        metrics.SPAWN_SECONDS.labels(self.kind).observe(self.spawned_at - started)
+        _live_backends.add(self)
+        get_supervisor().watch(self.pid, self._on_child_exit)
+        self.running = True
+        os.set_blocking(self.read_fd, False)
+        os.set_blocking(self.write_fd, False)
+        self.resume()
+
+    def _on_child_exit(self, returncode):
+        self.returncode = returncode
+
+    def _on_readable(self, fd):
+        try:
+            data = os.read(fd, READ_BYTES)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''  # EIO once the PTY slave is closed
+        if data:
+            if self.spawned_at is not None:
+                metrics.FIRST_BYTE_SECONDS.labels(self.kind).observe(time.monotonic() - self.spawned_at)
+                self.spawned_at = None
+            self.on_output(data)
+            return
+        get_reactor(fd).unregister(fd)
+        self.reading = False
+        if self.running:
+            self.running = False
+            self.on_exit()
+
+    def write(self, data):
+        """Write without blocking; a full buffer is retried from the reactor"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        with self.lock:
+            if not self.running or self.write_fd is None:
+                return
+            if self.pending:
+                self._queue_locked(data)
+                return
+            try:
+                written = os.write(self.write_fd, data)
+            except BlockingIOError:
+                written = 0
+            except OSError as e:
+                log.warning("Error writing input: %s", e, extra={'pid': self.pid})
+                return
+            if written < len(data):
+                self._queue_locked(data[written:])
+
+    def _queue_locked(self, data):
+        if len(self.pending) + len(data) > INPUT_PENDING_BYTES:
+            log.warning("Input buffer is full; dropping input", extra={'pid': self.pid, 'bytes': len(data)})
+            return
+        self.pending += data
+        if self.retry is None:
+            self.retry = get_reactor().call_later(INPUT_RETRY_SECONDS, self._flush_pending)
+
+    def _flush_pending(self):
+        with self.lock:
+            self.retry = None
+            if not self.pending or self.write_fd is None:
+                self.pending.clear()
+                return
+            try:
+                written = os.write(self.write_fd, self.pending)
+            except BlockingIOError:
+                written = 0
+            except OSError:
+                self.pending.clear()
+                return
+            del self.pending[:written]
+            if self.pending:
+                self.retry = get_reactor().call_later(INPUT_RETRY_SECONDS, self._flush_pending)
+
+    def pause(self):
+        """Stop reading output; the full kernel buffer then blocks the child's writes"""
+        with self.lock:
+            if self.reading and self.read_fd is not None:
+                get_reactor(self.read_fd).unregister(self.read_fd)
+            self.reading = False
+
+    def resume(self):
+        with self.lock:
+            if not self.reading and self.running and self.read_fd is not None:
+                get_reactor(self.read_fd).register(self.read_fd, self._on_readable)
+                self.reading = True
+
+    def resize(self, rows, cols):
+        pass
+
+    def stop(self):
+        """Close the fds and terminate the child; returns immediately"""
+        self.running = False
+        with self.lock:
+            self.reading = False
+            if self.retry is not None:
+                self.retry.cancel()
+                self.retry = None
+            self.pending.clear()
+            fds = {self.read_fd, self.write_fd} - {None}
+            self.read_fd = self.write_fd = None
+        for fd in fds:
+            get_reactor(fd).unregister(fd)
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if self.pid:
+            # Also clears out tool subprocesses left behind by an exited child
+            get_supervisor().terminate(self.pid)
+
+
+class PtyBackend(ProcessBackend):
+    """Child running on a pseudo-terminal (full-screen TUIs)"""
+    kind = 'pty'
+
+    def __init__(self, argv, cwd, env=None, echo=True, rows=24, cols=80):
+        super().__init__(argv, cwd, {'TERM': 'xterm-256color', 'COLORTERM': 'truecolor', **(env or {})})
+        self.echo = echo
+        self.size = (rows, cols)
+
+    def _spawn(self):
+        pid, fd = os.forkpty()
+        if pid == 0:
+            try:
+                os.chdir(self.cwd)
+                os.execvpe(self.argv[0], self.argv, self.env)
+            finally:
+                os._exit(127)
+        self.pid = pid
+        self.read_fd = self.write_fd = fd
+        if not self.echo:
+            attrs = termios.tcgetattr(fd)
+            attrs[3] &= ~termios.ECHO
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        self.resize(*self.size)
+
+    def resize(self, rows, cols):
+        self.size = (rows, cols)
+        if self.read_fd is None:
+            return
+        try:
+            fcntl.ioctl(self.read_fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+        except OSError as e:
+            log.warning("Error resizing terminal: %s", e, extra={'pid': self.pid})
+
+
+class PipeBackend(ProcessBackend):
+    """Child with plain stdin/stdout pipes (stderr merged into stdout)"""
+    kind = 'pipe'
+
+    def _spawn(self):
+        self.process = subprocess.Popen(
+            self.argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            bufsize=0, cwd=self.cwd, env=self.env, start_new_session=True)
+        self.pid = self.process.pid
+        # Keep our own copies of the fds so stop() can close them like a PTY's
+        self.read_fd = os.dup(self.process.stdout.fileno())
+        self.write_fd = os.dup(self.process.stdin.fileno())
+        self.process.stdout.close()
+        self.process.stdin.close()
+
+    def _on_child_exit(self, returncode):
+        # The supervisor reaped it, so tell Popen rather than let it wait again
+        super()._on_child_exit(returncode)
+        self.process.returncode = returncode
+
+
+_live_backends = weakref.WeakSet()
+for _kind in (PtyBackend.kind, PipeBackend.kind):
+    metrics.track_children(_kind, lambda kind=_kind: sum(
+        1 for backend in list(_live_backends) if backend.kind == kind and backend.running))
+
+
+class RuntimeSession:
+    """A backend process plus coalesced output, scrollback and client attach
+
+    emit(event, payload, room, ignore_queue) is supplied by the namespace of
+    the attached client; a session without one (e.g. a pooled process) only
+    records output in scrollback until a client attaches. Sticky routing
+    keeps that client on this worker, so emits skip the message queue.
+
+    A client that asks for screen mode gets paced row-diff frames from a
+    ScreenModel instead of raw output (PTY backends, with pyte installed).
+
+    A client that asks for flow control acks the offsets it has rendered;
+    once more than FLOW_WINDOW_BYTES are outstanding the backend stops
+    reading, so a slow phone holds Claude back instead of growing queues.
+
+    Compression (see stream_codec) is negotiated per attach; wire keeps the
+    session's bytes before and after it.
+
+    When the process exits on its own, the attached client gets exit_event
+    and on_exit() is called (SessionStore.add sets it to drop the session).
+    """
+    exit_event = None
+
+    def __init__(self, backend, event='output', session_id=None, emit=None, binary=False,
+                 tag_session=False, log_io=False, screen=False, flow=False, compress=False):
+        self.backend = backend
+        self.event = event
+        self.session_id = session_id
+        self.log_id = session_id[:8] if session_id else 'pool'
+        self.emitter = emit
+        self.tag_session = tag_session
+        self.log_io = log_io
+        self.output = OutputCoalescer(self._emit_output)
+        self.frame_sizes = metrics.FRAME_BYTES.labels(event)
+        self.wire = new_wire_stats()  # bytes before and after encoding, across attaches
+        self.encoder = OutputEncoder(binary, compress, self.wire)
+        self.scrollback = ScrollbackRing()
+        self.lock = threading.Lock()
+        self.screen = None  # only while a screen-mode client is attached
+        self.screen_client = False
+        self.pacer = FramePacer()
+        self.frame_timer = None
+        self.ping_timer = None
+        self.flow = bool(flow)
+        self.acked = 0
+        self.paused = False
+        self.pauses = 0
+        self.on_exit = None
+        if screen:
+            self._use_screen(True)
+
+    @property
+    def pid(self):
+        return self.backend.pid
+
+    @property
+    def running(self):
+        return self.backend.running
+
+    def start(self):
+        cwd = self.backend.cwd
+        if not os.path.exists(cwd):
+            os.makedirs(cwd, exist_ok=True)
+        self.backend.start(self._on_output, self._on_backend_exit)
+        log.info("Started %s in %s", self.backend.argv[0], cwd,
+                 extra={'session': self.log_id, 'pid': self.pid})
+        if self.screen_client:
+            self._start_pings()
+
+    def _on_output(self, data):
+        # Buffered and flushed as one frame per size/time limit, never dropped
+        self.output.feed(data)
+        if self.log_io and stream_log.isEnabledFor(logging.DEBUG):
+            # Sampled: one chunk in LOG_SAMPLE_EVERY, first line only
+            line = data.decode('utf-8', errors='replace').strip().split('\n', 1)[0]
+            stream_log.debug("%.100s", line, extra={'session': self.log_id, 'pid': self.pid,
+                                                     'bytes': len(data)})
+
+    def _on_backend_exit(self):
+        log.info("Process exited", extra={'session': self.log_id, 'pid': self.pid})
+        self.stop()  # flushes the last output before the exit event
+        with self.lock:
+            if self.exit_event and self.session_id is not None and self.emitter is not None:
+                payload = {'message': 'Process exited', 'exited': True}
+                if self.tag_session:
+                    payload['session_id'] = self.session_id
+                self.emitter(self.exit_event, payload, room=self.session_id, ignore_queue=True)
+        if self.on_exit is not None:
+            self.on_exit()
+
+    def _payload(self, data, offset, **extra):
+        payload = {**self.encoder.fields(data), 'offset': offset, **extra}
+        if self.tag_session:
+            payload['session_id'] = self.session_id
+        return payload
+
+    def _emit_output(self, frame):
+        """Record a coalesced frame in scrollback and send it to the attached client"""
+        with self.lock:
+            offset = self.scrollback.append(frame)
+            self.frame_sizes.observe(len(frame))
+            if self.screen:
+                self.screen.feed(frame)
+            if self.session_id is None or self.emitter is None:
+                return
+            if self.screen_client:
+                if self.frame_timer is None:
+                    self.frame_timer = get_reactor().call_later(self.pacer.interval, self._emit_screen)
+                return
+            self.emitter(self.event, self._payload(frame, offset), room=self.session_id,
+                         ignore_queue=True)
+            self._check_window(offset)
+
+    def attach(self, session_id, emit, offset=0, binary=False, screen=False, flow=False,
+               compress=False):
+        """Attach a (re)connected client and replay the output it missed since offset
+
+        In screen mode the client gets one snapshot of the screen instead.
+        """
+        with self.lock:
+            self.session_id = session_id
+            self.log_id = session_id[:8]
+            self.emitter = emit
+            self.encoder = OutputEncoder(binary, compress, self.wire)
+            self._use_flow(flow)
+            self._use_screen(screen)
+            if self.screen_client:
+                payload = self._payload(self.screen.snapshot(), self.scrollback.end,
+                                        replay=True, reset=True, screen=True)
+            else:
+                start, missing = self.scrollback.read_from(offset)
+                payload = self._payload(missing, self.scrollback.end, replay=True,
+                                        reset=start != offset)
+            emit(self.event, payload, room=session_id, ignore_queue=True)
+        if self.screen_client:
+            self._start_pings()
+
+    def detach(self):
+        """Keep the process running without a client; output only goes to scrollback"""
+        with self.lock:
+            self.session_id = None
+            self.emitter = None
+            self._stop_screen_timers()
+            self.screen_client = False
+            self.screen = None
+            self._use_flow(False)
+
+    # Flow control
+
+    def _use_flow(self, wanted):
+        # The replay on attach is bounded by scrollback, so the window starts fresh
+        self.flow = bool(wanted)
+        self.acked = self.scrollback.end
+        if self.paused:
+            self.paused = False
+            self.backend.resume()
+
+    def _check_window(self, sent):
+        if self.flow and not self.paused and sent - self.acked > FLOW_WINDOW_BYTES:
+            self.paused = True
+            self.pauses += 1
+            self.backend.pause()
+
+    def ack(self, offset):
+        """The client has rendered output up to offset; resume once it has caught up"""
+        with self.lock:
+            self.acked = max(self.acked, min(offset, self.scrollback.end))
+            if self.paused and self.scrollback.end - self.acked <= FLOW_WINDOW_BYTES // 2:
+                self.paused = False
+                self.backend.resume()
+
+    @property
+    def unacked(self):
+        return self.scrollback.end - self.acked if self.flow else 0
+
+    # Screen mode
+
+    def _use_screen(self, wanted):
+        """Switch the attached client between raw output and screen frames
+
+        The model only exists while a screen client is attached, so raw
+        sessions never pay for pyte; a new one is seeded from the last
+        SCREEN_SEED_BYTES of scrollback.
+        """
+        size = getattr(self.backend, 'size', None)
+        self.screen_client = bool(wanted) and size is not None and screen_model.available()
+        if not self.screen_client:
+            self.screen = None
+        elif self.screen is None:
+            self.screen = ScreenModel(*size)
+            start, seed = self.scrollback.read_from(self.scrollback.end - SCREEN_SEED_BYTES)
+            if start > 0 and b'\n' in seed:
+                seed = seed[seed.index(b'\n') + 1:]  # don't start mid-line or mid-escape
+            self.screen.feed(seed)
+
+    def _emit_screen(self):
+        with self.lock:
+            self.frame_timer = None
+            if not self.screen_client or self.emitter is None:
+                return
+            frame = self.screen.render_dirty()
+            if frame:
+                self.emitter(self.event, self._payload(frame, self.scrollback.end, screen=True),
+                             room=self.session_id, ignore_queue=True)
+                self._check_window(self.scrollback.end)
+
+    def _start_pings(self):
+        with self.lock:
+            if self.ping_timer is not None:
+                self.ping_timer.cancel()
+            self.ping_timer = get_reactor().call_later(0, self._ping)
+
+    def _ping(self):
+        """Measure the client's round trip with an acknowledged screen_ping"""
+        with self.lock:
+            self.ping_timer = None
+            if not self.screen_client or self.emitter is None:
+                return
+            session_id = self.session_id
+            sent = time.monotonic()
+
+            def on_pong(*args):
+                if self.session_id == session_id:
+                    self.pacer.observe(time.monotonic() - sent)
+
+            self.emitter('screen_ping', {}, room=session_id, callback=on_pong,
+                         ignore_queue=True)
+            self.ping_timer = get_reactor().call_later(SCREEN_PING_SECONDS, self._ping)
+
+    def _stop_screen_timers(self):
+        for timer in (self.frame_timer, self.ping_timer):
+            if timer is not None:
+                timer.cancel()
+        self.frame_timer = self.ping_timer = None
+
+    def write(self, data):
+        if self.log_io and input_log.isEnabledFor(logging.DEBUG):
+            input_log.debug("Input %r", data[:100], extra={'session': self.log_id, 'bytes': len(data)})
+        self.backend.write(data)
+
+    send_input = write
+
+    def resize(self, rows, cols):
+        self.backend.resize(rows, cols)
+        with self.lock:
+            if self.screen:
+                self.screen.resize(rows, cols)
+
+    def stop(self):
+        """Flush output and terminate the process without blocking"""
+        self.output.close()
+        with self.lock:
+            self._stop_screen_timers()
+        if self.backend.pid and (self.backend.running or self.backend.read_fd is not None):
+            self.backend.stop()
+
+
+class SessionNamespace(metrics.MeteredNamespace):
+    """Connect/disconnect handling shared by the session namespaces
+
+    Subclasses add on_<event> handlers and keep their sessions in a
+    SessionStore; a dropped socket detaches its session for the grace period.
+    """
+
+    def __init__(self, sessions, namespace='/'):
+        super().__init__(namespace)
+        self.sessions = sessions
+
+    def on_connect(self):
+        log.info("Client connected to %s", self.namespace, extra={'session': request.sid})
+        join_room(request.sid)
+        emit('connected', {'session_id': request.sid})
+
+    def on_disconnect(self, reason=None):
+        log.info("Client disconnected from %s", self.namespace, extra={'session': request.sid})
+        session = self.sessions.detach(request.sid)
+        if session:
+            session.detach()
+
+    def current(self):
+        """Session attached to the calling socket, or None"""
+        return self.sessions.get_by_sid(request.sid)
+
+
+def session_health(sessions, **extra):
+    """Common /health payload for a SessionStore of RuntimeSessions"""
+    stats = {
+        'status': 'healthy',
+        'active_sessions': len(sessions),
+        'watched_fds': watched_fd_count(),
+        'output': combined_stats(session.output for session in sessions.values()),
+    }
+    if sessions.registry:
+        stats['registry'] = sessions.registry.stats()
+    stats['processes'] = get_supervisor().stats()
+    flows = [session for session in sessions.values() if session.flow]
+    if flows:
+        stats['flow'] = {
+            'window_bytes': FLOW_WINDOW_BYTES,
+            'unacked_bytes': sum(session.unacked for session in flows),
+            'paused': sum(session.paused for session in flows),
+            'sessions': [{'session': session.log_id, 'unacked_bytes': session.unacked,
+                          'paused': session.paused, 'pauses': session.pauses} for session in flows],
+        }
+    screens = [session for session in sessions.values() if session.screen]
+    if screens:
+        rtts = [session.pacer.rtt for session in screens if session.pacer.rtt is not None]
+        stats['screen'] = {
+            'sessions': len(screens),
+            'fed_bytes': sum(session.screen.fed_bytes for session in screens),
+            'frame_bytes': sum(session.screen.frame_bytes for session in screens),
+            'frames': sum(session.screen.frames for session in screens),
+            'avg_rtt_ms': round(1000 * sum(rtts) / len(rtts), 1) if rtts else None,
+        }
+    wires = [session for session in sessions.values() if session.wire['frames']]
+    if wires:
+        total = {key: sum(session.wire[key] for session in wires) for key in wires[0].wire}
+        stats['wire'] = {
+            **wire_summary(total),
+            'sessions': [{'session': session.log_id, **wire_summary(session.wire)} for session in wires],
+        }
+    stats.update(extra)
+    return stats
+
+
+def mount(app, socketio, blueprint, namespace, prefix=None):
+    """Serve blueprint under prefix and its Socket.IO namespace on socketio
+
+    Templates get socket_namespace, the namespace their page should connect to,
+    and the app serves the process's /metrics.
+    """
+    namespaces = app.extensions.setdefault('socket_namespaces', {})
+    if not namespaces:
+        app.context_processor(lambda: {'socket_namespace': namespaces.get(request.blueprint, '/')})
+    namespaces[blueprint.name] = namespace.namespace
+    app.register_blueprint(blueprint, url_prefix=prefix)
+    socketio.on_namespace(namespace)
+    metrics.init_app(app)
+
+
+def create_app(default_secret, blueprint, namespace, **socketio_kwargs):
+    """Standalone Flask app + SocketIO serving one blueprint/namespace at /"""
+    log_config.setup()
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', default_secret)
+    CORS(app, origins="*")
+    socketio = SocketIO(app, cors_allowed_origins="*", **socketio_kwargs, **cluster.socketio_options())
+    cluster.init_app(app)
+    mount(app, socketio, blueprint, namespace)
+    return app, socketio
@@ -0,0 +1,145 @@
+"""
+Durable terminal session registry
+
+Sessions are keyed by a token the client keeps across reconnects instead of
+the Socket.IO sid. When a socket drops, the session is detached and kept
+alive for a grace period so a phone that switched networks or woke from
+sleep can pick up where it left off.
+
+With a SessionRegistry, ownership is also recorded for other workers to see.
+"""
+import logging
+import os
+import secrets
+import threading
+
+from pty_reactor import get_reactor
+
+log = logging.getLogger(__name__)
+
+DEFAULT_GRACE_SECONDS = float(os.environ.get('SESSION_GRACE_SECONDS', 300))
+
+
+class SessionStore:
+    """Token -> session map with sid tracking and detach expiry"""
+
+    def __init__(self, grace_seconds=None, registry=None, kind='terminal'):
+        self.grace_seconds = DEFAULT_GRACE_SECONDS if grace_seconds is None else grace_seconds
+        self.registry = registry
+        self.kind = kind
+        self.sessions = {}
+        self.sid_tokens = {}
+        self.expiry = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def new_token():
+        return secrets.token_urlsafe(16)
+
+    def add(self, token, session, sid):
+        """Register a freshly started session owned by sid; it is dropped when its process exits"""
+        with self.lock:
+            self.sessions[token] = session
+            self.sid_tokens[sid] = token
+        session.on_exit = lambda: self.discard(token, session)
+        if self.registry:
+            self.registry.claim(token, self.kind)
+
+    def get(self, token):
+        """Return the live session for token, or None"""
+        if not token:
+            return None
+        with self.lock:
+            return self.sessions.get(token)
+
+    def get_by_sid(self, sid):
+        """Return the session currently attached to sid, or None"""
+        with self.lock:
+            token = self.sid_tokens.get(sid)
+            return self.sessions.get(token) if token else None
+
+    def owner_elsewhere(self, token):
+        """Worker ID of another live worker that owns token, if any"""
+        if not token or not self.registry or token in self.sessions:
+            return None
+        owner = self.registry.owner(token)
+        return owner if owner != self.registry.worker_id else None
+
+    def attach(self, token, sid):
+        """Move an existing session to a new socket and cancel its expiry"""
+        with self.lock:
+            timer = self.expiry.pop(token, None)
+            if timer:
+                timer.cancel()
+            for old_sid, old_token in list(self.sid_tokens.items()):
+                if old_token == token:
+                    del self.sid_tokens[old_sid]
+            self.sid_tokens[sid] = token
+            return self.sessions.get(token)
+
+    def detach(self, sid):
+        """Forget sid and schedule its session to stop after the grace period"""
+        with self.lock:
+            token = self.sid_tokens.pop(sid, None)
+            session = self.sessions.get(token) if token else None
+            if session is None:
+                return None
+            if self.grace_seconds <= 0:
+                del self.sessions[token]
+                self._release(token)
+            else:
+                self.expiry[token] = get_reactor().call_later(
+                    self.grace_seconds, lambda: self._expire(token))
+                return session
+
+        session.stop()
+        return session
+
+    def remove(self, sid):
+        """Drop the session attached to sid right away and return it"""
+        with self.lock:
+            token = self.sid_tokens.pop(sid, None)
+            if token is None:
+                return None
+            timer = self.expiry.pop(token, None)
+            if timer:
+                timer.cancel()
+            self._release(token)
+            return self.sessions.pop(token, None)
+
+    def discard(self, token, session):
+        """Forget token if it still maps to session (whose process has exited)"""
+        with self.lock:
+            if self.sessions.get(token) is not session:
+                return
+            del self.sessions[token]
+            timer = self.expiry.pop(token, None)
+            if timer:
+                timer.cancel()
+            for sid, sid_token in list(self.sid_tokens.items()):
+                if sid_token == token:
+                    del self.sid_tokens[sid]
+        self._release(token)
+
+    def _release(self, token):
+        if self.registry:
+            self.registry.release(token)
+
+    def _expire(self, token):
+        with self.lock:
+            self.expiry.pop(token, None)
+            session = self.sessions.pop(token, None)
+        self._release(token)
+        if session is not None:
+            log.info("Session expired after %.0fs detached", self.grace_seconds, extra={'session': token[:8]})
+            session.stop()
+
+    def values(self):
+        with self.lock:
+            return list(self.sessions.values())
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, sid):
+        return sid in self.sid_tokens
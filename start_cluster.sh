@@ -0,0 +1,32 @@
+#!/bin/bash
+# Start WORKERS single-worker instances of APP on ports PORT..PORT+WORKERS-1,
+# sharing a Unix-socket message broker. Put nginx (nginx.conf) in front.
+#
+#   WORKERS=4 PORT=8080 ./start_cluster.sh [server:app]
+
+set -e
+
+APP=${1:-server:app}
+WORKERS=${WORKERS:-$(nproc)}
+PORT=${PORT:-8080}
+SOCKET=${MESSAGE_BROKER_SOCKET:-/tmp/claude-socketio.sock}
+
+export SOCKETIO_MESSAGE_QUEUE=${SOCKETIO_MESSAGE_QUEUE:-unix://$SOCKET}
+
+pids=()
+trap 'kill "${pids[@]}" 2>/dev/null; wait' EXIT INT TERM
+
+if [[ $SOCKETIO_MESSAGE_QUEUE == unix://* ]]; then
+    python message_broker.py "${SOCKETIO_MESSAGE_QUEUE#unix://}" &
+    pids+=($!)
+    sleep 0.5
+fi
+
+for ((i = 0; i < WORKERS; i++)); do
+    PORT=$((PORT + i)) WORKER_ID="$(hostname):$((PORT + i))" \
+        gunicorn -c gunicorn.conf.py "$APP" &
+    pids+=($!)
+done
+
+echo "Started $WORKERS instance(s) of $APP on ports $PORT-$((PORT + WORKERS - 1))"
+wait -n
@@ -17,11 +17,17 @@ class ClaudeMobileApp {
     }
     
     initSocket() {
-        this.socket = io();
+        // History is kept under a client ID that outlives the socket
+        this.socket = io({ auth: (cb) => cb({ client_id: localStorage.getItem('historyClientId') }) });
         this.currentStreamMessage = null;
+        // Compressed stream_output shares one history per connection
+        this.inflater = new StreamInflater();
+        this.streamDecoder = new TextDecoder('utf-8');
         
         this.socket.on('connect', () => {
             console.log('Connected to server');
+            this.inflater.reset();
+            this.streamDecoder = new TextDecoder('utf-8');
             this.updateConnectionStatus(true);
         });
         
@@ -33,6 +39,9 @@ class ClaudeMobileApp {
         this.socket.on('connected', (data) => {
             this.addMessage(data.message, 'system');
             this.sessionId = data.session_id;
+            if (data.client_id) {
+                localStorage.setItem('historyClientId', data.client_id);
+            }
         });
         
         this.socket.on('stream_output', (data) => {
@@ -41,14 +50,17 @@ class ClaudeMobileApp {
                 this.hideTypingIndicator();
                 this.currentStreamMessage = this.addStreamMessage('', 'assistant');
             }
-            this.updateStreamMessage(this.currentStreamMessage, data.data);
+            const chunk = this.inflater.inflate(data);
+            const text = typeof chunk === 'string' ? chunk : this.streamDecoder.decode(chunk, { stream: true });
+            this.updateStreamMessage(this.currentStreamMessage, text);
         });
         
         this.socket.on('response', (data) => {
             this.hideTypingIndicator();
             if (this.currentStreamMessage) {
-                // Update final message
-                this.finalizeStreamMessage(this.currentStreamMessage, data.output);
+                // Update final message; in summary mode the text is what we streamed
+                const streamed = this.currentStreamMessage.querySelector('.stream-content').textContent;
+                this.finalizeStreamMessage(this.currentStreamMessage, data.output !== undefined ? data.output : streamed);
                 this.currentStreamMessage = null;
             } else {
                 this.addMessage(data.output, 'assistant');
@@ -61,6 +73,10 @@ class ClaudeMobileApp {
             this.addMessage(data.message, 'system');
         });
         
+        this.socket.on('queued', (data) => {
+            this.handleQueued(data);
+        });
+        
         this.socket.on('history', (data) => {
             this.commandHistory = data.commands || [];
             this.displayHistory();
@@ -189,7 +205,7 @@ class ClaudeMobileApp {
         }
     }
     
-    sendCommand() {
+    async sendCommand() {
         const input = document.getElementById('commandInput');
         const sendBtn = document.getElementById('sendBtn');
         const command = input.value.trim();
@@ -202,10 +218,16 @@ class ClaudeMobileApp {
         this.addMessage(command, 'user');
         this.showTypingIndicator();
         
-        // Send command with attached files if any
+        // Attachments are uploaded as they are picked; wait for any still in flight
+        const attached = this.attachedFiles;
+        const fileIds = (await Promise.all(attached.map(f => f.upload.catch(() => null))))
+            .filter(Boolean);
+        
         const payload = {
             message: command,
-            files: this.attachedFiles
+            file_ids: fileIds,
+            response_mode: 'summary',
+            compress: StreamInflater.wanted(this.socket)
         };
         
         this.socket.emit('command', payload);
@@ -215,7 +237,7 @@ class ClaudeMobileApp {
             this.commandHistory.push({
                 command: command,
                 timestamp: new Date().toISOString(),
-                files: this.attachedFiles.length
+                files: attached.length
             });
             this.historyIndex = -1;
         }
@@ -223,11 +245,25 @@ class ClaudeMobileApp {
         // Clear input and files
         input.value = '';
         input.style.height = 'auto';
-        this.attachedFiles = [];
+        if (this.attachedFiles === attached) {
+            this.attachedFiles = [];
+        }
         this.updateAttachmentIndicator();
         input.focus();
     }
     
+    handleQueued(data) {
+        // One notice per job, updated in place as the queue moves
+        if (!this.queueNotice || this.queueNotice.dataset.jobId !== String(data.job_id)) {
+            this.queueNotice = document.createElement('div');
+            this.queueNotice.className = 'message system';
+            this.queueNotice.dataset.jobId = data.job_id;
+            document.getElementById('output').appendChild(this.queueNotice);
+        }
+        this.queueNotice.textContent = `Waiting for a free slot (position ${data.position} in queue)`;
+        this.scrollToBottom();
+    }
+    
     addMessage(content, type) {
         const output = document.getElementById('output');
         const messageDiv = document.createElement('div');
@@ -458,23 +494,61 @@ class ClaudeMobileApp {
         const files = Array.from(event.target.files);
         
         files.forEach(file => {
-            const reader = new FileReader();
-            reader.onload = (e) => {
-                this.attachedFiles.push({
-                    name: file.name,
-                    type: file.type,
-                    size: file.size,
-                    content: e.target.result
-                });
-                this.updateAttachmentIndicator();
+            const attachment = {
+                name: file.name,
+                type: file.type,
+                size: file.size,
+                upload: this.uploadFile(file)
             };
-            reader.readAsDataURL(file);
+            attachment.upload.catch(error => {
+                this.addMessage(`Failed to upload ${file.name}: ${error.message}`, 'system');
+            });
+            this.attachedFiles.push(attachment);
         });
+        this.updateAttachmentIndicator();
         
         // Reset file input
         event.target.value = '';
     }
     
+    async uploadFile(file) {
+        // Resumable chunked upload; resolves to the server-side file ID
+        const response = await fetch('/api/uploads', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ name: file.name, size: file.size })
+        });
+        let upload = await response.json();
+        if (!response.ok) throw new Error(upload.error || response.statusText);
+        
+        let retries = 0;
+        while (!upload.complete) {
+            const start = upload.received;
+            const end = Math.min(start + upload.chunk_size, file.size);
+            let status;
+            try {
+                const chunkResponse = await fetch(`/api/uploads/${upload.upload_id}`, {
+                    method: 'PUT',
+                    headers: { 'Content-Range': `bytes ${start}-${end - 1}/${file.size}` },
+                    body: file.slice(start, end)
+                });
+                status = await chunkResponse.json();
+                // 409 means the server expects a different offset: resume from it
+                if (!chunkResponse.ok && chunkResponse.status !== 409) {
+                    throw new Error(status.error || chunkResponse.statusText);
+                }
+            } catch (error) {
+                if (++retries > 3) throw error;
+                // Ask where the server got to and carry on from there
+                const statusResponse = await fetch(`/api/uploads/${upload.upload_id}`);
+                status = await statusResponse.json();
+                if (!statusResponse.ok) throw error;
+            }
+            upload = { ...upload, ...status };
+        }
+        return upload.file_id;
+    }
+    
     updateAttachmentIndicator() {
         const attachBtn = document.getElementById('attachBtn');
         if (this.attachedFiles.length > 0) {
@@ -42,6 +42,23 @@ class ProjectManager {
         this.socket.on('system_message', (data) => {
             this.addMessage(data.message, 'system');
         });
+        
+        this.socket.on('queued', (data) => {
+            this.handleQueued(data);
+        });
+        
+        // Pushed by the server's project watcher; no polling needed
+        this.socket.on('project_updated', (project) => {
+            const index = this.projects.findIndex(p => p.id === project.id);
+            if (index !== -1) {
+                this.projects[index] = project;
+                this.renderProjects();
+            }
+        });
+        
+        this.socket.on('project_discovered', (project) => {
+            this.addMessage(`New project found: ${project.name} (${project.path})`, 'system');
+        });
     }
     
     initUI() {
@@ -318,11 +335,34 @@ class ProjectManager {
                 },
                 body: JSON.stringify({ 
                     path: path || undefined,
-                    max_depth: 2 
+                    max_depth: 2,
+                    stream: true
                 })
             });
             
-            const projects = await response.json();
+            if (!response.ok) {
+                const error = await response.json();
+                alert(error.error || 'Failed to scan for projects');
+                return;
+            }
+            
+            // Projects arrive one JSON object per line as the server finds them
+            const projects = [];
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let pending = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                pending += decoder.decode(value, { stream: true });
+                const lines = pending.split('\n');
+                pending = lines.pop();
+                for (const line of lines) {
+                    if (line.trim()) projects.push(JSON.parse(line));
+                }
+                scanBtn.textContent = `Scanning... ${projects.length} found`;
+            }
+            if (pending.trim()) projects.push(JSON.parse(pending));
             
             if (Array.isArray(projects) && projects.length > 0) {
                 const message = `Found ${projects.length} potential projects. Would you like to add them?`;
@@ -352,6 +392,7 @@ class ProjectManager {
         } finally {
             scanBtn.classList.remove('loading');
             scanBtn.disabled = false;
+            scanBtn.textContent = 'Scan for Projects';
         }
     }
     
@@ -376,7 +417,8 @@ class ProjectManager {
         const payload = {
             message: command,
             project_path: this.currentProject.path,
-            files: []
+            file_ids: [],
+            response_mode: 'summary'
         };
         
         this.socket.emit('command', payload);
@@ -496,11 +538,25 @@ class ProjectManager {
         }, 3000);
     }
     
+    handleQueued(data) {
+        // One notice per job, updated in place as the queue moves
+        if (!this.queueNotice || this.queueNotice.dataset.jobId !== String(data.job_id)) {
+            this.queueNotice = document.createElement('div');
+            this.queueNotice.className = 'message system';
+            this.queueNotice.dataset.jobId = data.job_id;
+            document.getElementById('output').appendChild(this.queueNotice);
+        }
+        this.queueNotice.textContent = `Waiting for a free slot (position ${data.position} in queue)`;
+        this.scrollToBottom();
+    }
+    
     handleResponse(data) {
         this.hideTypingIndicator();
         
         if (this.currentStreamMessage) {
-            this.finalizeStreamMessage(this.currentStreamMessage, data.output);
+            // In summary mode the final text is what we already streamed
+            const streamed = this.currentStreamMessage.querySelector('.stream-content').textContent;
+            this.finalizeStreamMessage(this.currentStreamMessage, data.output !== undefined ? data.output : streamed);
             this.currentStreamMessage = null;
         } else {
             this.addMessage(data.output, 'assistant');
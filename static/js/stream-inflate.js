@@ -0,0 +1,46 @@
+// Decompression for output frames sent with 'z' (see stream_codec.py).
+// Each such frame is raw deflate whose preset dictionary is the last 32K of
+// output received before it, so both sides keep the same history.
+class StreamInflater {
+    constructor() {
+        this.history = new Uint8Array(0);
+    }
+
+    // Ask for compression only if we can inflate and the websocket is not
+    // already compressed with permessage-deflate
+    static wanted(socket) {
+        if (typeof pako === 'undefined') return false;
+        const transport = socket.io.engine && socket.io.engine.transport;
+        const ws = transport && transport.name === 'websocket' && transport.ws;
+        return !(ws && ws.extensions && ws.extensions.includes('permessage-deflate'));
+    }
+
+    // Call whenever the server starts a new encoder: a new session, or a replay
+    reset() {
+        this.history = new Uint8Array(0);
+    }
+
+    // Plain bytes of a payload's data; strings (uncompressed text mode) pass through
+    inflate(payload) {
+        if (typeof payload.data === 'string') return payload.data;
+        let bytes = new Uint8Array(payload.data);
+        if (payload.z) {
+            const options = this.history.length ? { dictionary: this.history } : {};
+            bytes = pako.inflateRaw(bytes, options);
+        }
+        this.remember(bytes);
+        return bytes;
+    }
+
+    remember(bytes) {
+        const size = Math.min(this.history.length + bytes.length, 32768);
+        const next = new Uint8Array(size);
+        if (bytes.length >= size) {
+            next.set(bytes.subarray(bytes.length - size));
+        } else {
+            next.set(this.history.subarray(this.history.length - (size - bytes.length)));
+            next.set(bytes, size - bytes.length);
+        }
+        this.history = next;
+    }
+}
@@ -0,0 +1,81 @@
+"""
+Payload encoding for terminal output events
+
+Clients that ask for binary frames get the raw PTY bytes as a Socket.IO
+binary attachment and decode them with a streaming TextDecoder. Everyone
+else gets text decoded with a stateful UTF-8 decoder, so multi-byte
+characters split across reads are no longer turned into U+FFFD.
+
+Binary clients can also ask for compression. Where the websocket already
+negotiated permessage-deflate they should not, and the browser
+can tell. Otherwise each frame of at least COMPRESS_MIN_BYTES is sent as raw
+deflate, marked 'z', using the last 32K of output already sent to that
+client as the preset dictionary. Both sides keep the same history, so
+repeated redraws compress to back-references while every frame still
+inflates on its own (pako.inflateRaw with the dictionary). Keystroke echoes
+stay below the threshold and go out as they are.
+"""
+import codecs
+import os
+import zlib
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 256))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+DICTIONARY_BYTES = 32 * 1024  # the deflate window; older history can't be referenced
+
+
+def new_wire_stats():
+    return {'frames': 0, 'compressed_frames': 0, 'raw_bytes': 0, 'wire_bytes': 0}
+
+
+def wire_summary(stats):
+    """stats plus the wire/raw ratio, for /health"""
+    raw = stats['raw_bytes']
+    return {**stats, 'ratio': round(stats['wire_bytes'] / raw, 3) if raw else None}
+
+
+class OutputEncoder:
+    """Convert raw PTY frames into the value sent as the event's 'data'"""
+
+    def __init__(self, binary=False, compress=False, stats=None):
+        self.binary = bool(binary) or bool(compress)
+        self.compress = bool(compress)
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.history = b''
+        self.stats = new_wire_stats() if stats is None else stats
+
+    def encode(self, frame):
+        """Return bytes in binary mode, otherwise the text decoded so far"""
+        if self.binary:
+            return bytes(frame)
+        return self.decoder.decode(frame)
+
+    def fields(self, frame):
+        """Payload fields for frame: {'data': ...}, plus 'z': True if deflated"""
+        frame = bytes(frame)
+        self.stats['frames'] += 1
+        self.stats['raw_bytes'] += len(frame)
+        if not self.compress or len(frame) < COMPRESS_MIN_BYTES:
+            data = self.encode(frame)
+            self._remember(frame)
+            self.stats['wire_bytes'] += len(frame)
+            return {'data': data}
+        packed = self._deflate(frame)
+        self._remember(frame)
+        if len(packed) >= len(frame):
+            self.stats['wire_bytes'] += len(frame)
+            return {'data': frame}
+        self.stats['compressed_frames'] += 1
+        self.stats['wire_bytes'] += len(packed)
+        return {'data': packed, 'z': True}
+
+    def _deflate(self, frame):
+        if self.history:
+            compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15, zdict=self.history)
+        else:
+            compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        return compressor.compress(frame) + compressor.flush()
+
+    def _remember(self, frame):
+        if self.compress:
+            self.history = (self.history + frame)[-DICTIONARY_BYTES:]
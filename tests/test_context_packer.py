@@ -0,0 +1,101 @@
+from context_packer import CHARS_PER_TOKEN, ContextPacker, classify
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data if isinstance(data, bytes) else data.encode('utf-8'))
+    return str(path)
+
+
+def test_classify_by_content_and_extension():
+    assert classify('a.py', b'def f(): pass\n') == 'code'
+    assert classify('a.csv', b'a,b\n1,2\n') == 'table'
+    assert classify('a.log', b'started\n') == 'log'
+    assert classify('a.md', b'# notes\n') == 'text'
+    assert classify('a.py', b'\x00\x01\x02') == 'binary'
+    assert classify('a.txt', b'\xff\xfe\xfd' * 10) == 'binary'
+
+
+def test_multibyte_character_cut_at_sniff_boundary_is_text():
+    sample = b'a' * 8190 + 'é'.encode('utf-8')[:1]
+    assert classify('a.txt', sample) == 'text'
+
+
+def test_small_file_is_included_whole(tmp_path):
+    path = write(tmp_path, 'notes.txt', 'hello world\n')
+    packed = ContextPacker(budget_tokens=100).pack([(path, 'notes.txt', None)])
+    assert packed.startswith('Context files:')
+    assert '### notes.txt (text, 12 bytes)\nhello world\n' in packed
+
+
+def test_binary_file_contents_are_left_out(tmp_path):
+    path = write(tmp_path, 'image.png', b'\x89PNG\x00\x00' * 100)
+    kind, text = ContextPacker().extract(path, 'image.png', 600, 1000)
+    assert kind == 'binary'
+    assert text == '[binary file, image/png; contents not included]'
+
+
+def test_code_gets_symbol_outline(tmp_path):
+    source = 'import os\n\n' + ''.join(f'def func_{i}():\n    return {i}\n\n' for i in range(200))
+    path = write(tmp_path, 'big.py', source)
+    kind, text = ContextPacker().extract(path, 'big.py', len(source), 1000)
+    assert kind == 'code'
+    assert text.startswith('Outline (line: symbol):\n3: def func_0():')
+    assert len(text) <= 1000
+
+
+def test_table_keeps_header_and_samples_rows(tmp_path):
+    rows = ''.join(f'{i},value-{i}\n' for i in range(5000))
+    path = write(tmp_path, 'data.csv', 'id,value\n' + rows)
+    kind, text = ContextPacker().extract(path, 'data.csv', 9 + len(rows), 2000)
+    assert kind == 'table'
+    assert text.startswith('id,value\n0,value-0\n')
+    assert text.endswith('[5000 data rows, evenly sampled]')
+    assert len(text) <= 2000
+
+
+def test_log_keeps_error_lines_and_tail(tmp_path):
+    lines = [f'line {i} ok' for i in range(3000)]
+    lines[1500] = 'line 1500 ERROR disk full'
+    data = '\n'.join(lines) + '\n'
+    path = write(tmp_path, 'server.log', data)
+    kind, text = ContextPacker().extract(path, 'server.log', len(data), 2000)
+    assert kind == 'log'
+    assert '1501: line 1500 ERROR disk full' in text
+    assert text.rstrip().endswith('line 2999 ok')
+
+
+def test_budget_is_shared_and_small_files_go_first(tmp_path):
+    small = write(tmp_path, 'small.txt', 'tiny\n')
+    large = write(tmp_path, 'large.txt', 'x' * 100000)
+    packer = ContextPacker(budget_tokens=500)
+    packed = packer.pack([(large, 'large.txt', None), (small, 'small.txt', None)])
+    assert packed.index('### small.txt') < packed.index('### large.txt')
+    assert len(packed) < 500 * CHARS_PER_TOKEN + 200
+
+
+def test_extracts_are_cached_by_digest(tmp_path):
+    path = write(tmp_path, 'a.txt', 'same\n')
+    packer = ContextPacker()
+    packer.pack([(path, 'a.txt', 'abc')])
+    packer.pack([(path, 'a.txt', 'abc')])
+    assert (packer.stats()['hits'], packer.stats()['misses']) == (1, 1)
+
+
+def test_cached_extract_fits_each_budget(tmp_path):
+    lines = ''.join(f'line {i} ok\n' for i in range(3000))
+    path = write(tmp_path, 'run.log', lines)
+    packer = ContextPacker()
+    texts = [packer.extract(path, 'run.log', len(lines), limit, digest='abc')[1] for limit in (4000, 1000, 300)]
+    assert (packer.stats()['hits'], packer.stats()['misses']) == (2, 1)
+    for text, limit in zip(texts, (4000, 1000, 300)):
+        assert len(text) <= limit
+        assert text.startswith('line 0 ok\n')
+        assert text.endswith('line 2999 ok\n')
+
+
+def test_missing_file_is_skipped(tmp_path):
+    path = write(tmp_path, 'a.txt', 'kept\n')
+    packed = ContextPacker().pack([(str(tmp_path / 'gone.txt'), 'gone.txt', None), (path, 'a.txt', None)])
+    assert 'gone.txt' not in packed
+    assert 'kept' in packed
@@ -0,0 +1,86 @@
+import importlib
+import os
+
+import pytest
+
+from history_store import HistoryStore
+
+# Durable client keys, as app.py issues them
+CLIENT_A = 'client-a-0123456789'
+CLIENT_B = 'client-b-0123456789'
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), flush_interval=0)
+    for i in range(120):
+        store.add(f'cmd {i}', CLIENT_A if i % 2 == 0 else CLIENT_B, project_path='/p')
+    store.flush()
+    return store
+
+
+def test_recent_returns_newest_page_oldest_first(store):
+    page = store.recent(session_id=CLIENT_A, limit=5)
+    assert [entry['command'] for entry in page] == [f'cmd {i}' for i in range(110, 120, 2)]
+
+
+def test_before_id_walks_back_without_gaps_or_repeats(store):
+    seen = []
+    before = None
+    while True:
+        page = store.recent(project_path='/p', limit=25, before_id=before)
+        if not page:
+            break
+        seen = page + seen
+        before = page[0]['id']
+    assert [entry['command'] for entry in seen] == [f'cmd {i}' for i in range(120)]
+
+
+def test_pages_stay_within_their_session(store):
+    page = store.recent(session_id=CLIENT_B, limit=500)
+    assert len(page) == 60
+    assert {entry['session_id'] for entry in page} == {CLIENT_B}
+
+
+def test_clear_applies_after_earlier_adds(store):
+    store.add('late', CLIENT_A)
+    store.clear(CLIENT_A)
+    store.flush()
+    assert store.recent(session_id=CLIENT_A) == []
+    assert len(store.recent(session_id=CLIENT_B, limit=500)) == 60
+
+
+# The get_history handler in app.py
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    path = tmp_path_factory.mktemp('app')
+    os.environ.setdefault('HISTORY_DB', str(path / 'history.db'))
+    os.environ.setdefault('SESSION_REGISTRY_DB', str(path / 'sessions.db'))
+    return importlib.import_module('app')
+
+
+@pytest.fixture
+def client(app_module, store, monkeypatch):
+    monkeypatch.setattr(app_module, 'history', store)
+    client = app_module.socketio.test_client(app_module.app, auth={'client_id': CLIENT_A})
+    client.get_received()
+    yield client
+    client.disconnect()
+
+
+def get_history(client, **data):
+    client.emit('get_history', data)
+    return [message['args'][0] for message in client.get_received() if message['name'] == 'history'][-1]
+
+
+def test_get_history_pages_with_has_more(client):
+    first = get_history(client, limit=40)
+    assert len(first['commands']) == 40 and first['has_more']
+    rest = get_history(client, limit=40, before_id=first['commands'][0]['id'])
+    assert len(rest['commands']) == 20 and not rest['has_more']
+
+
+@pytest.mark.parametrize('limit, expected', [('x', 50), (None, 50), (0, 1), (-5, 1), (10000, 60)])
+def test_get_history_clamps_bad_limits(client, limit, expected):
+    assert len(get_history(client, limit=limit)['commands']) == expected
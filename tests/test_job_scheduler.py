@@ -0,0 +1,188 @@
+import threading
+import time
+
+from job_scheduler import JobScheduler
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class Gate:
+    """Job body that blocks until released and records the order jobs ran in"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.order = []
+
+    def __call__(self, name):
+        self.order.append(name)
+        self.release.wait(5)
+
+
+def test_round_robin_across_sessions():
+    gate = Gate()
+    gate.release.set()
+    blocker = threading.Event()
+    scheduler = JobScheduler(max_workers=1, per_session=1, per_project=1)
+    scheduler.submit('x', None, blocker.wait, 5)
+    for name in ('a1', 'a2', 'a3'):
+        scheduler.submit('a', None, gate, name)
+    scheduler.submit('b', None, gate, 'b1')
+
+    blocker.set()
+    assert wait_for(lambda: scheduler.stats()['completed'] == 5)
+    assert gate.order == ['a1', 'b1', 'a2', 'a3']
+
+
+def test_per_session_limit():
+    gate = Gate()
+    scheduler = JobScheduler(max_workers=4, per_session=1, per_project=4)
+    scheduler.submit('a', None, gate, 'a1')
+    scheduler.submit('a', None, gate, 'a2')
+
+    assert wait_for(lambda: gate.order == ['a1'])
+    stats = scheduler.stats()
+    assert (stats['running'], stats['queued']) == (1, 1)
+
+    gate.release.set()
+    assert wait_for(lambda: scheduler.stats()['completed'] == 2)
+
+
+def test_per_project_limit():
+    gate = Gate()
+    scheduler = JobScheduler(max_workers=4, per_session=2, per_project=1)
+    scheduler.submit('a', '/p', gate, 'a1')
+    scheduler.submit('b', '/p', gate, 'b1')
+    scheduler.submit('c', '/q', gate, 'c1')
+
+    assert wait_for(lambda: sorted(gate.order) == ['a1', 'c1'])
+    stats = scheduler.stats()
+    assert (stats['running'], stats['queued']) == (2, 1)
+
+    gate.release.set()
+    assert wait_for(lambda: scheduler.stats()['completed'] == 3)
+
+
+def test_global_limit():
+    gate = Gate()
+    scheduler = JobScheduler(max_workers=2, per_session=2, per_project=4)
+    for session in ('a', 'b', 'c'):
+        scheduler.submit(session, None, gate, session)
+
+    assert wait_for(lambda: len(gate.order) == 2)
+    stats = scheduler.stats()
+    assert (stats['running'], stats['queued']) == (2, 1)
+
+    gate.release.set()
+    assert wait_for(lambda: scheduler.stats()['completed'] == 3)
+
+
+def test_cancel_drops_waiting_jobs():
+    gate = Gate()
+    scheduler = JobScheduler(max_workers=1, per_session=1, per_project=1)
+    scheduler.submit('a', None, gate, 'a1')
+    waiting = [scheduler.submit('a', None, gate, name) for name in ('a2', 'a3')]
+
+    assert scheduler.cancel('a') == 2
+    assert all(job.cancelled for job in waiting)
+    assert scheduler.cancel('a') == 0
+
+    gate.release.set()
+    assert wait_for(lambda: scheduler.stats()['completed'] == 1)
+    time.sleep(0.05)
+    assert gate.order == ['a1']
+    assert scheduler.stats()['cancelled'] == 2
+
+
+def test_queue_positions_reported():
+    gate = Gate()
+    positions = {}
+    scheduler = JobScheduler(max_workers=1, per_session=1, per_project=1,
+                             on_queued=lambda job, position: positions.__setitem__(job.job_id, position))
+    scheduler.submit('a', None, gate, 'a1')
+    a2 = scheduler.submit('a', None, gate, 'a2')
+    b1 = scheduler.submit('b', None, gate, 'b1')
+    assert positions == {a2.job_id: 1, b1.job_id: 2}
+
+    scheduler.cancel('a')
+    assert positions[b1.job_id] == 1
+
+    gate.release.set()
+    assert wait_for(lambda: scheduler.stats()['completed'] == 2)
+
+
+def test_failed_job_frees_its_slot():
+    def fail():
+        raise RuntimeError('boom')
+
+    gate = Gate()
+    gate.release.set()
+    scheduler = JobScheduler(max_workers=1, per_session=1, per_project=1)
+    scheduler.submit('a', None, fail)
+    scheduler.submit('a', None, gate, 'a2')
+
+    assert wait_for(lambda: scheduler.stats()['completed'] == 2)
+    assert gate.order == ['a2']
+
+
+class HeldExecutor:
+    """Executor that only runs submitted calls when told to"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn, args))
+        return None
+
+    def run_all(self):
+        for fn, args in self.calls:
+            fn(*args)
+
+
+def test_cancel_before_start_is_not_lost():
+    ran = []
+    scheduler = JobScheduler(max_workers=1, per_session=1, per_project=1)
+    scheduler.executor = HeldExecutor()
+    job = scheduler.submit('a', None, ran.append, 'a1')
+
+    assert scheduler.cancel_running('a') == 1
+    scheduler.executor.run_all()
+    assert ran == []
+    assert job.cancelled and not job.started
+    assert scheduler.stats()['running'] == 0
+
+
+def test_cancelled_coroutine_holds_its_slot_until_teardown_ends():
+    import asyncio
+
+    events = []
+
+    async def run(name):
+        events.append(f'{name} start')
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            await asyncio.sleep(0.2)  # e.g. killing the child process
+            events.append(f'{name} torn down')
+            raise
+
+    scheduler = JobScheduler(max_workers=1, per_session=1, per_project=1)
+    scheduler.submit('a', None, run, 'a1')
+    scheduler.submit('b', None, run, 'b1')
+    assert wait_for(lambda: events == ['a1 start'])
+
+    assert scheduler.cancel_running('a') == 1
+    time.sleep(0.1)
+    assert scheduler.stats()['running'] == 1
+    assert events == ['a1 start']
+
+    assert wait_for(lambda: events == ['a1 start', 'a1 torn down', 'b1 start'])
+    scheduler.cancel_running('b')
+    assert wait_for(lambda: scheduler.stats()['running'] == 0)
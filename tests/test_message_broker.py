@@ -0,0 +1,73 @@
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+from message_broker import UnixSocketManager, run_broker
+
+
+@pytest.fixture
+def broker(tmp_path):
+    path = str(tmp_path / 'broker.sock')
+    threading.Thread(target=run_broker, args=(path,), daemon=True).start()
+    deadline = time.monotonic() + 2
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return path
+
+
+def subscribe(manager):
+    received = queue.Queue()
+
+    def listen():
+        for message in manager._listen():
+            received.put(message)
+
+    threading.Thread(target=listen, daemon=True).start()
+    return received
+
+
+def publish_until_received(publisher, message, received):
+    # The subscriber may still be connecting; the broker only relays to connected ones
+    for _ in range(50):
+        publisher._publish(message)
+        try:
+            return received.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    raise AssertionError('message never arrived')
+
+
+def test_bytes_payload_reaches_other_workers(broker):
+    publisher = UnixSocketManager(f'unix://{broker}')
+    subscriber = UnixSocketManager(f'unix://{broker}')
+    received = subscribe(subscriber)
+
+    frame = bytes(range(256)) * 64
+    message = {'method': 'emit', 'event': 'terminal_output', 'namespace': '/terminal',
+               'data': [{'data': frame, 'offset': 16384, 'z': True}], 'room': 'sid'}
+    assert publish_until_received(publisher, message, received) == message
+
+
+def test_other_channels_are_ignored(broker):
+    publisher = UnixSocketManager(f'unix://{broker}', channel='other')
+    subscriber = UnixSocketManager(f'unix://{broker}')
+    received = subscribe(subscriber)
+    mine = UnixSocketManager(f'unix://{broker}')
+
+    publisher._publish({'method': 'emit', 'data': ['ignored']})
+    assert publish_until_received(mine, {'method': 'emit', 'data': ['kept']}, received) == \
+        {'method': 'emit', 'data': ['kept']}
+    while not received.empty():
+        assert received.get()['data'] == ['kept']
+
+
+def test_large_messages_span_several_reads(broker):
+    publisher = UnixSocketManager(f'unix://{broker}')
+    subscriber = UnixSocketManager(f'unix://{broker}')
+    received = subscribe(subscriber)
+
+    message = {'method': 'emit', 'data': [os.urandom(1024 * 1024)]}
+    assert publish_until_received(publisher, message, received) == message
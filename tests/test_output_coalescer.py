@@ -0,0 +1,94 @@
+import threading
+import time
+
+from output_coalescer import OutputCoalescer, combined_stats
+from pty_reactor import PtyReactor
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def make(max_bytes=64, max_delay_ms=20):
+    frames = []
+    reactor = PtyReactor(name='test-coalescer')
+    reactor.start()
+    return OutputCoalescer(frames.append, max_bytes, max_delay_ms, reactor), frames
+
+
+def test_size_limit_flushes_at_once():
+    coalescer, frames = make(max_bytes=8, max_delay_ms=10000)
+    coalescer.feed(b'abcd')
+    assert frames == []
+    coalescer.feed(b'efghij')
+    assert frames == [b'abcdefghij']
+
+
+def test_time_limit_flushes_small_writes_as_one_frame():
+    coalescer, frames = make(max_delay_ms=20)
+    for chunk in (b'a', b'b', b'c'):
+        coalescer.feed(chunk)
+    assert frames == []
+    assert wait_for(lambda: frames == [b'abc'])
+
+
+def test_close_flushes_and_ignores_later_output():
+    coalescer, frames = make(max_delay_ms=10000)
+    coalescer.feed(b'tail')
+    coalescer.close()
+    coalescer.feed(b'late')
+    assert frames == [b'tail']
+    assert coalescer.timer is None
+
+
+def test_nothing_is_dropped_under_concurrent_writers():
+    coalescer, frames = make(max_bytes=100, max_delay_ms=5)
+
+    def write(tag):
+        for i in range(200):
+            coalescer.feed(b'%s%03d;' % (tag, i))
+
+    threads = [threading.Thread(target=write, args=(tag,)) for tag in (b'a', b'b', b'c')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    coalescer.close()
+    data = b''.join(frames)
+    assert len(data) == 3 * 200 * 5
+    for tag in (b'a', b'b', b'c'):
+        assert [chunk for chunk in data.split(b';') if chunk.startswith(tag)] == \
+            [b'%s%03d' % (tag, i) for i in range(200)]
+    assert coalescer.stats()['frames'] == len(frames) < 600
+
+
+def test_emit_errors_do_not_stop_the_stream():
+    frames = []
+
+    def emit(frame):
+        if not frames:
+            frames.append(None)
+            raise RuntimeError('client went away')
+        frames.append(frame)
+
+    reactor = PtyReactor(name='test-coalescer')
+    reactor.start()
+    coalescer = OutputCoalescer(emit, 4, 10000, reactor)
+    coalescer.feed(b'first')
+    coalescer.feed(b'second')
+    assert frames == [None, b'second']
+
+
+def test_combined_stats_adds_up_sessions():
+    one, _ = make(max_bytes=4)
+    two, _ = make(max_bytes=4)
+    one.feed(b'1234')
+    two.feed(b'123456')
+    two.feed(b'7890')
+    stats = combined_stats([one, two])
+    assert (stats['frames'], stats['bytes'], stats['bytes_per_frame']) == (3, 14, 4.7)
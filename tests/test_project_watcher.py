@@ -0,0 +1,46 @@
+import os
+import threading
+import time
+
+import pty_reactor
+from project_watcher import ProjectWatcher
+from projects import ProjectManager
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_new_project_under_root_is_discovered_off_the_pty_reactor(tmp_path):
+    root = tmp_path / 'root'
+    (root / 'existing').mkdir(parents=True)
+    (root / 'existing' / 'CLAUDE.md').touch()
+    (root / 'plain').mkdir()
+
+    events = []
+    threads = []
+
+    def on_event(event, payload):
+        threads.append(threading.current_thread().name)
+        events.append((event, payload['path']))
+
+    watcher = ProjectWatcher(ProjectManager(config_file=str(tmp_path / 'projects.json')), on_event)
+    assert not watcher.watch_root(str(root))  # not started in this process
+    watcher.start()
+    assert watcher.watch_root(str(root))
+    assert wait_for(lambda: watcher.stats()['roots'] == 1)
+
+    (root / 'plain' / 'CLAUDE.md').touch()
+    os.makedirs(root / 'new')
+    (root / 'new' / 'CLAUDE.md').touch()
+
+    assert wait_for(lambda: len(events) == 2)
+    assert sorted(events) == [('project_discovered', str(root / 'new')),
+                              ('project_discovered', str(root / 'plain'))]
+    assert not any(name.startswith('pty-reactor') for name in threads)
+    assert watcher.reactor not in pty_reactor._reactors
@@ -0,0 +1,133 @@
+import time
+
+from scrollback import ScrollbackRing
+from session_store import SessionStore
+
+
+class FakeSession:
+    def __init__(self):
+        self.stopped = False
+        self.on_exit = None
+
+    def stop(self):
+        self.stopped = True
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+# ScrollbackRing
+
+def test_append_returns_end_offset():
+    ring = ScrollbackRing(16)
+    assert ring.append(b'hello') == 5
+    assert ring.append(b' world') == 11
+    assert ring.read_from(0) == (0, b'hello world')
+
+
+def test_replay_from_offset():
+    ring = ScrollbackRing(16)
+    ring.append(b'hello')
+    ring.append(b' world')
+    assert ring.read_from(5) == (5, b' world')
+    assert ring.read_from(11) == (11, b'')
+
+
+def test_replay_across_wraparound():
+    ring = ScrollbackRing(8)
+    ring.append(b'abcdef')
+    ring.append(b'ghij')
+    assert ring.start == 2
+    assert ring.read_from(4) == (4, b'efghij')
+
+
+def test_overwritten_offset_starts_at_oldest_byte():
+    ring = ScrollbackRing(8)
+    ring.append(b'0123456789')
+    start, data = ring.read_from(0)
+    assert start == 2
+    assert data == b'23456789'
+
+
+def test_append_larger_than_capacity_keeps_tail():
+    ring = ScrollbackRing(4)
+    ring.append(b'ab')
+    assert ring.append(b'cdefgh') == 8
+    assert ring.read_from(0) == (4, b'efgh')
+
+
+def test_offset_past_end_is_clamped():
+    ring = ScrollbackRing(8)
+    ring.append(b'abc')
+    assert ring.read_from(100) == (3, b'')
+
+
+# SessionStore
+
+def test_resume_by_token_moves_session_to_new_sid():
+    store = SessionStore(grace_seconds=60)
+    session = FakeSession()
+    store.add('token', session, 'sid-1')
+
+    assert store.detach('sid-1') is session
+    assert 'sid-1' not in store
+    assert store.get('token') is session
+
+    assert store.attach('token', 'sid-2') is session
+    assert store.get_by_sid('sid-2') is session
+    assert not wait_for(lambda: session.stopped, timeout=0.1)
+
+
+def test_detached_session_expires_after_grace():
+    store = SessionStore(grace_seconds=0.05)
+    session = FakeSession()
+    store.add('token', session, 'sid-1')
+    store.detach('sid-1')
+
+    assert wait_for(lambda: session.stopped)
+    assert store.get('token') is None
+    assert len(store) == 0
+
+
+def test_attach_cancels_expiry():
+    store = SessionStore(grace_seconds=0.05)
+    session = FakeSession()
+    store.add('token', session, 'sid-1')
+    store.detach('sid-1')
+    store.attach('token', 'sid-2')
+
+    time.sleep(0.15)
+    assert not session.stopped
+    assert store.get_by_sid('sid-2') is session
+
+
+def test_no_grace_stops_on_detach():
+    store = SessionStore(grace_seconds=0)
+    session = FakeSession()
+    store.add('token', session, 'sid-1')
+
+    assert store.detach('sid-1') is session
+    assert session.stopped
+    assert store.get('token') is None
+
+
+def test_process_exit_drops_session():
+    store = SessionStore(grace_seconds=60)
+    session = FakeSession()
+    store.add('token', session, 'sid-1')
+
+    session.on_exit()
+    assert store.get('token') is None
+    assert 'sid-1' not in store
+
+
+def test_unknown_token_is_not_resumed():
+    store = SessionStore(grace_seconds=60)
+    assert store.get('missing') is None
+    assert store.get(None) is None
@@ -0,0 +1,58 @@
+import pytest
+
+from session_runtime import RuntimeSession
+
+
+class FakeBackend:
+    cwd = '/tmp'
+    argv = ['fake']
+    pid = None
+    running = True
+    read_fd = None
+
+    def __init__(self, size=(24, 80)):
+        self.size = size
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event, payload, room=None, callback=None, ignore_queue=False):
+        self.events.append((event, payload))
+
+
+def test_replay_sends_missed_output():
+    session = RuntimeSession(FakeBackend(), binary=True)
+    session._emit_output(b'hello ')
+    session._emit_output(b'world')
+
+    emit = Recorder()
+    session.attach('sid', emit, offset=6, binary=True)
+    event, payload = emit.events[0]
+    assert event == 'output'
+    assert payload['data'] == b'world'
+    assert (payload['offset'], payload['replay'], payload['reset']) == (11, True, False)
+
+
+def test_screen_model_only_lives_while_a_screen_client_is_attached():
+    pytest.importorskip('pyte')
+    session = RuntimeSession(FakeBackend())
+    session._emit_output(b'line one\r\nline two\r\n')
+
+    session.attach('sid', Recorder(), screen=True)
+    assert session.screen is not None
+    assert 'line two' in session.screen.snapshot().decode()
+
+    session.detach()
+    assert session.screen is None
+    session.attach('sid', Recorder(), screen=False)
+    session._emit_output(b'raw output\r\n')
+    assert session.screen is None
+    session.stop()
@@ -0,0 +1,81 @@
+import zlib
+
+from stream_codec import COMPRESS_MIN_BYTES, DICTIONARY_BYTES, OutputEncoder
+
+
+class Inflater:
+    """What the browser does: inflate 'z' frames with the history both sides keep"""
+
+    def __init__(self):
+        self.history = b''
+
+    def inflate(self, fields):
+        data = fields['data']
+        if fields.get('z'):
+            if self.history:
+                data = zlib.decompressobj(-15, zdict=self.history).decompress(data)
+            else:
+                data = zlib.decompressobj(-15).decompress(data)
+        self.history = (self.history + data)[-DICTIONARY_BYTES:]
+        return data
+
+    def reset(self):
+        self.history = b''
+
+
+def redraw(i):
+    return b'\x1b[H' + b''.join(b'\x1b[%dH row %d: status line %d\r\n' % (row, row, i) for row in range(1, 40))
+
+
+def test_frames_round_trip_with_dictionary_history():
+    encoder = OutputEncoder(compress=True)
+    inflater = Inflater()
+    frames = [redraw(i) for i in range(20)] + [b'k', 'héllo ☃\n'.encode() * 50, redraw(99) * 30]
+    for frame in frames:
+        assert inflater.inflate(encoder.fields(frame)) == frame
+    stats = encoder.stats
+    assert stats['frames'] == len(frames)
+    assert stats['compressed_frames'] >= 20
+    assert stats['wire_bytes'] < stats['raw_bytes'] // 5
+
+
+def test_small_frames_are_sent_as_they_are():
+    encoder = OutputEncoder(compress=True)
+    frame = b'x' * (COMPRESS_MIN_BYTES - 1)
+    assert encoder.fields(frame) == {'data': frame}
+
+
+def test_replay_starts_a_fresh_stream():
+    inflater = Inflater()
+    encoder = OutputEncoder(compress=True)
+    for i in range(5):
+        inflater.inflate(encoder.fields(redraw(i)))
+
+    # Reconnect: the server builds a new encoder for the replay, the client resets
+    encoder = OutputEncoder(compress=True)
+    inflater.reset()
+    for i in range(5, 10):
+        fields = encoder.fields(redraw(i))
+        assert inflater.inflate(fields) == redraw(i)
+
+
+def test_stale_history_does_not_inflate_after_replay():
+    inflater = Inflater()
+    encoder = OutputEncoder(compress=True)
+    inflater.inflate(encoder.fields(redraw(0)))
+    inflater.inflate(encoder.fields(b'other output ' * 40))
+
+    encoder = OutputEncoder(compress=True)
+    encoder.fields(redraw(1))
+    fields = encoder.fields(redraw(2))
+    assert fields.get('z')
+    try:
+        assert inflater.inflate(fields) != redraw(2)
+    except zlib.error:
+        pass
+
+
+def test_text_mode_keeps_split_characters():
+    encoder = OutputEncoder()
+    data = 'café ☃'.encode()
+    assert encoder.fields(data[:4])['data'] + encoder.fields(data[4:])['data'] == 'café ☃'
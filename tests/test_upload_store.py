@@ -0,0 +1,106 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+import upload_store
+from upload_store import UploadError, UploadStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path))
+
+
+def put(store, upload, data, start):
+    """Write data as the chunk 'bytes start-end/size' would"""
+    end = start + len(data) - 1
+    return store.write(upload.upload_id, start, end - start + 1, io.BytesIO(data))
+
+
+def test_chunks_assemble_into_blob(store):
+    data = os.urandom(10000)
+    upload = store.create('notes.txt', len(data))
+    for start in range(0, len(data), 4096):
+        put(store, upload, data[start:start + 4096], start)
+
+    status = upload.status()
+    assert status['complete']
+    assert status['file_id'] == hashlib.sha256(data).hexdigest()
+    path, name = store.resolve(upload.file_id)
+    assert name == 'notes.txt'
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_out_of_order_chunk_reports_expected_offset(store):
+    upload = store.create('a.bin', 8)
+    put(store, upload, b'abcd', 0)
+    with pytest.raises(UploadError) as error:
+        put(store, upload, b'gh', 6)
+    assert (error.value.status, error.value.received) == (409, 4)
+
+    put(store, upload, b'efgh', 4)
+    assert upload.status()['complete']
+
+
+def test_chunk_past_declared_size_is_rejected(store):
+    upload = store.create('a.bin', 4)
+    with pytest.raises(UploadError) as error:
+        put(store, upload, b'abcdef', 0)
+    assert error.value.status == 416
+
+
+def test_short_chunk_body_is_rejected(store):
+    upload = store.create('a.bin', 8)
+    with pytest.raises(UploadError) as error:
+        store.write(upload.upload_id, 0, 8, io.BytesIO(b'abc'))
+    assert (error.value.status, error.value.received) == (400, 3)
+
+
+def test_identical_content_is_stored_once(store):
+    first = store.create('one.txt', 5)
+    put(store, first, b'hello', 0)
+    second = store.create('two.txt', 5)
+    put(store, second, b'hello', 0)
+
+    assert first.file_id == second.file_id
+    assert os.listdir(store.blob_dir) == [first.file_id]
+    assert os.listdir(store.partial_dir) == []
+
+
+def test_empty_upload_completes_on_create(store):
+    upload = store.create('empty.txt', 0)
+    assert upload.file_id == hashlib.sha256(b'').hexdigest()
+
+
+def test_oversized_upload_is_refused(store):
+    with pytest.raises(UploadError) as error:
+        store.create('big.bin', upload_store.UPLOAD_MAX_BYTES + 1)
+    assert error.value.status == 413
+
+
+def test_prune_drops_expired_blobs_and_names(store, monkeypatch):
+    upload = store.create('old.txt', 3)
+    put(store, upload, b'old', 0)
+    partial = store.create('partial.txt', 10)
+
+    monkeypatch.setattr(upload_store, 'UPLOAD_TTL_SECONDS', -1)
+    store.prune()
+
+    assert store.resolve(upload.file_id) is None
+    assert upload.file_id not in store.names
+    assert not os.path.exists(partial.path)
+    with pytest.raises(UploadError):
+        store.get(partial.upload_id)
+
+
+def test_prune_runs_on_access(store, monkeypatch):
+    upload = store.create('old.txt', 3)
+    put(store, upload, b'old', 0)
+
+    monkeypatch.setattr(upload_store, 'UPLOAD_TTL_SECONDS', -1)
+    monkeypatch.setattr(upload_store, 'UPLOAD_PRUNE_SECONDS', 0)
+    assert store.resolve(upload.file_id) is None
+    assert store.names == {}
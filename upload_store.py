@@ -0,0 +1,194 @@
+"""
+Resumable chunked uploads for command attachments
+
+Clients register an upload, then PUT byte ranges in order. Each chunk is
+streamed straight to a partial file while a SHA-256 is updated, so no file
+is ever held in memory whole. Finished uploads are stored by content hash
+(identical files are kept once) and commands refer to them by that ID.
+
+Stale partial uploads and unused blobs are pruned, together with their
+names, at most every UPLOAD_PRUNE_SECONDS as the store is used.
+"""
+import hashlib
+import os
+import secrets
+import shutil
+import threading
+import time
+
+UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_BYTES', 1024 * 1024))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 64 * 1024 * 1024))
+UPLOAD_TTL_SECONDS = float(os.environ.get('UPLOAD_TTL_SECONDS', 3600))
+UPLOAD_PRUNE_SECONDS = float(os.environ.get('UPLOAD_PRUNE_SECONDS', 60))
+READ_BYTES = 64 * 1024
+
+
+class UploadError(Exception):
+    """Rejected upload request; status is the HTTP code to answer with"""
+
+    def __init__(self, message, status=400, received=None):
+        super().__init__(message)
+        self.status = status
+        self.received = received
+
+
+class Upload:
+    def __init__(self, upload_id, name, size, path):
+        self.upload_id = upload_id
+        self.name = name
+        self.size = size
+        self.path = path
+        self.received = 0
+        self.hash = hashlib.sha256()
+        self.file_id = None
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def status(self):
+        return {
+            'upload_id': self.upload_id,
+            'name': self.name,
+            'size': self.size,
+            'received': self.received,
+            'complete': self.file_id is not None,
+            'file_id': self.file_id,
+            'chunk_size': UPLOAD_CHUNK_BYTES,
+        }
+
+
+class UploadStore:
+    """Partial uploads plus a content-addressed blob directory"""
+
+    def __init__(self, root):
+        self.partial_dir = os.path.join(root, 'partial')
+        self.blob_dir = os.path.join(root, 'blobs')
+        os.makedirs(self.partial_dir, exist_ok=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.uploads = {}
+        self.names = {}  # file_id -> original file name
+        self.last_prune = 0
+        self.lock = threading.Lock()
+
+    def create(self, name, size):
+        """Register a new upload of `size` bytes"""
+        size = int(size)
+        if size < 0 or size > UPLOAD_MAX_BYTES:
+            raise UploadError(f'File too large (limit {UPLOAD_MAX_BYTES} bytes)', 413)
+        self._maybe_prune()
+
+        upload_id = secrets.token_hex(12)
+        upload = Upload(upload_id, name, size, os.path.join(self.partial_dir, upload_id))
+        open(upload.path, 'wb').close()
+        with self.lock:
+            self.uploads[upload_id] = upload
+        if size == 0:
+            self._finish(upload)
+        return upload
+
+    def get(self, upload_id):
+        self._maybe_prune()
+        with self.lock:
+            upload = self.uploads.get(upload_id)
+        if upload is None:
+            raise UploadError('Unknown upload', 404)
+        return upload
+
+    def write(self, upload_id, offset, length, stream):
+        """Append `length` bytes read from stream at `offset`
+
+        Chunks must arrive in order; a mismatched offset answers 409 with
+        the offset the server expects, which is how clients resume.
+        """
+        upload = self.get(upload_id)
+        with upload.lock:
+            if upload.file_id is not None:
+                return upload
+            if offset != upload.received:
+                raise UploadError('Unexpected offset', 409, upload.received)
+            if offset + length > upload.size:
+                raise UploadError('Chunk runs past the declared size', 416, upload.received)
+
+            remaining = length
+            with open(upload.path, 'ab') as f:
+                while remaining:
+                    data = stream.read(min(READ_BYTES, remaining))
+                    if not data:
+                        break
+                    f.write(data)
+                    upload.hash.update(data)
+                    upload.received += len(data)
+                    remaining -= len(data)
+            upload.updated = time.monotonic()
+
+            if remaining:
+                raise UploadError('Chunk body shorter than its range', 400, upload.received)
+            if upload.received == upload.size:
+                self._finish(upload)
+        return upload
+
+    def _finish(self, upload):
+        file_id = upload.hash.hexdigest()
+        blob = os.path.join(self.blob_dir, file_id)
+        if os.path.exists(blob):
+            # Same content already stored; keep a single copy
+            os.remove(upload.path)
+            os.utime(blob)
+        else:
+            os.replace(upload.path, blob)
+        upload.file_id = file_id
+        with self.lock:
+            self.names[file_id] = upload.name
+
+    def resolve(self, file_id):
+        """Return (path, original name) for a finished upload, or None"""
+        if not file_id or not all(c in '0123456789abcdef' for c in file_id):
+            return None
+        self._maybe_prune()
+        path = os.path.join(self.blob_dir, file_id)
+        try:
+            os.utime(path)  # in use, so keep it out of the next prune
+        except OSError:
+            return None
+        with self.lock:
+            name = self.names.get(file_id, file_id)
+        return path, name
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_prune < UPLOAD_PRUNE_SECONDS:
+                return
+            self.last_prune = now
+        self.prune()
+
+    def prune(self):
+        """Forget stale partial uploads and blobs nobody touched within the TTL"""
+        now = time.monotonic()
+        with self.lock:
+            stale = [u for u in self.uploads.values() if now - u.updated > UPLOAD_TTL_SECONDS]
+            for upload in stale:
+                del self.uploads[upload.upload_id]
+        for upload in stale:
+            if upload.file_id is None:
+                try:
+                    os.remove(upload.path)
+                except OSError:
+                    pass
+
+        cutoff = time.time() - UPLOAD_TTL_SECONDS
+        removed = []
+        with os.scandir(self.blob_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed.append(entry.name)
+                except OSError:
+                    pass
+        with self.lock:
+            for file_id in removed:
+                self.names.pop(file_id, None)
+
+    def clear(self):
+        shutil.rmtree(self.partial_dir, ignore_errors=True)
+        shutil.rmtree(self.blob_dir, ignore_errors=True)